@@ -1,17 +1,992 @@
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request, url_for
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from datetime import datetime, timedelta
+import json
+import time
 import logging
-from data_fetcher import fetch_multiple_tickers, validate_weights
-from risk_metrics import calculate_all_metrics
-from stress_tests import run_all_stress_tests
+import numpy as np
+from rolling_metrics import DEFAULT_WINDOWS
+from correlation import CORRELATION_MODES, DEFAULT_TOP_K
+from scenarios import DEFAULT_TOP_N, run_scenario_analysis, validate_scenario_spec
+from optimization import DEFAULT_FRONTIER_POINTS, optimize_portfolio, portfolio_bounds
+from monte_carlo import calculate_monte_carlo_var, simulation_draws, DISTRIBUTIONS
+from tail_risk import DEFAULT_CONFIDENCE_LEVELS
+from backtest import DEFAULT_SCHEDULE, REBALANCE_SCHEDULES
+from bootstrap import (BOOTSTRAP_METHODS, DEFAULT_CONFIDENCE, DEFAULT_RESAMPLES, DEFAULT_SEED,
+                       bootstrap_confidence_intervals)
+from result_cache import ResultCache, make_cache_key
+from response_format import negotiate_mimetype, serialize
+from downsampling import MIN_POINTS
+from concurrency import run_fetch, run_cpu, warm_up_cpu_pool, FetchTimeoutError
+from jobs import JobManager, JobQueueFullError, report_progress
+from instrumentation import (REGISTRY, SamplingProfiler, finish_request, profiling_enabled, stage,
+                             start_request)
+from lazy_imports import LazyModule, warm_up
+
+# Modules that load pandas are imported with the first request that needs
+# them (or by /api/warmup), so a new process answers /api/health quickly
+data_fetcher = LazyModule('data_fetcher')
+risk_metrics = LazyModule('risk_metrics')
+stress_tests = LazyModule('stress_tests')
+portfolio_context = LazyModule('portfolio_context')
+
+# Imported by /api/warmup: the lazy modules plus the scipy parts they import
+# on first use
+WARM_UP_MODULES = [data_fetcher, risk_metrics, stress_tests, portfolio_context,
+                   'scipy.linalg', 'scipy.cluster.hierarchy']
+
+
+class ArrayJSONProvider(DefaultJSONProvider):
+    """JSON provider that also writes NumPy arrays (e.g. packed correlations)."""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, np.ndarray):
+            # float32 values are rounded to their precision to keep JSON short
+            if o.dtype == np.float32:
+                return np.round(o.astype(float), 7).tolist()
+            return o.tolist()
+        return DefaultJSONProvider.default(o)
+
 
 app = Flask(__name__)
-CORS(app)
+app.json = ArrayJSONProvider(app)
+CORS(app, expose_headers=['ETag', 'X-Cache', 'Server-Timing', 'X-Profile'])
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shared cache of serialized metric and stress-test responses
+result_cache = ResultCache()
+
+# Upper bound on scenarios per Monte Carlo request
+MAX_MC_SCENARIOS = 5000000
+
+# Upper bound on random draws (scenarios x horizon x assets for multi-day
+# runs) per /api/monte-carlo-var request, about 10 s on one core; larger
+# simulations go through /api/jobs, which allows MAX_MC_JOB_DRAWS
+MAX_MC_DRAWS = 200000000
+MAX_MC_JOB_DRAWS = 10000000000
+
+# Upper bound on tail risk confidence levels per metrics request
+MAX_CONFIDENCE_LEVELS = 10
+
+# Upper bound on bootstrap resamples per metrics request
+MAX_BOOTSTRAP_RESAMPLES = 100000
+
+# Upper bound on crisis periods supplied with one request
+MAX_CRISIS_PERIODS = 100
+
+# Bounds on hypothetical scenario requests (scenarios, factor proxies, and
+# scenario x portfolio P&L values)
+MAX_SCENARIOS = 200000
+MAX_SCENARIO_FACTORS = 20
+MAX_SCENARIO_RESULTS = 20000000
+
+# Upper bound on efficient frontier points per request
+MAX_FRONTIER_POINTS = 500
+
+# Bounds on rolling analytics requests (windows per request, longest window,
+# asset pairs correlated)
+MAX_ROLLING_WINDOWS = 8
+MAX_ROLLING_WINDOW = 2520
+MAX_ROLLING_PAIRS = 500
+
+# Upper bound on backtest transaction costs (basis points per unit traded)
+MAX_TRANSACTION_COST_BPS = 1000
+
+# Background jobs (POST /api/jobs) run in a local process pool
+job_manager = JobManager()
+JOB_TYPES = ('metrics', 'stress_test', 'monte_carlo')
+
+
+def parse_portfolio_request(data, batch=False, require_weights=True):
+    """
+    Extract and validate the common portfolio request fields.
+
+    Args:
+        data (dict): Parsed JSON request body
+        batch (bool): If True, weights is a list of weight rows (one per
+            portfolio) and is returned as an N x K array
+        require_weights (bool): If False, weights may be omitted (returned
+            as None)
+
+    Returns:
+        tuple: (params, error) where params is a dict with tickers
+            (upper-cased), weights, start_date and end_date, and error is a
+            message or None
+    """
+    # Extract parameters
+    tickers = data.get('tickers')
+    weights = data.get('weights')
+    start_date = data.get('start_date')
+    end_date = data.get('end_date')
+
+    # Validate required fields
+    if not tickers:
+        return None, 'Tickers are required'
+    if not isinstance(tickers, list):
+        return None, 'Tickers must be a list'
+    if not weights and require_weights:
+        return None, 'Weights are required'
+    if not start_date:
+        return None, 'Start date is required'
+    if not end_date:
+        return None, 'End date is required'
+
+    if weights:
+        # Validate tickers and weights length match
+        if not batch and len(tickers) != len(weights):
+            return None, 'Number of tickers and weights must match'
+
+        # Validate weights
+        try:
+            if batch:
+                weights = data_fetcher.validate_weight_matrix(weights, len(tickers))
+            else:
+                data_fetcher.validate_weights(weights)
+        except ValueError as e:
+            return None, str(e)
+    else:
+        weights = None
+
+    # Validate date format
+    try:
+        datetime.strptime(start_date, '%Y-%m-%d')
+        datetime.strptime(end_date, '%Y-%m-%d')
+    except ValueError:
+        return None, 'Dates must be in YYYY-MM-DD format'
+
+    # One spelling per symbol, so the computation, the response and the
+    # result cache key all see the same tickers
+    tickers = [str(t).upper().strip() for t in tickers]
+
+    return {
+        'tickers': tickers,
+        'weights': weights,
+        'start_date': start_date,
+        'end_date': end_date
+    }, None
+
+
+def parse_max_points(data):
+    """
+    Extract the optional chart resolution from a request body.
+
+    Args:
+        data (dict): Parsed JSON request body
+
+    Returns:
+        tuple: (max_points, error) where max_points is an int or None (full
+            resolution) and error is a message or None
+    """
+    max_points = data.get('max_points')
+    if max_points is None:
+        return None, None
+
+    try:
+        max_points = int(max_points)
+    except (ValueError, TypeError):
+        return None, 'max_points must be an integer'
+
+    if max_points < MIN_POINTS:
+        return None, f'max_points must be at least {MIN_POINTS}'
+
+    return max_points, None
+
+
+def parse_crisis_periods(data):
+    """
+    Extract the optional per-request crisis periods.
+
+    Args:
+        data (dict): Parsed JSON request body
+
+    Returns:
+        tuple: (periods, error) where periods is a dict by id, or None to use
+            the configured CRISIS_PERIODS, and error is a message or None
+    """
+    periods = data.get('crisis_periods')
+    if periods is None:
+        return None, None
+
+    try:
+        periods = stress_tests.validate_crisis_periods(periods)
+    except ValueError as e:
+        return None, str(e)
+
+    if len(periods) > MAX_CRISIS_PERIODS:
+        return None, f'At most {MAX_CRISIS_PERIODS} crisis periods are allowed'
+
+    return periods, None
+
+
+def periods_cache_key(periods):
+    """Cache key part for custom crisis periods ('' for the configured ones)."""
+    return json.dumps(periods, sort_keys=True) if periods else ''
+
+
+def parse_correlation_options(data):
+    """
+    Extract the optional correlation settings of a metrics request.
+
+    Args:
+        data (dict): Parsed JSON request body
+
+    Returns:
+        tuple: (options, error) where options holds the correlation keyword
+            arguments for calculate_all_metrics and error is a message or None
+    """
+    mode = data.get('correlation_mode', 'auto')
+    if mode not in CORRELATION_MODES:
+        return None, f"correlation_mode must be one of: {', '.join(CORRELATION_MODES)}"
+
+    try:
+        top_k = int(data.get('top_k', DEFAULT_TOP_K))
+    except (ValueError, TypeError):
+        return None, 'top_k must be an integer'
+    if not 1 <= top_k <= 50:
+        return None, 'top_k must be between 1 and 50'
+
+    return {
+        'correlation_mode': mode,
+        'shrinkage': bool(data.get('shrinkage', False)),
+        'top_k': top_k
+    }, None
+
+
+def parse_monte_carlo_options(data, num_assets, max_draws=MAX_MC_DRAWS):
+    """
+    Extract and validate the optional Monte Carlo simulation settings.
+
+    Args:
+        data (dict): Parsed JSON request body
+        num_assets (int): Number of portfolio tickers
+        max_draws (int): Upper bound on simulation_draws for the request
+
+    Returns:
+        tuple: (options, error) where options holds keyword arguments for
+            calculate_monte_carlo_var and error is a message or None
+    """
+    try:
+        n_scenarios = int(data.get('n_scenarios', 100000))
+        horizon = int(data.get('horizon', 1))
+        dof = float(data.get('dof', 5))
+        confidence_levels = [float(c) for c in data.get('confidence_levels', [0.95, 0.99])]
+        seed = data.get('seed')
+        seed = int(seed) if seed is not None else None
+    except (ValueError, TypeError):
+        return None, 'Simulation settings must be numeric'
+
+    distribution = data.get('distribution', 'normal')
+    if distribution not in DISTRIBUTIONS:
+        return None, f"Distribution must be one of: {', '.join(DISTRIBUTIONS)}"
+    if not 1000 <= n_scenarios <= MAX_MC_SCENARIOS:
+        return None, f'Number of scenarios must be between 1000 and {MAX_MC_SCENARIOS}'
+    if not 1 <= horizon <= 252:
+        return None, 'Horizon must be between 1 and 252 days'
+    if not confidence_levels or not all(0.5 < c < 1 for c in confidence_levels):
+        return None, 'Confidence levels must be between 0.5 and 1'
+    draws = simulation_draws(n_scenarios, horizon, num_assets)
+    if draws > max_draws:
+        hint = ' (submit larger simulations to /api/jobs)' if max_draws < MAX_MC_JOB_DRAWS else ''
+        return None, (f'Simulation too large: {draws:,} draws (scenarios x horizon x assets) '
+                      f'exceed the limit of {max_draws:,}{hint}')
+
+    return {
+        'confidence_levels': confidence_levels,
+        'horizon': horizon,
+        'n_scenarios': n_scenarios,
+        'distribution': distribution,
+        'dof': dof,
+        'seed': seed
+    }, None
+
+
+def parse_confidence_levels(data):
+    """
+    Extract the tail risk confidence levels of a metrics request.
+
+    Args:
+        data (dict): Parsed JSON request body
+
+    Returns:
+        tuple: (levels, error) where levels is a sorted list of confidence
+            levels and error is a message or None
+    """
+    levels = data.get('confidence_levels', list(DEFAULT_CONFIDENCE_LEVELS))
+    if not isinstance(levels, list) or not levels:
+        return None, 'confidence_levels must be a non-empty list'
+    if len(levels) > MAX_CONFIDENCE_LEVELS:
+        return None, f'At most {MAX_CONFIDENCE_LEVELS} confidence levels are allowed'
+
+    try:
+        levels = sorted(set(float(c) for c in levels))
+    except (ValueError, TypeError):
+        return None, 'Confidence levels must be numeric'
+    if not all(0.5 <= c < 1 for c in levels):
+        return None, 'Confidence levels must be between 0.5 and 1'
+
+    return levels, None
+
+
+def parse_bootstrap_options(data):
+    """
+    Extract and validate the optional bootstrap confidence interval settings.
+
+    "confidence_intervals" may be true (defaults) or an object with any of
+    resamples, method, block_length, confidence and seed.
+
+    Args:
+        data (dict): Parsed JSON request body
+
+    Returns:
+        tuple: (options, error) where options holds keyword arguments for
+            bootstrap_confidence_intervals (None when not requested) and
+            error is a message or None
+    """
+    settings = data.get('confidence_intervals')
+    if not settings:
+        return None, None
+    if settings is True:
+        settings = {}
+    if not isinstance(settings, dict):
+        return None, 'confidence_intervals must be true or an object'
+
+    try:
+        resamples = int(settings.get('resamples', DEFAULT_RESAMPLES))
+        confidence = float(settings.get('confidence', DEFAULT_CONFIDENCE))
+        seed = int(settings.get('seed', DEFAULT_SEED))
+        block_length = settings.get('block_length')
+        block_length = float(block_length) if block_length is not None else None
+    except (ValueError, TypeError):
+        return None, 'Bootstrap settings must be numeric'
+
+    method = settings.get('method', 'stationary')
+    if method not in BOOTSTRAP_METHODS:
+        return None, f"Bootstrap method must be one of: {', '.join(BOOTSTRAP_METHODS)}"
+    if not 100 <= resamples <= MAX_BOOTSTRAP_RESAMPLES:
+        return None, f'Bootstrap resamples must be between 100 and {MAX_BOOTSTRAP_RESAMPLES}'
+    if not 0.5 <= confidence < 1:
+        return None, 'Confidence must be between 0.5 and 1'
+    if block_length is not None and block_length < 1:
+        return None, 'Block length must be at least 1 day'
+
+    return {
+        'resamples': resamples,
+        'method': method,
+        'block_length': block_length,
+        'confidence': confidence,
+        'seed': seed
+    }, None
+
+
+def parse_scenario_options(data, tickers, num_portfolios):
+    """
+    Extract and validate the hypothetical scenario settings.
+
+    Args:
+        data (dict): Parsed JSON request body
+        tickers (list): Validated portfolio tickers
+        num_portfolios (int): Number of weight rows
+
+    Returns:
+        tuple: (options, error) where options holds the validated spec,
+            top_n and loss_threshold, and error is a message or None
+    """
+    factors = data.get('factors') or []
+    if not isinstance(factors, list):
+        return None, 'factors must be a list of tickers'
+    factors = list(dict.fromkeys(str(f).upper().strip() for f in factors))
+    if len(factors) > MAX_SCENARIO_FACTORS:
+        return None, f'At most {MAX_SCENARIO_FACTORS} factors are allowed'
+
+    try:
+        top_n = int(data.get('top_n', DEFAULT_TOP_N))
+        loss_threshold = data.get('loss_threshold')
+        loss_threshold = float(loss_threshold) if loss_threshold is not None else None
+    except (ValueError, TypeError):
+        return None, 'top_n and loss_threshold must be numeric'
+    if not 0 <= top_n <= 100:
+        return None, 'top_n must be between 0 and 100'
+    if loss_threshold is not None and not 0 < loss_threshold <= 1:
+        return None, 'loss_threshold must be between 0 and 1'
+
+    try:
+        spec = validate_scenario_spec(data, tickers, factors, MAX_SCENARIOS)
+    except ValueError as e:
+        return None, str(e)
+    if spec['scenario_count'] * num_portfolios > MAX_SCENARIO_RESULTS:
+        return None, (f"{spec['scenario_count']} scenarios x {num_portfolios} portfolios is too many; "
+                      f"at most {MAX_SCENARIO_RESULTS} results are allowed")
+
+    return {'spec': spec, 'top_n': top_n, 'loss_threshold': loss_threshold}, None
+
+
+def parse_optimize_options(data, tickers):
+    """
+    Extract and validate the optimization constraints and frontier settings.
+
+    Args:
+        data (dict): Parsed JSON request body
+        tickers (list): Validated portfolio tickers
+
+    Returns:
+        tuple: (options, error) where options holds min_weight, max_weight
+            and per-ticker bounds (all in percent), points and
+            risk_free_rate, and error is a message or None
+    """
+    try:
+        min_weight = float(data.get('min_weight', 0))
+        max_weight = float(data.get('max_weight', 100))
+        points = int(data.get('points', DEFAULT_FRONTIER_POINTS))
+        risk_free_rate = float(data.get('risk_free_rate', 0.04))
+        bounds = {
+            str(ticker).upper().strip(): [float(low), float(high)]
+            for ticker, (low, high) in (data.get('bounds') or {}).items()
+        }
+    except (ValueError, TypeError, AttributeError):
+        return None, 'Weight bounds, points and risk_free_rate must be numeric'
+
+    if not 2 <= points <= MAX_FRONTIER_POINTS:
+        return None, f'points must be between 2 and {MAX_FRONTIER_POINTS}'
+
+    positions = {str(t).upper().strip(): i for i, t in enumerate(tickers)}
+    unknown = sorted(set(bounds) - set(positions))
+    if unknown:
+        return None, f"Bounds reference tickers not in the portfolio: {', '.join(unknown)}"
+
+    # Check the bounds admit a fully invested portfolio
+    try:
+        portfolio_bounds(len(tickers), min_weight / 100, max_weight / 100,
+                         {positions[t]: (low / 100, high / 100) for t, (low, high) in bounds.items()})
+    except ValueError as e:
+        return None, str(e)
+
+    return {
+        'min_weight': min_weight,
+        'max_weight': max_weight,
+        'bounds': bounds,
+        'points': points,
+        'risk_free_rate': risk_free_rate
+    }, None
+
+
+def parse_rolling_options(data, tickers):
+    """
+    Extract and validate the rolling windows and correlation pairs.
+
+    Args:
+        data (dict): Parsed JSON request body
+        tickers (list): Validated portfolio tickers
+
+    Returns:
+        tuple: (windows, pairs, error) where windows is a sorted list of day
+            counts, pairs a list of (ticker, ticker) tuples and error is a
+            message or None
+    """
+    try:
+        windows = sorted({int(w) for w in data.get('windows', DEFAULT_WINDOWS)})
+    except (ValueError, TypeError):
+        return None, None, 'windows must be a list of integers'
+
+    if not 1 <= len(windows) <= MAX_ROLLING_WINDOWS:
+        return None, None, f'Between 1 and {MAX_ROLLING_WINDOWS} windows are allowed'
+    if windows[0] < 2 or windows[-1] > MAX_ROLLING_WINDOW:
+        return None, None, f'Windows must be between 2 and {MAX_ROLLING_WINDOW} days'
+
+    # Correlation pairs default to every pair of tickers
+    pairs = data.get('pairs')
+    if pairs is None:
+        pairs = [(a, b) for i, a in enumerate(tickers) for b in tickers[i + 1:]]
+    elif not isinstance(pairs, list) or not all(isinstance(p, list) and len(p) == 2 for p in pairs):
+        return None, None, 'pairs must be a list of [ticker, ticker] pairs'
+    else:
+        pairs = [(str(a).upper().strip(), str(b).upper().strip()) for a, b in pairs]
+        unknown = sorted({t for pair in pairs for t in pair} - set(tickers))
+        if unknown:
+            return None, None, f"Pairs reference tickers not in the portfolio: {', '.join(unknown)}"
+
+    if len(pairs) > MAX_ROLLING_PAIRS:
+        return None, None, (f'At most {MAX_ROLLING_PAIRS} correlation pairs are allowed; '
+                            'pass "pairs" to choose them')
+
+    return windows, pairs, None
+
+
+def parse_backtest_options(data):
+    """
+    Extract and validate the rebalancing policy of a backtest request.
+
+    Args:
+        data (dict): Parsed JSON request body
+
+    Returns:
+        tuple: (options, error) where options holds rebalance (schedule),
+            drift_threshold (percent or None), transaction_cost_bps and
+            risk_free_rate, and error is a message or None
+    """
+    rebalance = data.get('rebalance', DEFAULT_SCHEDULE)
+    if rebalance not in REBALANCE_SCHEDULES:
+        return None, f"rebalance must be one of: {', '.join(REBALANCE_SCHEDULES)}"
+
+    try:
+        drift_threshold = data.get('drift_threshold')
+        if drift_threshold is not None:
+            drift_threshold = float(drift_threshold)
+        transaction_cost_bps = float(data.get('transaction_cost_bps', 0))
+        risk_free_rate = float(data.get('risk_free_rate', 0.04))
+    except (ValueError, TypeError):
+        return None, 'drift_threshold, transaction_cost_bps and risk_free_rate must be numeric'
+
+    if drift_threshold is not None and not 0 < drift_threshold < 100:
+        return None, 'drift_threshold must be between 0 and 100 (percentage points)'
+    if not 0 <= transaction_cost_bps <= MAX_TRANSACTION_COST_BPS:
+        return None, f'transaction_cost_bps must be between 0 and {MAX_TRANSACTION_COST_BPS}'
+
+    return {
+        'rebalance': rebalance,
+        'drift_threshold': drift_threshold,
+        'transaction_cost_bps': transaction_cost_bps,
+        'risk_free_rate': risk_free_rate
+    }, None
+
+
+def negotiated_response(result, status=200):
+    """
+    Serialize a result as JSON or columnar MessagePack, per the Accept header.
+
+    Args:
+        result (dict): JSON-ready result
+        status (int): HTTP status code
+
+    Returns:
+        flask.Response: Response in the negotiated format
+    """
+    mimetype = negotiate_mimetype(request.accept_mimetypes)
+    with stage('serialize'):
+        body = serialize(result, mimetype, app.json.dumps)
+    return app.response_class(body, status=status, mimetype=mimetype, headers={'Vary': 'Accept'})
+
+
+async def cached_response(kind, params, compute):
+    """
+    Serve a result from the result cache, computing it on a miss.
+
+    The body is JSON or columnar MessagePack depending on the Accept header;
+    each format is cached under its own key and ETag. Responses carry an
+    ETag and Cache-Control header; a request whose If-None-Match matches the
+    cached ETag is answered with 304 and no body.
+
+    Args:
+        kind (str): Name of the computation, part of the cache key
+        params (dict): Validated request parameters
+        compute (callable): Coroutine function returning the result dict;
+            may raise ValueError
+
+    Returns:
+        flask.Response: JSON or MessagePack (200) or Not Modified (304) response
+    """
+    mimetype = negotiate_mimetype(request.accept_mimetypes)
+    key = make_cache_key(f"{kind}:{mimetype}", params['tickers'], params['weights'],
+                         params['start_date'], params['end_date'])
+
+    entry = result_cache.get(key)
+    cache_status = 'HIT'
+    if entry is None:
+        cache_status = 'MISS'
+        result = await compute()
+        with stage('serialize'):
+            body = serialize(result, mimetype, app.json.dumps)
+        entry = result_cache.put(key, body)
+
+    headers = {
+        'ETag': entry['etag'],
+        'Cache-Control': f"private, max-age={int(result_cache.ttl)}",
+        'Vary': 'Accept',
+        'X-Cache': cache_status
+    }
+
+    if request.if_none_match.contains(entry['etag'].strip('"')):
+        return app.response_class(status=304, headers=headers)
+
+    return app.response_class(entry['body'], status=entry['status'],
+                              mimetype=mimetype, headers=headers)
+
+
+def build_metrics_result(params, prices_df, benchmark_prices, max_points=None, correlation_options=None,
+                         periods=None, bootstrap_options=None, confidence_levels=DEFAULT_CONFIDENCE_LEVELS):
+    """
+    Compute the /api/calculate-metrics response (runs in the compute pool).
+
+    Args:
+        params (dict): Validated request parameters
+        prices_df (pd.DataFrame): Portfolio prices
+        benchmark_prices (pd.Series): Benchmark prices, or None
+        max_points (int, optional): Chart series resolution
+        correlation_options (dict, optional): From parse_correlation_options
+        periods (dict, optional): Crisis periods (default: configured periods)
+        bootstrap_options (dict, optional): From parse_bootstrap_options; adds
+            metrics.confidence_intervals
+        confidence_levels (list): Tail risk confidence levels (see parse_confidence_levels)
+
+    Returns:
+        dict: Response body
+    """
+    weights = params['weights']
+
+    # Prepare returns and value series once for metrics and stress tests
+    with stage('returns'):
+        context = portfolio_context.PortfolioContext(prices_df, weights, benchmark_prices)
+        # Build the lazy returns and value series now so their cost lands here
+        context.cumulative_returns
+
+    # Calculate all metrics
+    with stage('metrics'):
+        metrics = risk_metrics.calculate_all_metrics(prices_df, weights, benchmark_prices,
+                                                     context=context, max_points=max_points,
+                                                     confidence_levels=confidence_levels,
+                                                     **(correlation_options or {}))
+
+    # Bootstrap confidence intervals of the headline metrics
+    if bootstrap_options:
+        with stage('bootstrap'):
+            metrics['confidence_intervals'] = bootstrap_confidence_intervals(
+                context.portfolio_returns, context.benchmark_returns, **bootstrap_options)
+
+    # Run stress tests
+    with stage('stress'):
+        stress_results = stress_tests.run_all_stress_tests(prices_df, weights, context=context, periods=periods)
+
+    logger.info(f"Successfully calculated metrics for {len(params['tickers'])} tickers")
+
+    # Prepare response
+    return {
+        **params,
+        'metrics': metrics,
+        'stress_tests': stress_results
+    }
+
+
+def build_series_result(params, prices_df, zoom_start, zoom_end, max_points=None):
+    """
+    Compute the /api/calculate-metrics/series response (runs in the compute pool).
+
+    Args:
+        params (dict): Validated request parameters
+        prices_df (pd.DataFrame): Portfolio prices
+        zoom_start (str): First date of the zoom range
+        zoom_end (str): Last date of the zoom range
+        max_points (int, optional): Series resolution
+
+    Returns:
+        dict: Response body
+    """
+    # Series over the whole period, cut to the zoom range
+    context = portfolio_context.PortfolioContext(prices_df, params['weights'])
+    series = risk_metrics.calculate_chart_series(context, max_points=max_points,
+                                                 start_date=zoom_start, end_date=zoom_end)
+
+    logger.info(f"Successfully built chart series for {len(params['tickers'])} tickers")
+
+    # Prepare response
+    return {
+        **params,
+        'zoom_start': zoom_start,
+        'zoom_end': zoom_end,
+        'series': series
+    }
+
+
+def build_rolling_result(params, prices_df, benchmark_prices, windows, pairs, max_points=None):
+    """
+    Compute the /api/rolling-metrics response (runs in the compute pool).
+
+    Args:
+        params (dict): Validated request parameters
+        prices_df (pd.DataFrame): Portfolio prices
+        benchmark_prices (pd.Series): Benchmark prices, or None
+        windows (list): Rolling windows in days
+        pairs (list): (ticker, ticker) pairs to correlate
+        max_points (int, optional): Series resolution
+
+    Returns:
+        dict: Response body
+    """
+    context = portfolio_context.PortfolioContext(prices_df, params['weights'], benchmark_prices)
+    rolling = risk_metrics.calculate_rolling_series(context, windows, pairs, max_points=max_points)
+
+    logger.info(f"Successfully calculated rolling metrics for {len(params['tickers'])} tickers")
+
+    # Prepare response
+    return {
+        **params,
+        'windows': windows,
+        'rolling': rolling
+    }
+
+
+def build_stress_test_result(params, prices_df, periods=None):
+    """
+    Compute the /api/stress-test response (runs in the compute pool).
+
+    Args:
+        params (dict): Validated request parameters
+        prices_df (pd.DataFrame): Portfolio prices
+        periods (dict, optional): Crisis periods (default: configured periods)
+
+    Returns:
+        dict: Response body
+    """
+    # Run stress tests
+    with stage('stress'):
+        stress_results = stress_tests.run_all_stress_tests(prices_df, params['weights'], periods=periods)
+
+    logger.info(f"Successfully completed stress tests for {len(params['tickers'])} tickers")
+
+    # Prepare response
+    return {
+        **params,
+        'stress_tests': stress_results
+    }
+
+
+def build_scenario_result(params, prices_df, options):
+    """
+    Compute the /api/scenarios response (runs in the compute pool).
+
+    Args:
+        params (dict): Validated request parameters
+        prices_df (pd.DataFrame): Prices of the portfolio tickers and factors
+        options (dict): From parse_scenario_options
+
+    Returns:
+        dict: Response body
+    """
+    analysis = run_scenario_analysis(prices_df[params['tickers']], params['weights'], options['spec'],
+                                     factor_prices=prices_df, top_n=options['top_n'],
+                                     loss_threshold=options['loss_threshold'])
+
+    logger.info(f"Successfully ran {analysis['scenario_count']} scenarios for "
+                f"{analysis['portfolio_count']} portfolios")
+
+    return {
+        'start_date': params['start_date'],
+        'end_date': params['end_date'],
+        **analysis
+    }
+
+
+def build_optimize_result(params, prices_df, options):
+    """
+    Compute the /api/optimize response (runs in the compute pool).
+
+    Args:
+        params (dict): Validated request parameters (weights may be None)
+        prices_df (pd.DataFrame): Portfolio prices
+        options (dict): From parse_optimize_options
+
+    Returns:
+        dict: Response body
+    """
+    tickers = params['tickers']
+    weights = params['weights']
+    context = portfolio_context.PortfolioContext(prices_df, weights if weights else [0.0] * len(tickers))
+
+    positions = {str(t).upper().strip(): i for i, t in enumerate(tickers)}
+    lower, upper = portfolio_bounds(
+        len(tickers), options['min_weight'] / 100, options['max_weight'] / 100,
+        {positions[t]: (low / 100, high / 100) for t, (low, high) in options['bounds'].items()})
+
+    optimized = optimize_portfolio(context.returns, lower, upper, options['points'], options['risk_free_rate'],
+                                   context.weights if weights else None)
+
+    logger.info(f"Successfully optimized {len(tickers)} tickers in {optimized['iterations']} solver iterations")
+
+    return {
+        **params,
+        'constraints': options,
+        **optimized
+    }
+
+
+def build_backtest_result(params, prices_df, options, max_points=None):
+    """
+    Compute the /api/backtest response (runs in the compute pool).
+
+    Args:
+        params (dict): Validated request parameters
+        prices_df (pd.DataFrame): Portfolio prices
+        options (dict): From parse_backtest_options
+        max_points (int, optional): Series resolution
+
+    Returns:
+        dict: Response body
+    """
+    context = portfolio_context.PortfolioContext(prices_df, params['weights'])
+
+    drift_threshold = options['drift_threshold']
+    backtest = risk_metrics.calculate_backtest(
+        context, options['rebalance'],
+        drift_threshold / 100 if drift_threshold is not None else None,
+        options['transaction_cost_bps'] / 10000, options['risk_free_rate'], max_points=max_points)
+
+    logger.info(f"Successfully backtested {len(params['tickers'])} tickers "
+                f"with {backtest['summary']['rebalances']} rebalances")
+
+    return {
+        **params,
+        'policy': options,
+        'backtest': backtest
+    }
+
+
+def build_batch_result(params, prices_df, benchmark_prices, periods=None):
+    """
+    Compute the /api/calculate-metrics/batch response (runs in the compute pool).
+
+    Args:
+        params (dict): Validated request parameters (weights is a matrix)
+        prices_df (pd.DataFrame): Portfolio prices
+        benchmark_prices (pd.Series): Benchmark prices
+        periods (list, optional): Crisis periods from parse_crisis_periods
+
+    Returns:
+        dict: Response body
+    """
+    weights_matrix = params['weights']
+
+    # Evaluate every portfolio over the shared returns matrix
+    with stage('metrics'):
+        batch_metrics = risk_metrics.calculate_batch_metrics(prices_df, weights_matrix, benchmark_prices)
+
+    # Every crisis period for every portfolio in one pass
+    with stage('stress'):
+        batch_stress_tests = stress_tests.run_batch_stress_tests(prices_df, weights_matrix, periods)
+
+    logger.info(f"Successfully calculated batch metrics for {len(weights_matrix)} portfolios")
+
+    return {
+        'tickers': params['tickers'],
+        'start_date': params['start_date'],
+        'end_date': params['end_date'],
+        'portfolio_count': len(weights_matrix),
+        'metrics': {
+            name: values.tolist() if values is not None else None
+            for name, values in batch_metrics.items()
+        },
+        'stress_tests': batch_stress_tests
+    }
+
+
+def build_monte_carlo_result(params, prices_df, options):
+    """
+    Compute the /api/monte-carlo-var response (runs in the compute pool).
+
+    Args:
+        params (dict): Validated request parameters
+        prices_df (pd.DataFrame): Portfolio prices
+        options (dict): From parse_monte_carlo_options
+
+    Returns:
+        dict: Response body
+    """
+    # Simulate scenarios and measure the tail
+    with stage('simulate'):
+        simulation = calculate_monte_carlo_var(prices_df, params['weights'], **options)
+
+    logger.info(f"Successfully calculated Monte Carlo VaR for {len(params['tickers'])} tickers")
+
+    return {
+        **params,
+        'monte_carlo': simulation
+    }
+
+
+def run_metrics_job(params, max_points=None, correlation_options=None, periods=None, bootstrap_options=None,
+                    confidence_levels=DEFAULT_CONFIDENCE_LEVELS):
+    """Background job: fetch prices and compute the calculate-metrics response."""
+    report_progress(0.1, 'Fetching prices')
+    prices_df, benchmark_prices = data_fetcher.fetch_with_benchmark(params['tickers'], params['start_date'],
+                                                                    params['end_date'], 'SPY')
+
+    report_progress(0.4, 'Calculating metrics and stress tests')
+    return build_metrics_result(params, prices_df, benchmark_prices, max_points, correlation_options, periods,
+                                bootstrap_options, confidence_levels)
+
+
+def run_stress_test_job(params, periods=None):
+    """Background job: fetch prices and compute the stress-test response."""
+    report_progress(0.1, 'Fetching prices')
+    prices_df = data_fetcher.fetch_multiple_tickers(params['tickers'], params['start_date'], params['end_date'])
+
+    report_progress(0.5, 'Running stress tests')
+    return build_stress_test_result(params, prices_df, periods)
+
+
+def run_monte_carlo_job(params, options):
+    """Background job: fetch prices and run the Monte Carlo VaR simulation."""
+    report_progress(0.1, 'Fetching prices')
+    prices_df = data_fetcher.fetch_multiple_tickers(params['tickers'], params['start_date'], params['end_date'])
+
+    report_progress(0.3, f"Simulating {options['n_scenarios']} scenarios")
+    return build_monte_carlo_result(params, prices_df, options)
+
+
+@app.before_request
+def start_instrumentation():
+    """Start stage timings and, if asked for and allowed, the sampling profiler."""
+    g.instrumentation = start_request(request.url_rule.rule if request.url_rule else 'unmatched')
+    g.profiler = None
+    if profiling_enabled() and (request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'):
+        g.profiler = SamplingProfiler().start()
+
+
+@app.after_request
+def finish_instrumentation(response):
+    """Add the Server-Timing header and record the request latency."""
+    state = g.get('instrumentation')
+    if state is None:
+        return response
+
+    profiler = g.get('profiler')
+    if profiler is not None:
+        profiler.stop()
+        try:
+            response.headers['X-Profile'] = profiler.save(state['endpoint'].strip('/').replace('/', '_'))
+        except OSError as e:
+            logger.error(f"Could not save profile: {str(e)}")
+
+    response.headers['Server-Timing'] = finish_request(state, request.method, response.status_code)
+    return response
+
+
+def collect_service_metrics():
+    """Scrape-time samples from the result cache, download deduplication and jobs."""
+    cache = result_cache.stats()
+    flights = data_fetcher.download_flight_stats()
+    jobs = job_manager.stats()
+    return [
+        ('result_cache_lookups_total', 'counter', 'Result cache lookups by outcome',
+         [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])]),
+        ('result_cache_removals_total', 'counter', 'Result cache entries removed',
+         [({'reason': 'evicted'}, cache['evictions']), ({'reason': 'expired'}, cache['expirations'])]),
+        ('result_cache_entries', 'gauge', 'Result cache entries', [({}, cache['size'])]),
+        ('result_cache_bytes', 'gauge', 'Size of the cached response bodies', [({}, cache['bytes'])]),
+        ('price_fetch_calls_total', 'counter', 'Price loads that started a download',
+         [({}, flights['calls'])]),
+        ('price_fetch_shared_total', 'counter', 'Price loads served by a download already in flight',
+         [({}, flights['shared'])]),
+        ('price_fetch_in_flight', 'gauge', 'Downloads in flight', [({}, flights['in_flight'])]),
+        ('jobs', 'gauge', 'Background jobs by status',
+         [({'status': status}, jobs[status]) for status in ('queued', 'running', 'succeeded', 'failed')]),
+    ]
+
+
+REGISTRY.add_collector(collect_service_metrics)
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Test endpoint to verify the server is running"""
@@ -20,16 +995,196 @@ def health_check():
         'message': 'Portfolio Risk Dashboard API is running'
     })
 
-@app.route('/api/test', methods=['GET'])
-def test():
-    """Basic test endpoint"""
-    return jsonify({
-        'message': 'API test successful',
-        'version': '1.0.0'
-    })
+
+def warm_up_process():
+    """
+    Import the heavy modules and open the price sources in this process.
+
+    Module-level so compute pool workers can run it too.
+
+    Returns:
+        dict: Seconds taken per module
+    """
+    timings = warm_up(WARM_UP_MODULES)
+    if data_fetcher.get_provider().name == 'yfinance':
+        timings.update(warm_up(['yfinance']))
+    data_fetcher.get_price_panel()
+    return timings
+
+
+@app.route('/api/warmup', methods=['POST'])
+def warmup():
+    """
+    Load everything the first real request would otherwise wait for.
+
+    Meant to be called once /api/health answers (e.g. from a readiness or
+    post-start hook): imports pandas, scipy and the price provider, opens
+    the price panel and starts the compute pool processes. Calling it
+    again is cheap.
+    """
+    start = time.perf_counter()
+    try:
+        modules = warm_up_process()
+        workers = warm_up_cpu_pool(warm_up_process)
+    except Exception as e:
+        logger.error(f"Warm-up failed: {str(e)}")
+        return jsonify({'error': 'Warm-up failed'}), 500
+
+    return jsonify({
+        'status': 'warm',
+        'modules': {name: round(seconds, 4) for name, seconds in modules.items()},
+        'compute_tasks': workers,
+        'seconds': round(time.perf_counter() - start, 4)
+    })
+
+
+@app.route('/api/test', methods=['GET'])
+def test():
+    """Basic test endpoint"""
+    return jsonify({
+        'message': 'API test successful',
+        'version': '1.0.0'
+    })
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Result cache hit/miss/eviction counters"""
+    return jsonify(result_cache.stats())
+
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request, stage, cache and fetch metrics in the Prometheus text format"""
+    return app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/jobs', methods=['GET'])
+def job_stats():
+    """Background job counts by status"""
+    return jsonify(job_manager.stats())
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Start a long-running computation in the background.
+
+    Expected JSON body: the /api/calculate-metrics body plus a job type, and
+    the Monte Carlo settings for "monte_carlo" jobs:
+    {
+        "job_type": "metrics",          (metrics, stress_test, monte_carlo)
+        "tickers": ["SPY", "QQQ", "GLD"],
+        "weights": [40, 30, 30],
+        "start_date": "2023-01-01",
+        "end_date": "2024-01-01"
+    }
+
+    Returns 202 with the job id; poll GET /api/jobs/<job_id> for progress
+    and the result.
+    """
+    try:
+        # Get request data
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        job_type = data.get('job_type', 'metrics')
+        if job_type not in JOB_TYPES:
+            return jsonify({'error': f"Job type must be one of: {', '.join(JOB_TYPES)}"}), 400
+
+        # Extract and validate parameters
+        params, error = parse_portfolio_request(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        # Job-specific settings
+        periods, error = parse_crisis_periods(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        if job_type == 'metrics':
+            max_points, error = parse_max_points(data)
+            correlation_options, correlation_error = parse_correlation_options(data)
+            bootstrap_options, bootstrap_error = parse_bootstrap_options(data)
+            confidence_levels, levels_error = parse_confidence_levels(data)
+            error = error or correlation_error or bootstrap_error or levels_error
+            job = (run_metrics_job, params, max_points, correlation_options, periods, bootstrap_options,
+                   confidence_levels)
+        elif job_type == 'stress_test':
+            job = (run_stress_test_job, params, periods)
+        else:
+            options, error = parse_monte_carlo_options(data, len(params['tickers']), MAX_MC_JOB_DRAWS)
+            job = (run_monte_carlo_job, params, options)
+        if error:
+            return jsonify({'error': error}), 400
+
+        try:
+            job_id = job_manager.submit(job_type, *job)
+        except JobQueueFullError as e:
+            logger.error(f"Job rejected: {str(e)}")
+            return jsonify({'error': str(e)}), 503
+
+        status_url = url_for('get_job', job_id=job_id)
+        return jsonify({
+            'job_id': job_id,
+            'job_type': job_type,
+            'status': 'queued',
+            'status_url': status_url
+        }), 202, {'Location': status_url}
+
+    except Exception as e:
+        logger.error(f"Unexpected error in submit_job: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Status of a background job.
+
+    Returns the status (queued, running, succeeded, failed), progress (0 to
+    1) and current stage, plus the error once the job has failed. Polls stay
+    small: once the job has succeeded, result_url points at the result.
+    Finished jobs are kept in a bounded store and eventually answer 404.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    del job['result']
+    if job['status'] == 'succeeded':
+        job['result_url'] = url_for('get_job_result', job_id=job_id)
+    return negotiated_response(job)
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """
+    Result of a succeeded background job.
+
+    A job's result never changes, so it carries an ETag and a request whose
+    If-None-Match matches is answered with 304 and no body. Returns 409 while
+    the job is unfinished or failed.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] != 'succeeded':
+        return jsonify({'error': f"Job is {job['status']}"}), 409
+
+    etag = f'"job-{job_id}"'
+    if request.if_none_match.contains(etag.strip('"')):
+        return app.response_class(status=304, headers={'ETag': etag, 'Vary': 'Accept'})
+
+    response = negotiated_response(job['result'])
+    response.headers['ETag'] = etag
+    return response
+
 
 @app.route('/api/fetch-data', methods=['POST'])
-def fetch_data():
+async def fetch_data():
     """
     Fetch historical stock data for a portfolio.
 
@@ -48,42 +1203,19 @@ def fetch_data():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
-        # Extract parameters
-        tickers = data.get('tickers')
-        weights = data.get('weights')
-        start_date = data.get('start_date')
-        end_date = data.get('end_date')
-
-        # Validate required fields
-        if not tickers:
-            return jsonify({'error': 'Tickers are required'}), 400
-        if not weights:
-            return jsonify({'error': 'Weights are required'}), 400
-        if not start_date:
-            return jsonify({'error': 'Start date is required'}), 400
-        if not end_date:
-            return jsonify({'error': 'End date is required'}), 400
-
-        # Validate tickers and weights length match
-        if len(tickers) != len(weights):
-            return jsonify({'error': 'Number of tickers and weights must match'}), 400
-
-        # Validate weights
-        try:
-            validate_weights(weights)
-        except ValueError as e:
-            return jsonify({'error': str(e)}), 400
+        # Extract and validate parameters
+        params, error = parse_portfolio_request(data)
+        if error:
+            return jsonify({'error': error}), 400
 
-        # Validate date format
-        try:
-            datetime.strptime(start_date, '%Y-%m-%d')
-            datetime.strptime(end_date, '%Y-%m-%d')
-        except ValueError:
-            return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+        tickers = params['tickers']
+        weights = params['weights']
+        start_date = params['start_date']
+        end_date = params['end_date']
 
         # Fetch data
         try:
-            prices_df = fetch_multiple_tickers(tickers, start_date, end_date)
+            prices_df = await run_fetch(data_fetcher.fetch_multiple_tickers, tickers, start_date, end_date)
 
             # Convert DataFrame to JSON format
             result = {
@@ -99,19 +1231,23 @@ def fetch_data():
             }
 
             logger.info(f"Successfully fetched data for {len(tickers)} tickers")
-            return jsonify(result), 200
+            return negotiated_response(result)
 
         except ValueError as e:
             logger.error(f"Error fetching data: {str(e)}")
             return jsonify({'error': str(e)}), 400
 
+        except FetchTimeoutError as e:
+            logger.error(f"Timed out fetching data: {str(e)}")
+            return jsonify({'error': str(e)}), 504
+
     except Exception as e:
         logger.error(f"Unexpected error in fetch_data: {str(e)}")
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
 
 @app.route('/api/calculate-metrics', methods=['POST'])
-def calculate_metrics():
+async def calculate_metrics():
     """
     Calculate risk metrics for a portfolio.
 
@@ -120,8 +1256,25 @@ def calculate_metrics():
         "tickers": ["SPY", "QQQ", "GLD"],
         "weights": [40, 30, 30],
         "start_date": "2023-01-01",
-        "end_date": "2024-01-01"
+        "end_date": "2024-01-01",
+        "max_points": 1000,             (optional, downsample chart series)
+        "correlation_mode": "auto",     (optional, auto, full or compact)
+        "shrinkage": false,             (optional, Ledoit-Wolf correlations)
+        "top_k": 5,                     (optional, top pairs per asset, compact)
+        "crisis_periods": [...],        (optional, as for /api/stress-test)
+        "confidence_levels": [0.95, 0.99],  (optional, tail risk levels)
+        "confidence_intervals": {       (optional, or true for the defaults)
+            "resamples": 1000,
+            "method": "stationary",     (stationary or block bootstrap)
+            "block_length": 6,          (optional, mean block length in days)
+            "confidence": 0.95,
+            "seed": 0
+        }
     }
+
+    Portfolios of more than 100 assets get the compact correlation summary
+    (packed upper triangle, top pairs, clustered order) under
+    metrics.correlation instead of the nested correlation_matrix.
     """
     try:
         # Get request data
@@ -130,85 +1283,267 @@ def calculate_metrics():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
-        # Extract parameters
-        tickers = data.get('tickers')
-        weights = data.get('weights')
-        start_date = data.get('start_date')
-        end_date = data.get('end_date')
-
-        # Validate required fields
-        if not tickers:
-            return jsonify({'error': 'Tickers are required'}), 400
-        if not weights:
-            return jsonify({'error': 'Weights are required'}), 400
-        if not start_date:
-            return jsonify({'error': 'Start date is required'}), 400
-        if not end_date:
-            return jsonify({'error': 'End date is required'}), 400
+        with stage('validate'):
+            # Extract and validate parameters
+            params, error = parse_portfolio_request(data)
+            if error:
+                return jsonify({'error': error}), 400
 
-        # Validate tickers and weights length match
-        if len(tickers) != len(weights):
-            return jsonify({'error': 'Number of tickers and weights must match'}), 400
+            max_points, error = parse_max_points(data)
+            if error:
+                return jsonify({'error': error}), 400
 
-        # Validate weights
+            correlation_options, error = parse_correlation_options(data)
+            if error:
+                return jsonify({'error': error}), 400
+
+            periods, error = parse_crisis_periods(data)
+            if error:
+                return jsonify({'error': error}), 400
+
+            bootstrap_options, error = parse_bootstrap_options(data)
+            if error:
+                return jsonify({'error': error}), 400
+
+            confidence_levels, error = parse_confidence_levels(data)
+            if error:
+                return jsonify({'error': error}), 400
+
+        tickers = params['tickers']
+        start_date = params['start_date']
+        end_date = params['end_date']
+
+        async def compute():
+            # SPY is fetched in the same batch as the portfolio for beta calculation
+            prices_df, benchmark_prices = await run_fetch(data_fetcher.fetch_with_benchmark, tickers,
+                                                          start_date, end_date, 'SPY')
+
+            # Metrics and stress tests run in the compute pool
+            return await run_cpu(build_metrics_result, params, prices_df, benchmark_prices, max_points,
+                                 correlation_options, periods, bootstrap_options, confidence_levels)
+
+        # Fetch data and compute, unless the same request is already cached
+        correlation_key = ':'.join(str(v) for v in correlation_options.values())
+        bootstrap_key = json.dumps(bootstrap_options, sort_keys=True) if bootstrap_options else ''
+        levels_key = ','.join(f"{c:g}" for c in confidence_levels)
         try:
-            validate_weights(weights)
+            return await cached_response(f"metrics:{max_points}:{correlation_key}:{periods_cache_key(periods)}:"
+                                         f"{bootstrap_key}:{levels_key}", params, compute)
+
         except ValueError as e:
+            logger.error(f"Error calculating metrics: {str(e)}")
             return jsonify({'error': str(e)}), 400
 
-        # Validate date format
+        except FetchTimeoutError as e:
+            logger.error(f"Timed out calculating metrics: {str(e)}")
+            return jsonify({'error': str(e)}), 504
+
+    except Exception as e:
+        logger.error(f"Unexpected error in calculate_metrics: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+
+@app.route('/api/calculate-metrics/series', methods=['POST'])
+async def calculate_metrics_series():
+    """
+    Chart series for a zoomed date range, at full resolution by default.
+
+    The series are computed over the whole analysis period (so values and
+    drawdowns match the overview charts) and cut to the zoom range.
+
+    Expected JSON body:
+    {
+        "tickers": ["SPY", "QQQ", "GLD"],
+        "weights": [40, 30, 30],
+        "start_date": "2023-01-01",
+        "end_date": "2024-01-01",
+        "zoom_start": "2023-03-01",     (optional, default start_date)
+        "zoom_end": "2023-06-30",       (optional, default end_date)
+        "max_points": 1000              (optional, downsample the range)
+    }
+    """
+    try:
+        # Get request data
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        # Extract and validate parameters
+        params, error = parse_portfolio_request(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        max_points, error = parse_max_points(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        tickers = params['tickers']
+        start_date = params['start_date']
+        end_date = params['end_date']
+        zoom_start = data.get('zoom_start') or start_date
+        zoom_end = data.get('zoom_end') or end_date
+
+        # Validate zoom range
         try:
-            datetime.strptime(start_date, '%Y-%m-%d')
-            datetime.strptime(end_date, '%Y-%m-%d')
-        except ValueError:
-            return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+            datetime.strptime(zoom_start, '%Y-%m-%d')
+            datetime.strptime(zoom_end, '%Y-%m-%d')
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Zoom dates must be in YYYY-MM-DD format'}), 400
+        if zoom_end < zoom_start:
+            return jsonify({'error': 'zoom_end must not be before zoom_start'}), 400
 
-        # Fetch data
+        async def compute():
+            prices_df = await run_fetch(data_fetcher.fetch_multiple_tickers, tickers, start_date, end_date)
+
+            # Series are built in the compute pool
+            return await run_cpu(build_series_result, params, prices_df, zoom_start, zoom_end, max_points)
+
+        # Fetch data and build the series, unless the same request is already cached
         try:
-            prices_df = fetch_multiple_tickers(tickers, start_date, end_date)
+            return await cached_response(f"series:{zoom_start}:{zoom_end}:{max_points}", params, compute)
 
-            # Check if SPY is in the portfolio for beta calculation
-            benchmark_prices = None
-            if 'SPY' in tickers:
-                benchmark_prices = prices_df['SPY']
-            else:
-                # Fetch SPY separately for beta calculation
-                try:
-                    spy_df = fetch_multiple_tickers(['SPY'], start_date, end_date)
-                    benchmark_prices = spy_df['SPY']
-                except:
-                    logger.warning("Could not fetch SPY for beta calculation")
+        except ValueError as e:
+            logger.error(f"Error building chart series: {str(e)}")
+            return jsonify({'error': str(e)}), 400
 
-            # Calculate all metrics
-            metrics = calculate_all_metrics(prices_df, weights, benchmark_prices)
+        except FetchTimeoutError as e:
+            logger.error(f"Timed out building chart series: {str(e)}")
+            return jsonify({'error': str(e)}), 504
 
-            # Run stress tests
-            stress_results = run_all_stress_tests(prices_df, weights)
+    except Exception as e:
+        logger.error(f"Unexpected error in calculate_metrics_series: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
 
-            # Prepare response
-            result = {
-                'tickers': tickers,
-                'weights': weights,
-                'start_date': start_date,
-                'end_date': end_date,
-                'metrics': metrics,
-                'stress_tests': stress_results
-            }
 
-            logger.info(f"Successfully calculated metrics for {len(tickers)} tickers")
-            return jsonify(result), 200
+@app.route('/api/rolling-metrics', methods=['POST'])
+async def rolling_metrics():
+    """
+    Rolling volatility, Sharpe Ratio, historical VaR, beta (vs SPY) and
+    pairwise correlations over several windows.
+
+    Expected JSON body:
+    {
+        "tickers": ["SPY", "QQQ", "GLD"],
+        "weights": [40, 30, 30],
+        "start_date": "2020-01-01",
+        "end_date": "2024-01-01",
+        "windows": [30, 60, 252],       (optional, days)
+        "pairs": [["SPY", "QQQ"]],      (optional, default every pair)
+        "max_points": 1000              (optional, downsample each series)
+    }
+    """
+    try:
+        # Get request data
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        # Extract and validate parameters
+        params, error = parse_portfolio_request(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        max_points, error = parse_max_points(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        tickers = params['tickers']
+        start_date = params['start_date']
+        end_date = params['end_date']
+
+        windows, pairs, error = parse_rolling_options(data, tickers)
+        if error:
+            return jsonify({'error': error}), 400
+
+        async def compute():
+            # SPY is fetched in the same batch as the portfolio for rolling beta
+            prices_df, benchmark_prices = await run_fetch(data_fetcher.fetch_with_benchmark, tickers,
+                                                          start_date, end_date, 'SPY')
+
+            # Rolling statistics run in the compute pool
+            return await run_cpu(build_rolling_result, params, prices_df, benchmark_prices,
+                                 windows, pairs, max_points)
+
+        # Fetch data and compute, unless the same request is already cached
+        try:
+            return await cached_response(f"rolling:{windows}:{pairs}:{max_points}", params, compute)
 
         except ValueError as e:
-            logger.error(f"Error calculating metrics: {str(e)}")
+            logger.error(f"Error calculating rolling metrics: {str(e)}")
             return jsonify({'error': str(e)}), 400
 
+        except FetchTimeoutError as e:
+            logger.error(f"Timed out calculating rolling metrics: {str(e)}")
+            return jsonify({'error': str(e)}), 504
+
     except Exception as e:
-        logger.error(f"Unexpected error in calculate_metrics: {str(e)}")
+        logger.error(f"Unexpected error in rolling_metrics: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+
+@app.route('/api/calculate-metrics/batch', methods=['POST'])
+async def calculate_metrics_batch():
+    """
+    Calculate headline risk metrics for many candidate portfolios at once.
+
+    Expected JSON body:
+    {
+        "tickers": ["SPY", "QQQ", "GLD"],
+        "weights": [[40, 30, 30], [60, 20, 20], [34, 33, 33]],
+        "start_date": "2023-01-01",
+        "end_date": "2024-01-01",
+        "crisis_periods": [...]         (optional, as for /api/stress-test)
+    }
+
+    Metrics and stress-test results are returned column-wise: each is a list
+    with one value per row of "weights".
+    """
+    try:
+        # Get request data
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        # Extract and validate parameters
+        params, error = parse_portfolio_request(data, batch=True)
+        if error:
+            return jsonify({'error': error}), 400
+
+        periods, error = parse_crisis_periods(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        tickers = params['tickers']
+        start_date = params['start_date']
+        end_date = params['end_date']
+
+        # Fetch data
+        try:
+            prices_df, benchmark_prices = await run_fetch(data_fetcher.fetch_with_benchmark,
+                                                          tickers, start_date, end_date, 'SPY')
+
+            # Metrics and stress tests for every portfolio run in the compute pool
+            result = await run_cpu(build_batch_result, params, prices_df, benchmark_prices, periods)
+            return negotiated_response(result)
+
+        except ValueError as e:
+            logger.error(f"Error calculating batch metrics: {str(e)}")
+            return jsonify({'error': str(e)}), 400
+
+        except FetchTimeoutError as e:
+            logger.error(f"Timed out calculating batch metrics: {str(e)}")
+            return jsonify({'error': str(e)}), 504
+
+    except Exception as e:
+        logger.error(f"Unexpected error in calculate_metrics_batch: {str(e)}")
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
 
 @app.route('/api/stress-test', methods=['POST'])
-def stress_test():
+async def stress_test():
     """
     Run stress tests on a portfolio.
 
@@ -217,8 +1552,83 @@ def stress_test():
         "tickers": ["SPY", "QQQ", "GLD"],
         "weights": [40, 30, 30],
         "start_date": "2023-01-01",
-        "end_date": "2024-01-01"
+        "end_date": "2024-01-01",
+        "crisis_periods": [             (optional, default: configured periods)
+            {"id": "svb", "name": "2023 Bank Failures",
+             "start_date": "2023-03-08", "end_date": "2023-03-13"}
+        ]
+    }
+    """
+    try:
+        # Get request data
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        with stage('validate'):
+            # Extract and validate parameters
+            params, error = parse_portfolio_request(data)
+            if error:
+                return jsonify({'error': error}), 400
+
+            periods, error = parse_crisis_periods(data)
+            if error:
+                return jsonify({'error': error}), 400
+
+        tickers = params['tickers']
+        start_date = params['start_date']
+        end_date = params['end_date']
+
+        async def compute():
+            prices_df = await run_fetch(data_fetcher.fetch_multiple_tickers, tickers, start_date, end_date)
+
+            # Stress tests run in the compute pool
+            return await run_cpu(build_stress_test_result, params, prices_df, periods)
+
+        # Fetch data and run stress tests, unless the same request is already cached
+        try:
+            return await cached_response(f"stress_test:{periods_cache_key(periods)}", params, compute)
+
+        except ValueError as e:
+            logger.error(f"Error running stress tests: {str(e)}")
+            return jsonify({'error': str(e)}), 400
+
+        except FetchTimeoutError as e:
+            logger.error(f"Timed out running stress tests: {str(e)}")
+            return jsonify({'error': str(e)}), 504
+
+    except Exception as e:
+        logger.error(f"Unexpected error in stress_test: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+
+@app.route('/api/scenarios', methods=['POST'])
+async def scenario_analysis():
+    """
+    Apply hypothetical shock scenarios to one or many portfolios.
+
+    Expected JSON body:
+    {
+        "tickers": ["SPY", "QQQ", "GLD", "TLT"],
+        "weights": [40, 20, 20, 20],    (or one row per portfolio)
+        "start_date": "2019-01-01",     (period used to estimate factor betas)
+        "end_date": "2024-01-01",
+        "factors": ["SPY", "GLD", "IEF"],   (optional factor proxy tickers)
+        "scenarios": [                  (optional named scenarios)
+            {"name": "Equity crash",
+             "factor_shocks": {"SPY": -0.20, "GLD": 0.05, "IEF": -0.08}},
+            {"name": "Tech selloff", "shocks": {"QQQ": -0.30}}
+        ],
+        "grid": {"factor_shocks": {"SPY": [-0.4, 0.1]}, "steps": 11},       (optional)
+        "random": {"factor_shocks": {"SPY": [-0.4, 0.1], "IEF": [-0.1, 0.1]},
+                   "n_scenarios": 10000, "seed": 1},                        (optional)
+        "loss_threshold": 0.15,         (optional, reverse stress test)
+        "top_n": 10                     (optional, worst scenarios listed)
     }
+
+    Shocks are returns over the scenario (-0.2 = -20%). A rates move is given
+    as the return of its proxy, e.g. about -0.08 for IEF on +100bp.
     """
     try:
         # Get request data
@@ -227,64 +1637,237 @@ def stress_test():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
-        # Extract parameters
-        tickers = data.get('tickers')
+        # Extract and validate parameters; weights may be a single row
         weights = data.get('weights')
-        start_date = data.get('start_date')
-        end_date = data.get('end_date')
-
-        # Validate required fields
-        if not tickers:
-            return jsonify({'error': 'Tickers are required'}), 400
-        if not weights:
-            return jsonify({'error': 'Weights are required'}), 400
-        if not start_date:
-            return jsonify({'error': 'Start date is required'}), 400
-        if not end_date:
-            return jsonify({'error': 'End date is required'}), 400
+        batch = isinstance(weights, list) and bool(weights) and isinstance(weights[0], list)
+        params, error = parse_portfolio_request(data, batch=batch)
+        if error:
+            return jsonify({'error': error}), 400
 
-        # Validate tickers and weights length match
-        if len(tickers) != len(weights):
-            return jsonify({'error': 'Number of tickers and weights must match'}), 400
+        tickers = params['tickers']
+        num_portfolios = len(params['weights']) if batch else 1
+        options, error = parse_scenario_options(data, tickers, num_portfolios)
+        if error:
+            return jsonify({'error': error}), 400
+
+        # Factor proxies are fetched with the portfolio in one batch
+        fetch_tickers = tickers + [f for f in options['spec']['factors'] if f not in tickers]
 
-        # Validate weights
         try:
-            validate_weights(weights)
+            prices_df = await run_fetch(data_fetcher.fetch_multiple_tickers, fetch_tickers,
+                                        params['start_date'], params['end_date'])
+
+            # Scenario P&L for every portfolio runs in the compute pool
+            result = await run_cpu(build_scenario_result, params, prices_df, options)
+            return negotiated_response(result)
+
         except ValueError as e:
+            logger.error(f"Error running scenarios: {str(e)}")
             return jsonify({'error': str(e)}), 400
 
-        # Validate date format
+        except FetchTimeoutError as e:
+            logger.error(f"Timed out running scenarios: {str(e)}")
+            return jsonify({'error': str(e)}), 504
+
+    except Exception as e:
+        logger.error(f"Unexpected error in scenario_analysis: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+
+@app.route('/api/optimize', methods=['POST'])
+async def optimize():
+    """
+    Minimum-variance, maximum Sharpe and efficient frontier portfolios.
+
+    Expected JSON body:
+    {
+        "tickers": ["SPY", "QQQ", "GLD", "TLT"],
+        "start_date": "2019-01-01",
+        "end_date": "2024-01-01",
+        "weights": [40, 20, 20, 20],    (optional, placed against the frontier)
+        "min_weight": 0,                (optional, percent per asset)
+        "max_weight": 40,               (optional, percent per asset)
+        "bounds": {"GLD": [5, 15]},     (optional, per-ticker percent bounds)
+        "points": 100,                  (optional, frontier points)
+        "risk_free_rate": 0.04          (optional)
+    }
+
+    Portfolios are long-only and fully invested; expected returns and
+    covariance are annualized from daily returns over the period.
+    """
+    try:
+        # Get request data
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        # Extract and validate parameters; the current weights are optional
+        params, error = parse_portfolio_request(data, require_weights=False)
+        if error:
+            return jsonify({'error': error}), 400
+
+        options, error = parse_optimize_options(data, params['tickers'])
+        if error:
+            return jsonify({'error': error}), 400
+
+        tickers = params['tickers']
+        start_date = params['start_date']
+        end_date = params['end_date']
+
+        async def compute():
+            prices_df = await run_fetch(data_fetcher.fetch_multiple_tickers, tickers, start_date, end_date)
+
+            # The frontier is solved in the compute pool
+            return await run_cpu(build_optimize_result, params, prices_df, options)
+
+        # Fetch data and optimize, unless the same request is already cached
         try:
-            datetime.strptime(start_date, '%Y-%m-%d')
-            datetime.strptime(end_date, '%Y-%m-%d')
-        except ValueError:
-            return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+            return await cached_response(f"optimize:{json.dumps(options, sort_keys=True)}",
+                                         {**params, 'weights': params['weights'] or []}, compute)
 
-        # Fetch data
+        except ValueError as e:
+            logger.error(f"Error optimizing portfolio: {str(e)}")
+            return jsonify({'error': str(e)}), 400
+
+        except FetchTimeoutError as e:
+            logger.error(f"Timed out optimizing portfolio: {str(e)}")
+            return jsonify({'error': str(e)}), 504
+
+    except Exception as e:
+        logger.error(f"Unexpected error in optimize: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+
+@app.route('/api/backtest', methods=['POST'])
+async def backtest():
+    """
+    Backtest the portfolio with periodic or drift-triggered rebalancing.
+
+    Expected JSON body:
+    {
+        "tickers": ["SPY", "TLT", "GLD"],
+        "weights": [60, 30, 10],
+        "start_date": "2000-01-01",
+        "end_date": "2024-01-01",
+        "rebalance": "monthly",         (optional: none, daily, weekly,
+                                         monthly, quarterly or annually)
+        "drift_threshold": 5,           (optional, percentage points)
+        "transaction_cost_bps": 10,     (optional, per unit traded)
+        "risk_free_rate": 0.04,         (optional)
+        "max_points": 1000              (optional, downsample each series)
+    }
+
+    The weights are targets: they drift with prices and are traded back at
+    each scheduled rebalance (the last trading day of each period) and
+    whenever a weight drifts more than drift_threshold from its target.
+    """
+    try:
+        # Get request data
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        # Extract and validate parameters
+        params, error = parse_portfolio_request(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        max_points, error = parse_max_points(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        options, error = parse_backtest_options(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        tickers = params['tickers']
+        start_date = params['start_date']
+        end_date = params['end_date']
+
+        async def compute():
+            prices_df = await run_fetch(data_fetcher.fetch_multiple_tickers, tickers, start_date, end_date)
+
+            # The backtest runs in the compute pool
+            return await run_cpu(build_backtest_result, params, prices_df, options, max_points)
+
+        # Fetch data and backtest, unless the same request is already cached
         try:
-            prices_df = fetch_multiple_tickers(tickers, start_date, end_date)
+            return await cached_response(f"backtest:{json.dumps(options, sort_keys=True)}:{max_points}",
+                                         params, compute)
 
-            # Run stress tests
-            stress_results = run_all_stress_tests(prices_df, weights)
+        except ValueError as e:
+            logger.error(f"Error backtesting portfolio: {str(e)}")
+            return jsonify({'error': str(e)}), 400
 
-            # Prepare response
-            result = {
-                'tickers': tickers,
-                'weights': weights,
-                'start_date': start_date,
-                'end_date': end_date,
-                'stress_tests': stress_results
-            }
+        except FetchTimeoutError as e:
+            logger.error(f"Timed out backtesting portfolio: {str(e)}")
+            return jsonify({'error': str(e)}), 504
+
+    except Exception as e:
+        logger.error(f"Unexpected error in backtest: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+
+@app.route('/api/monte-carlo-var', methods=['POST'])
+async def monte_carlo_var():
+    """
+    Calculate Monte Carlo VaR and Expected Shortfall for a portfolio.
+
+    Expected JSON body:
+    {
+        "tickers": ["SPY", "QQQ", "GLD"],
+        "weights": [40, 30, 30],
+        "start_date": "2023-01-01",
+        "end_date": "2024-01-01",
+        "n_scenarios": 100000,          (optional)
+        "horizon": 1,                   (optional, trading days)
+        "distribution": "normal",       (optional: normal, t, bootstrap)
+        "dof": 5,                       (optional, Student-t only)
+        "confidence_levels": [0.95, 0.99],  (optional)
+        "seed": 42                      (optional)
+    }
+    """
+    try:
+        # Get request data
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        # Extract and validate parameters
+        params, error = parse_portfolio_request(data)
+        if error:
+            return jsonify({'error': error}), 400
 
-            logger.info(f"Successfully completed stress tests for {len(tickers)} tickers")
-            return jsonify(result), 200
+        tickers = params['tickers']
+        start_date = params['start_date']
+        end_date = params['end_date']
+
+        # Validate simulation settings
+        options, error = parse_monte_carlo_options(data, len(tickers))
+        if error:
+            return jsonify({'error': error}), 400
+
+        # Fetch data
+        try:
+            prices_df = await run_fetch(data_fetcher.fetch_multiple_tickers, tickers, start_date, end_date)
+
+            # The simulation runs in the compute pool
+            result = await run_cpu(build_monte_carlo_result, params, prices_df, options)
+            return negotiated_response(result)
 
         except ValueError as e:
-            logger.error(f"Error running stress tests: {str(e)}")
+            logger.error(f"Error calculating Monte Carlo VaR: {str(e)}")
             return jsonify({'error': str(e)}), 400
 
+        except FetchTimeoutError as e:
+            logger.error(f"Timed out calculating Monte Carlo VaR: {str(e)}")
+            return jsonify({'error': str(e)}), 504
+
     except Exception as e:
-        logger.error(f"Unexpected error in stress_test: {str(e)}")
+        logger.error(f"Unexpected error in monte_carlo_var: {str(e)}")
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
 
@@ -0,0 +1,25 @@
+"""
+Production entry point: the Flask app served by an ASGI server.
+
+Run from the backend directory, e.g.
+
+    uvicorn asgi:asgi_app --host 0.0.0.0 --port 5000 --workers 2
+
+Requests are handled on a pool of ASGI_THREADS threads per server worker
+(default 64). The async views fetch prices in a bounded pool
+(FETCH_CONCURRENCY downloads per provider, FETCH_TIMEOUT seconds per request)
+and compute metrics in a process pool (CPU_WORKERS), so a slow download or a
+large portfolio does not hold up unrelated requests.
+
+a2wsgi is used rather than asgiref's WsgiToAsgi, which runs every WSGI call
+on a single shared thread.
+"""
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app
+
+DEFAULT_ASGI_THREADS = 64
+
+asgi_app = WSGIMiddleware(app, workers=int(os.environ.get('ASGI_THREADS', DEFAULT_ASGI_THREADS)))
@@ -0,0 +1,115 @@
+"""
+Cold-start benchmark: import time of the API and time to first health check.
+
+Runs ``python -X importtime -c "import app"`` in fresh interpreters, sums
+the report per top-level package, and separately times how long a new
+process takes to answer /api/health. The first number is what every server
+worker pays before it can serve; heavy packages (pandas, scipy, yfinance)
+should only appear after a warm-up, not here.
+
+Usage (from the backend directory):
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 10 --budget-ms 500
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One "import time: self [us] | cumulative | imported package" line
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+# Times process start (interpreter already up) to the first /api/health answer
+HEALTH_SCRIPT = """
+import time
+start = time.perf_counter()
+import app
+response = app.app.test_client().get('/api/health')
+assert response.status_code == 200
+print(time.perf_counter() - start)
+"""
+
+# Packages that should stay out of start-up
+HEAVY_PACKAGES = ('pandas', 'scipy', 'yfinance')
+
+
+def run_importtime(module='app'):
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        dict: {'total_us': int, 'packages': {top-level package: self time in us}}
+    """
+    env = dict(os.environ, PRICE_PROVIDER=os.environ.get('PRICE_PROVIDER', 'synthetic'))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+
+    packages = {}
+    total = 0
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+        # The module itself is reported last, unnested, with everything it imported
+        if len(indent) == 1 and name == module:
+            total = int(cumulative_us)
+    return {'total_us': total, 'packages': packages}
+
+
+def time_to_health():
+    """Seconds a fresh process takes to import the app and answer /api/health."""
+    env = dict(os.environ, PRICE_PROVIDER=os.environ.get('PRICE_PROVIDER', 'synthetic'))
+    completed = subprocess.run(
+        [sys.executable, '-c', HEALTH_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure API import time and time to first health check')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per measurement')
+    parser.add_argument('--top', type=int, default=10, help='Packages listed by import time')
+    parser.add_argument('--budget-ms', type=float,
+                        help='Exit with status 1 if the median time to health exceeds this')
+    args = parser.parse_args()
+
+    imports = [run_importtime() for _ in range(args.runs)]
+    totals = [run['total_us'] / 1000 for run in imports]
+    print(f"import app: median {statistics.median(totals):.1f} ms "
+          f"(min {min(totals):.1f}, max {max(totals):.1f}) over {args.runs} runs")
+
+    packages = {}
+    for run in imports:
+        for package, self_us in run['packages'].items():
+            packages.setdefault(package, []).append(self_us / 1000)
+    ranked = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))
+    print("\nSlowest packages (median self time):")
+    for package, timings in ranked[:args.top]:
+        print(f"  {package:24s} {statistics.median(timings):8.1f} ms")
+
+    loaded = [package for package in HEAVY_PACKAGES if package in packages]
+    if loaded:
+        print(f"\nLoaded at start-up: {', '.join(loaded)}")
+
+    health = [time_to_health() * 1000 for _ in range(args.runs)]
+    median_health = statistics.median(health)
+    print(f"\nFirst /api/health: median {median_health:.1f} ms "
+          f"(min {min(health):.1f}, max {max(health):.1f})")
+
+    if args.budget_ms is not None and median_health > args.budget_ms:
+        print(f"Over budget of {args.budget_ms:g} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Throughput test of the API under concurrent load.
+
+Starts the server as a subprocess (the Flask dev server and/or the ASGI entry
+point under uvicorn) on synthetic prices with an emulated download latency,
+fires concurrent /api/calculate-metrics requests with distinct weights (so
+the result cache never hits) and reports requests per second and latency.
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py                          # both servers
+    python benchmarks/load_test.py --server asgi --requests 400 --concurrency 32
+    python benchmarks/load_test.py --unique-tickers --tickers 2 --years 1  # latency-bound
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'dev': [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', '{port}'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:asgi_app', '--port', '{port}', '--log-level', 'warning'],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, port, latency):
+    """Start a server subprocess and wait until it answers /api/health."""
+    env = dict(os.environ, PRICE_PROVIDER='synthetic', PRICE_STORE='off',
+               SYNTHETIC_LATENCY=str(latency))
+    command = [part.format(port=port) for part in SERVERS[name]]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+
+    for _ in range(200):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1)
+            return process
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.1)
+
+    stop_server(process)
+    raise RuntimeError(f"{name} server did not start")
+
+
+def stop_server(process):
+    """Stop a server subprocess along with its compute pool processes."""
+    os.killpg(process.pid, signal.SIGKILL)
+    process.wait()
+
+
+def post(url, body):
+    request = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=120) as response:
+        response.read()
+        status = response.status
+    return status, time.perf_counter() - start
+
+
+def run_load(port, num_requests, concurrency, num_tickers, years, unique_tickers=False):
+    """
+    Fire requests with distinct weights and measure throughput.
+
+    With unique_tickers every request asks for its own tickers, so each one
+    needs its own (emulated) download instead of sharing one.
+
+    Returns:
+        dict: Requests per second, latency percentiles and error count
+    """
+    url = f"http://127.0.0.1:{port}/api/calculate-metrics"
+    start_date = f"{2024 - years}-01-01"
+    bodies = []
+    for i in range(num_requests):
+        prefix = f"R{i}_" if unique_tickers else 'T'
+        tickers = [f"{prefix}{j:04d}" for j in range(num_tickers)]
+
+        # Distinct weights per request so every request is computed
+        weights = [100.0 / len(tickers)] * len(tickers)
+        weights[0] += 0.001 * (i + 1)
+        weights[1] -= 0.001 * (i + 1)
+        bodies.append({'tickers': tickers, 'weights': weights,
+                       'start_date': start_date, 'end_date': '2024-01-01', 'max_points': 1000})
+
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(post, url, body) for body in bodies]
+        for future in futures:
+            try:
+                status, latency = future.result()
+                latencies.append(latency)
+                errors += status != 200
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                errors += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        'requests_per_second': num_requests / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000) if latencies else None,
+        'p95_ms': float(np.percentile(latencies, 95) * 1000) if latencies else None,
+        'errors': errors
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the API servers')
+    parser.add_argument('--server', choices=['dev', 'asgi', 'both'], default='both')
+    parser.add_argument('--requests', type=int, default=200, help='Total requests')
+    parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight')
+    parser.add_argument('--latency', type=float, default=0.5,
+                        help='Emulated download time per fetch in seconds')
+    parser.add_argument('--tickers', type=int, default=10, help='Tickers per portfolio')
+    parser.add_argument('--years', type=int, default=10, help='Years of history')
+    parser.add_argument('--unique-tickers', action='store_true',
+                        help='Give every request its own tickers (no shared downloads)')
+    args = parser.parse_args()
+
+    names = ['dev', 'asgi'] if args.server == 'both' else [args.server]
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, {args.tickers} tickers x "
+          f"{args.years}y, {args.latency:g}s download latency"
+          f"{', unique tickers' if args.unique_tickers else ''}")
+    for name in names:
+        port = free_port()
+        process = start_server(name, port, args.latency)
+        try:
+            result = run_load(port, args.requests, args.concurrency, args.tickers, args.years,
+                              args.unique_tickers)
+        finally:
+            stop_server(process)
+        print(f"  {name:5s} {result['requests_per_second']:8.1f} req/s  p50 {result['p50_ms']:8.1f} ms  "
+              f"p95 {result['p95_ms']:8.1f} ms  errors {result['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+"""
+Benchmark suite for the risk engine and API endpoints.
+
+Runs calculate_all_metrics, calculate_correlation_matrix, run_all_stress_tests,
+a one-day streaming metrics update, the rolling analytics, the efficient
+frontier, a monthly rebalancing backtest and the Flask endpoints end-to-end on
+synthetic price panels, recording wall time, peak traced memory and allocated
+blocks for each case. Results are saved as JSON (one file per run, tagged with
+the git commit) so two runs can be compared for regressions.
+
+Usage (from the backend directory):
+    python benchmarks/run_benchmarks.py                    # default sizes
+    python benchmarks/run_benchmarks.py --sizes all        # up to 2000 x 30y
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<old>.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Benchmarks always run offline on synthetic prices
+os.environ.setdefault('PRICE_PROVIDER', 'synthetic')
+os.environ.setdefault('PRICE_STORE', 'off')
+
+import numpy as np
+import pandas as pd
+import logging
+
+logging.disable(logging.WARNING)
+
+from providers import SyntheticProvider, set_provider
+from portfolio_context import PortfolioContext
+from risk_metrics import calculate_all_metrics, calculate_correlation_matrix, calculate_rolling_series
+from stress_tests import run_all_stress_tests
+from optimization import optimize_portfolio, portfolio_bounds
+from streaming_metrics import StreamingMetrics
+from backtest import run_backtest
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+
+# (name, number of tickers, years of history); panels end on END_DATE, so the
+# 2020 and 2022 crisis windows are covered from 5 years of history up
+SIZES = {
+    'xs': (5, 1),
+    's': (20, 5),
+    'm': (100, 10),
+    'l': (500, 20),
+    'xl': (2000, 30),
+}
+DEFAULT_SIZES = ['xs', 's', 'm']
+END_DATE = '2024-01-01'
+
+# Relative slowdown treated as a regression by --compare
+DEFAULT_THRESHOLD = 0.10
+
+
+def make_panel(num_tickers, years, seed=0):
+    """
+    Build a synthetic price panel and its request parameters.
+
+    Args:
+        num_tickers (int): Number of tickers
+        years (int): Years of history ending at END_DATE
+        seed (int): Synthetic provider seed
+
+    Returns:
+        tuple: (prices_df, benchmark_prices, tickers, weights, start_date)
+    """
+    tickers = [f"T{i:04d}" for i in range(num_tickers)]
+    weights = [100.0 / num_tickers] * num_tickers
+    start_date = f"{int(END_DATE[:4]) - years}{END_DATE[4:]}"
+
+    provider = SyntheticProvider(seed)
+    prices_df = provider.fetch(tickers, start_date, END_DATE)
+    benchmark_prices = provider.fetch(['SPY'], start_date, END_DATE)['SPY']
+    return prices_df, benchmark_prices, tickers, weights, start_date
+
+
+def measure(fn, repeat):
+    """
+    Time a callable and measure its memory use.
+
+    Timing runs are done without tracing; one extra traced run records the
+    peak traced memory and the number of Python memory blocks it left allocated.
+
+    Args:
+        fn (callable): Function to benchmark
+        repeat (int): Number of timed runs
+
+    Returns:
+        dict: Wall time statistics (seconds), peak memory (bytes) and blocks
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    blocks_after = sys.getallocatedblocks()
+
+    return {
+        'min_seconds': min(timings),
+        'median_seconds': float(np.median(timings)),
+        'max_seconds': max(timings),
+        'repeat': repeat,
+        'peak_memory_bytes': peak,
+        'allocated_blocks': blocks_after - blocks_before
+    }
+
+
+def streaming_case(prices_df, weights, benchmark_prices):
+    """Build a callable that restores a saved streaming state and appends the last day."""
+    state = StreamingMetrics.from_prices(prices_df.iloc[:-1], weights, benchmark_prices.iloc[:-1]).to_dict()
+    date = prices_df.index[-1]
+    prices = prices_df.iloc[-1].to_numpy()
+    benchmark_price = float(benchmark_prices.iloc[-1])
+
+    def run():
+        engine = StreamingMetrics.from_dict(state)
+        engine.append(date, prices, benchmark_price)
+        engine.metrics()
+    return run
+
+
+def rolling_case(prices_df, weights, benchmark_prices):
+    """Build a callable computing the rolling series (correlations among the first 20 assets)."""
+    context = PortfolioContext(prices_df, weights, benchmark_prices)
+    tickers = context.tickers[:20]
+    pairs = [(a, b) for i, a in enumerate(tickers) for b in tickers[i + 1:]]
+
+    def run():
+        calculate_rolling_series(context, pairs=pairs, max_points=1000)
+    return run
+
+
+def optimize_case(prices_df, weights):
+    """Build a callable computing a 100-point frontier over the first 200 assets (max 20% each)."""
+    context = PortfolioContext(prices_df.iloc[:, :200], weights[:200])
+    lower, upper = portfolio_bounds(context.returns.shape[1], 0.0, max(0.2, 1.0 / context.returns.shape[1]))
+
+    def run():
+        optimize_portfolio(context.returns, lower, upper)
+    return run
+
+
+def backtest_case(prices_df, weights):
+    """Build a callable backtesting monthly rebalancing with 10 bps costs."""
+    context = PortfolioContext(prices_df, weights)
+
+    def run():
+        run_backtest(context.returns, context.weights, context.returns_day_numbers, 'monthly',
+                     transaction_cost=0.001)
+    return run
+
+
+def endpoint_cases(tickers, weights, start_date):
+    """Build callables that hit the Flask endpoints with a cold result cache."""
+    import app as app_module
+
+    client = app_module.app.test_client()
+    body = {
+        'tickers': tickers,
+        'weights': weights,
+        'start_date': start_date,
+        'end_date': END_DATE
+    }
+
+    def post(path):
+        def run():
+            app_module.result_cache.clear()
+            response = client.post(path, json=body)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return run
+
+    return {
+        'endpoint_calculate_metrics': post('/api/calculate-metrics'),
+        'endpoint_stress_test': post('/api/stress-test'),
+    }
+
+
+def run_suite(size_names, repeat, include_endpoints):
+    """
+    Run every benchmark case for the selected sizes.
+
+    Args:
+        size_names (list): Keys of SIZES to run
+        repeat (int): Timed runs per case
+        include_endpoints (bool): Also benchmark the Flask endpoints
+
+    Returns:
+        list: One result dict per (size, case)
+    """
+    set_provider(SyntheticProvider(0))
+    results = []
+
+    for size_name in size_names:
+        num_tickers, years = SIZES[size_name]
+        prices_df, benchmark_prices, tickers, weights, start_date = make_panel(num_tickers, years)
+        print(f"[{size_name}] {num_tickers} tickers x {years}y ({len(prices_df)} days)")
+
+        cases = {
+            'calculate_all_metrics': lambda: calculate_all_metrics(prices_df, weights, benchmark_prices),
+            'calculate_correlation_matrix': lambda: calculate_correlation_matrix(prices_df),
+            'run_all_stress_tests': lambda: run_all_stress_tests(prices_df, weights),
+            'streaming_append': streaming_case(prices_df, weights, benchmark_prices),
+            'rolling_analytics': rolling_case(prices_df, weights, benchmark_prices),
+            'optimize_frontier': optimize_case(prices_df, weights),
+            'backtest_monthly': backtest_case(prices_df, weights),
+        }
+        if include_endpoints:
+            cases.update(endpoint_cases(tickers, weights, start_date))
+
+        for case_name, fn in cases.items():
+            stats = measure(fn, repeat)
+            results.append({
+                'case': case_name,
+                'size': size_name,
+                'tickers': num_tickers,
+                'years': years,
+                'days': len(prices_df),
+                **stats
+            })
+            print(f"  {case_name:32s} {stats['median_seconds'] * 1000:10.2f} ms  "
+                  f"peak {stats['peak_memory_bytes'] / 1e6:9.1f} MB")
+
+    return results
+
+
+def git_commit():
+    """Return the current git commit hash, or 'unknown'."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(results, output=None):
+    """
+    Save results with environment metadata as JSON.
+
+    Args:
+        results (list): Benchmark results
+        output (str, optional): Output path (default: results/<time>_<commit>.json)
+
+    Returns:
+        str: Path of the written file
+    """
+    commit = git_commit()
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{commit}.json")
+
+    document = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results
+    }
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    return output
+
+
+def compare_results(baseline_path, results, threshold):
+    """
+    Compare results against a previous run and report regressions.
+
+    Args:
+        baseline_path (str): Path of an earlier results file
+        results (list): Current results
+        threshold (float): Relative slowdown that counts as a regression
+
+    Returns:
+        int: Number of regressions found
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    previous = {(r['case'], r['size']): r for r in baseline['results']}
+    regressions = 0
+
+    print(f"\nComparison against {baseline.get('commit', '?')} (threshold {threshold:.0%})")
+    for result in results:
+        old = previous.get((result['case'], result['size']))
+        if old is None:
+            continue
+        ratio = result['median_seconds'] / old['median_seconds']
+        memory_ratio = result['peak_memory_bytes'] / max(old['peak_memory_bytes'], 1)
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"  [{result['size']}] {result['case']:32s} time x{ratio:5.2f}  memory x{memory_ratio:5.2f}{flag}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the portfolio risk engine')
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES),
+                        help=f"Comma-separated sizes from {', '.join(SIZES)} or 'all'")
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case')
+    parser.add_argument('--no-endpoints', action='store_true', help='Skip the Flask endpoint cases')
+    parser.add_argument('--output', help='Where to write the JSON results')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Relative slowdown counted as a regression')
+    args = parser.parse_args()
+
+    size_names = list(SIZES) if args.sizes == 'all' else args.sizes.split(',')
+    unknown = [name for name in size_names if name not in SIZES]
+    if unknown:
+        parser.error(f"Unknown sizes: {', '.join(unknown)}")
+
+    results = run_suite(size_names, args.repeat, not args.no_endpoints)
+    path = save_results(results, args.output)
+    print(f"\nResults written to {path}")
+
+    if args.compare:
+        regressions = compare_results(args.compare, results, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+import os
+
+import numpy as np
+import logging
+from concurrency import map_chunks
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_METHODS = ('stationary', 'block')
+
+DEFAULT_RESAMPLES = 1000
+DEFAULT_CONFIDENCE = 0.95
+
+# Fixed default seed so the same request always gets the same intervals
+# (and cached responses stay consistent with fresh ones)
+DEFAULT_SEED = 0
+
+# Working memory allowed per chunk of resamples (override with BOOTSTRAP_MEMORY_BUDGET_MB)
+DEFAULT_MEMORY_BUDGET_MB = 64
+
+# Below this many resampled returns (resamples x days) spreading chunks over
+# processes costs more than it saves
+MIN_VALUES_FOR_POOL = 20000000
+
+# Large runs are split into at least this many chunks so they can be spread
+# over workers; fixed (not tied to the worker count) to keep seeds reproducible
+MIN_CHUNKS = 16
+
+# Metrics with intervals, in response order
+BOOTSTRAP_METRICS = ('annual_return', 'annual_volatility', 'sharpe_ratio', 'max_drawdown',
+                     'historical_var_95', 'historical_var_99', 'beta')
+
+
+def default_block_length(num_days):
+    """Rule-of-thumb (mean) block length for num_days of daily returns: T^(1/3)."""
+    return max(1, int(round(num_days ** (1 / 3))))
+
+
+def bootstrap_indices(rng, num_days, resamples, block_length, method='stationary'):
+    """
+    Draw the day indices of every resample as one matrix.
+
+    Both methods resample whole runs of consecutive days (wrapping around
+    the end of the sample) so autocorrelation and volatility clustering
+    within a block are kept:
+
+    - 'block': circular moving blocks of exactly block_length days
+    - 'stationary': Politis-Romano stationary bootstrap; each day starts a
+      new block with probability 1 / block_length, so block lengths are
+      geometric with mean block_length
+
+    Args:
+        rng (np.random.Generator): Random generator
+        num_days (int): Length T of the return series
+        resamples (int): Number of resamples B
+        block_length (float): (Mean) block length in days
+        method (str): 'stationary' or 'block'
+
+    Returns:
+        np.ndarray: B x T matrix of day indices
+    """
+    if method == 'block':
+        length = max(1, int(round(block_length)))
+        num_blocks = -(-num_days // length)
+        starts = rng.integers(0, num_days, (resamples, num_blocks))
+        indices = (starts[:, :, None] + np.arange(length)).reshape(resamples, -1)[:, :num_days]
+        return indices % num_days
+
+    days = np.arange(num_days)
+    probability = 1.0 / block_length
+    uniform = rng.random((resamples, num_days))
+    uniform[:, 0] *= probability
+    new_block = uniform < probability
+
+    # Position where the current block began, carried forward along each row
+    block_begin = np.maximum.accumulate(np.where(new_block, days, 0), axis=1)
+
+    # Given u < p, u / p is again uniform, so the same draw picks the day
+    # the block starts at
+    block_start = (np.take_along_axis(uniform, block_begin, axis=1) * (num_days / probability)).astype(np.int64)
+    return (block_start + (days - block_begin)) % num_days
+
+
+def resample_statistics(portfolio_returns, benchmark_returns, indices, risk_free_rate=0.04):
+    """
+    Evaluate the headline metrics on every resample at once.
+
+    Uses the same definitions as risk_metrics: annualized mean return and
+    volatility (ddof=1), Sharpe ratio, maximum drawdown of the compounded
+    path, historical VaR (linear-interpolated percentiles) and beta over
+    the days with a benchmark return.
+
+    Args:
+        portfolio_returns (np.ndarray): Daily portfolio returns (T,)
+        benchmark_returns (np.ndarray): Daily benchmark returns (T,) with NaN
+            where missing, or None
+        indices (np.ndarray): B x T day indices (see bootstrap_indices)
+        risk_free_rate (float): Annual risk-free rate
+
+    Returns:
+        dict: Metric name -> np.ndarray of B values
+    """
+    returns = portfolio_returns[indices]
+
+    mean = returns.mean(axis=1)
+    daily_volatility = returns.std(axis=1, ddof=1)
+    annual_volatility = daily_volatility * np.sqrt(252)
+
+    growth = np.cumprod(1 + returns, axis=1)
+    peaks = np.maximum.accumulate(growth, axis=1)
+    max_drawdown = -((growth - peaks) / peaks).min(axis=1)
+
+    var_95, var_99 = -np.percentile(returns, [5, 1], axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        statistics = {
+            'annual_return': mean * 252,
+            'annual_volatility': annual_volatility,
+            'sharpe_ratio': (mean * 252 - risk_free_rate) / annual_volatility,
+            'max_drawdown': max_drawdown,
+            'historical_var_95': var_95,
+            'historical_var_99': var_99,
+        }
+
+        if benchmark_returns is not None:
+            benchmark = benchmark_returns[indices]
+            valid = ~np.isnan(benchmark)
+            count = valid.sum(axis=1)
+            benchmark = np.where(valid, benchmark, 0.0)
+            portfolio = np.where(valid, returns, 0.0)
+            benchmark_centred = np.where(valid, benchmark - (benchmark.sum(axis=1) / count)[:, None], 0.0)
+            portfolio_centred = np.where(valid, portfolio - (portfolio.sum(axis=1) / count)[:, None], 0.0)
+            covariance = (portfolio_centred * benchmark_centred).sum(axis=1)
+            statistics['beta'] = covariance / (benchmark_centred * benchmark_centred).sum(axis=1)
+
+    return statistics
+
+
+def _bootstrap_chunk(task, data):
+    """
+    Draw one chunk of resamples and evaluate the metrics on them.
+
+    Args:
+        task (tuple): (np.random.SeedSequence, number of resamples)
+        data (dict): Returns and settings shared by every chunk
+
+    Returns:
+        dict: Metric name -> np.ndarray with one value per resample
+    """
+    seed, size = task
+    rng = np.random.default_rng(seed)
+    indices = bootstrap_indices(rng, len(data['portfolio_returns']), size,
+                                data['block_length'], data['method'])
+    return resample_statistics(data['portfolio_returns'], data['benchmark_returns'], indices,
+                               data['risk_free_rate'])
+
+
+def _chunk_sizes(resamples, num_days, memory_budget_mb):
+    """Split the resamples into chunks that fit the memory budget."""
+    # Indices, gathered returns, growth path, running peaks and a temporary,
+    # plus the benchmark copies: about 8 doubles per resampled day
+    chunk_size = max(1, int(memory_budget_mb * 1024 * 1024 // (64 * num_days)))
+
+    if resamples * num_days >= MIN_VALUES_FOR_POOL:
+        chunk_size = min(chunk_size, -(-resamples // MIN_CHUNKS))
+
+    sizes = [chunk_size] * (resamples // chunk_size)
+    if resamples % chunk_size:
+        sizes.append(resamples % chunk_size)
+    return sizes
+
+
+def bootstrap_confidence_intervals(portfolio_returns, benchmark_returns=None, resamples=DEFAULT_RESAMPLES,
+                                   method='stationary', block_length=None, confidence=DEFAULT_CONFIDENCE,
+                                   seed=DEFAULT_SEED, risk_free_rate=0.04, memory_budget_mb=None):
+    """
+    Bootstrap confidence intervals for the headline risk metrics.
+
+    Resamples are drawn as blocks of consecutive days (stationary or
+    circular block bootstrap) and evaluated in batched NumPy, a chunk of
+    resamples at a time. Every chunk gets its own child seed from one
+    SeedSequence, so the intervals are identical wherever the chunks run
+    (see map_chunks). Intervals are percentile intervals of the resampled values.
+
+    Args:
+        portfolio_returns (np.ndarray): Daily portfolio returns
+        benchmark_returns (np.ndarray, optional): Daily benchmark returns on
+            the same days (NaN where missing); adds beta
+        resamples (int): Number of bootstrap resamples
+        method (str): 'stationary' or 'block'
+        block_length (float, optional): (Mean) block length in days
+            (default: T^(1/3))
+        confidence (float): Interval coverage (e.g. 0.95)
+        seed (int): Seed for reproducible intervals
+        risk_free_rate (float): Annual risk-free rate for the Sharpe ratio
+        memory_budget_mb (float, optional): Working memory per chunk
+
+    Returns:
+        dict: {
+            'method', 'block_length', 'resamples', 'confidence', 'seed',
+            'metrics': {name: {'estimate', 'lower', 'upper', 'std_error'}}
+        }
+
+    Raises:
+        ValueError: If the settings are invalid or there are too few returns
+    """
+    if method not in BOOTSTRAP_METHODS:
+        raise ValueError(f"Bootstrap method must be one of: {', '.join(BOOTSTRAP_METHODS)}")
+    if not 0 < confidence < 1:
+        raise ValueError("Confidence must be between 0 and 1")
+
+    portfolio_returns = np.asarray(portfolio_returns, dtype=float)
+    num_days = len(portfolio_returns)
+    if num_days < 2:
+        raise ValueError("Not enough returns to bootstrap")
+    if block_length is None:
+        block_length = default_block_length(num_days)
+    if not 1 <= block_length <= num_days:
+        raise ValueError(f"Block length must be between 1 and {num_days} days")
+    if benchmark_returns is not None:
+        benchmark_returns = np.asarray(benchmark_returns, dtype=float)
+
+    if memory_budget_mb is None:
+        memory_budget_mb = float(os.environ.get('BOOTSTRAP_MEMORY_BUDGET_MB', DEFAULT_MEMORY_BUDGET_MB))
+
+    logger.info(f"Bootstrapping {resamples} {method} resamples of {num_days} days (block {block_length:g})")
+
+    data = {
+        'portfolio_returns': portfolio_returns,
+        'benchmark_returns': benchmark_returns,
+        'block_length': float(block_length),
+        'method': method,
+        'risk_free_rate': risk_free_rate
+    }
+
+    sizes = _chunk_sizes(int(resamples), num_days, memory_budget_mb)
+    tasks = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+    names = BOOTSTRAP_METRICS if benchmark_returns is not None else BOOTSTRAP_METRICS[:-1]
+    values = {name: np.empty(int(resamples)) for name in names}
+
+    chunks = map_chunks(_bootstrap_chunk, tasks, data, parallel=resamples * num_days >= MIN_VALUES_FOR_POOL)
+    for i, chunk in enumerate(chunks):
+        for name in names:
+            values[name][offsets[i]:offsets[i + 1]] = chunk[name]
+
+    # Point estimates: the same statistics on the original ordering
+    estimates = resample_statistics(portfolio_returns, benchmark_returns, np.arange(num_days)[None, :],
+                                    risk_free_rate)
+
+    tail = (1 - confidence) / 2 * 100
+    metrics = {}
+    for name in names:
+        finite = values[name][np.isfinite(values[name])]
+        lower, upper = np.percentile(finite, [tail, 100 - tail]) if len(finite) else (np.nan, np.nan)
+        metrics[name] = {
+            'estimate': float(estimates[name][0]),
+            'lower': float(lower),
+            'upper': float(upper),
+            'std_error': float(finite.std(ddof=1)) if len(finite) > 1 else None
+        }
+
+    return {
+        'method': method,
+        'block_length': float(block_length),
+        'resamples': int(resamples),
+        'confidence': confidence,
+        'seed': seed,
+        'metrics': metrics
+    }
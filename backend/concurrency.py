@@ -0,0 +1,326 @@
+import asyncio
+import functools
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import logging
+from instrumentation import (PRICE_DOWNLOAD_DURATION, PRICE_DOWNLOADS, merge_stages, record_stage,
+                             run_with_stages)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Simultaneous upstream price downloads per provider across all requests
+# (FETCH_CONCURRENCY)
+DEFAULT_FETCH_CONCURRENCY = 32
+
+# Seconds a request waits for its price data before giving up (FETCH_TIMEOUT)
+DEFAULT_FETCH_TIMEOUT = 30.0
+
+# Threads running fetches for async views; most of them wait on the price
+# store, single-flight or an upstream slot, so there are more than slots
+FETCH_THREADS = 64
+
+# Download slots per provider name (see upstream_slots)
+_upstream_slots = {}
+_upstream_slots_lock = threading.Lock()
+
+# Deadline of the request a fetch thread is working for (see run_fetch)
+_fetch_state = threading.local()
+
+_fetch_executor = None
+_cpu_executor = None
+_executor_lock = threading.Lock()
+
+# Marks threads of the compute and job pools, where chunked work runs inline
+# or in the worker's own chunk pool (see map_chunks)
+_worker_state = threading.local()
+_chunk_executor = None
+
+
+class FetchTimeoutError(TimeoutError):
+    """Raised when price data does not arrive within the fetch timeout."""
+
+
+def fetch_timeout():
+    """Per-request fetch timeout in seconds (FETCH_TIMEOUT environment variable)."""
+    return float(os.environ.get('FETCH_TIMEOUT', DEFAULT_FETCH_TIMEOUT))
+
+
+def upstream_slots(provider_name):
+    """
+    Download slots of one provider, FETCH_CONCURRENCY of them.
+
+    Each provider (upstream host) has its own slots, so a slow provider does
+    not hold up downloads from the others.
+
+    Args:
+        provider_name (str): PriceProvider.name
+
+    Returns:
+        threading.BoundedSemaphore: The provider's slots
+    """
+    with _upstream_slots_lock:
+        slots = _upstream_slots.get(provider_name)
+        if slots is None:
+            slots = threading.BoundedSemaphore(
+                int(os.environ.get('FETCH_CONCURRENCY', DEFAULT_FETCH_CONCURRENCY))
+            )
+            _upstream_slots[provider_name] = slots
+        return slots
+
+
+def bounded_upstream(fn, provider_name):
+    """
+    Wrap a provider fetch so it holds one of the provider's download slots.
+
+    Inside run_fetch a slot is only waited for until the request's fetch
+    timeout: a request that has given up does not start a download. A
+    download that has started runs to completion and then frees its slot.
+    Downloads are counted and timed (once a slot is held) for /api/metrics.
+
+    Args:
+        fn (callable): Function performing the download
+        provider_name (str): Provider the download goes to
+
+    Returns:
+        callable: Same function, limited to FETCH_CONCURRENCY concurrent
+            calls per provider
+
+    Raises:
+        FetchTimeoutError: If no slot frees up before the request's deadline
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        slots = upstream_slots(provider_name)
+        deadline = getattr(_fetch_state, 'deadline', None)
+        timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+        if not slots.acquire(timeout=timeout):
+            raise FetchTimeoutError(f"No {provider_name} download slot freed up within the fetch timeout")
+        try:
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                PRICE_DOWNLOADS.inc('error')
+                raise
+            finally:
+                PRICE_DOWNLOAD_DURATION.observe(time.perf_counter() - start)
+            PRICE_DOWNLOADS.inc('success')
+            return result
+        finally:
+            slots.release()
+    return wrapper
+
+
+def _fetch_with_deadline(deadline, fn, *args):
+    """Run fn in a fetch thread on behalf of a request that waits until deadline."""
+    if time.monotonic() >= deadline:
+        raise FetchTimeoutError("Fetch timeout passed before the fetch started")
+    _fetch_state.deadline = deadline
+    try:
+        return fn(*args)
+    finally:
+        _fetch_state.deadline = None
+
+
+def _get_fetch_executor():
+    global _fetch_executor
+    with _executor_lock:
+        if _fetch_executor is None:
+            _fetch_executor = ThreadPoolExecutor(max_workers=FETCH_THREADS, thread_name_prefix='fetch')
+        return _fetch_executor
+
+
+def cpu_workers():
+    """
+    Compute pool processes (CPU_WORKERS environment variable; 0 for a thread).
+
+    Defaults to the CPU count, or 0 on a single core, where a process only
+    adds pickling and IPC to the same CPU time.
+    """
+    if 'CPU_WORKERS' in os.environ:
+        return int(os.environ['CPU_WORKERS'])
+    count = os.cpu_count() or 1
+    return count if count > 1 else 0
+
+
+def mark_compute_worker(chunk_workers=1):
+    """
+    Pool initializer: chunked computations in this worker stay out of the compute pool.
+
+    Args:
+        chunk_workers (int): Processes of the worker's own chunk pool (see
+            map_chunks); 1 runs chunks inline
+    """
+    _worker_state.compute = True
+    _worker_state.chunk_workers = chunk_workers
+
+
+def in_compute_worker():
+    """Whether the caller runs in a compute or job pool worker."""
+    return getattr(_worker_state, 'compute', False)
+
+
+def _stop_chunk_processes():
+    """
+    Exit hook of a job worker: terminate its chunk pool processes.
+
+    A pool process joins its children when it exits, and by then the chunk
+    pool can no longer be shut down gracefully, so the worker would hang.
+    """
+    for process in multiprocessing.active_children():
+        process.terminate()
+
+
+def _get_chunk_executor():
+    """
+    Chunk pool of a job worker, started on first use and kept for later calls.
+
+    Its processes are spawned rather than forked: the worker is itself a
+    fork of a multi-threaded server, and a fork of it can inherit a lock held
+    by one of those threads and hang.
+    """
+    global _chunk_executor
+    with _executor_lock:
+        if _chunk_executor is None:
+            _chunk_executor = ProcessPoolExecutor(max_workers=_worker_state.chunk_workers,
+                                                  mp_context=multiprocessing.get_context('spawn'))
+            multiprocessing.util.Finalize(None, _stop_chunk_processes, exitpriority=10)
+            logger.info(f"Started chunk pool with {_worker_state.chunk_workers} worker processes")
+        return _chunk_executor
+
+
+def _get_cpu_executor():
+    """
+    Pool for metric computations, sized by CPU_WORKERS (see cpu_workers).
+
+    With CPU_WORKERS=0 computations run in a thread instead of separate
+    processes (no pickling, but they share the GIL with request handling).
+    """
+    global _cpu_executor
+    with _executor_lock:
+        if _cpu_executor is None:
+            workers = cpu_workers()
+            if workers > 0:
+                _cpu_executor = ProcessPoolExecutor(max_workers=workers, initializer=mark_compute_worker)
+            else:
+                _cpu_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='compute',
+                                                   initializer=mark_compute_worker)
+            logger.info(f"Started compute pool with {workers or 'no'} worker processes")
+        return _cpu_executor
+
+
+def warm_up_cpu_pool(fn):
+    """
+    Start the compute pool and run fn in it once per worker.
+
+    Pool processes are otherwise started by the first requests that need
+    them, which then also pay for the workers' imports. One task per worker
+    submitted at once starts every process now; with the fork start method
+    they inherit whatever the server has already imported.
+
+    Args:
+        fn (callable): Module-level (picklable) function without arguments
+
+    Returns:
+        int: Number of tasks run
+    """
+    executor = _get_cpu_executor()
+    futures = [executor.submit(fn) for _ in range(max(cpu_workers(), 1))]
+    for future in futures:
+        future.result()
+    return len(futures)
+
+
+def map_chunks(fn, tasks, shared, parallel=True):
+    """
+    Run fn(task, shared) for every task, spreading large runs over processes.
+
+    Compute pool workers, where every request runs, take the chunks inline:
+    that pool already has a process per core, and a pool of its own would
+    oversubscribe the CPUs. Job pool workers spread them over a chunk pool
+    of their own, started once and reused (JOB_CHUNK_WORKERS processes, so
+    by default the job workers together use every core). Elsewhere (scripts,
+    benchmarks) the shared compute pool is used.
+
+    Args:
+        fn (callable): Module-level (picklable) function of (task, shared)
+        tasks (list): Picklable tasks, e.g. (seed, size) per chunk
+        shared: Picklable data every task needs
+        parallel (bool): Whether the run is large enough to be worth a pool
+
+    Returns:
+        iterator: Results of fn, in task order
+    """
+    if in_compute_worker():
+        workers = _worker_state.chunk_workers
+    else:
+        workers = cpu_workers()
+    if not parallel or workers < 2 or len(tasks) < 2:
+        return (fn(task, shared) for task in tasks)
+
+    executor = _get_chunk_executor() if in_compute_worker() else _get_cpu_executor()
+    return executor.map(fn, tasks, [shared] * len(tasks))
+
+
+async def run_fetch(fn, *args):
+    """
+    Run a blocking price fetch off the event loop, with the fetch timeout.
+
+    The wait is recorded as the request's 'fetch' stage.
+
+    Args:
+        fn (callable): Fetch function (e.g. fetch_with_benchmark)
+        *args: Arguments for fn
+
+    Returns:
+        Result of fn
+
+    Raises:
+        FetchTimeoutError: If the fetch takes longer than fetch_timeout().
+            A fetch still queued for a thread or a download slot is dropped;
+            a download already running keeps going and lands in the price
+            store
+    """
+    loop = asyncio.get_running_loop()
+    timeout = fetch_timeout()
+    future = loop.run_in_executor(_get_fetch_executor(),
+                                  functools.partial(_fetch_with_deadline, time.monotonic() + timeout, fn, *args))
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        raise FetchTimeoutError(f"Price data did not arrive within {timeout:g} seconds")
+    finally:
+        record_stage('fetch', time.perf_counter() - start)
+
+
+async def run_cpu(fn, *args):
+    """
+    Run a CPU-bound computation in the compute pool.
+
+    The whole call (including pool queueing and pickling) is recorded as the
+    request's 'compute' stage, and stages recorded inside fn (e.g. 'metrics',
+    'stress') are brought back from the worker and added to the request.
+
+    Args:
+        fn (callable): Module-level (picklable) function
+        *args: Picklable arguments for fn
+
+    Returns:
+        Result of fn
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        result, stages = await loop.run_in_executor(_get_cpu_executor(),
+                                                    functools.partial(run_with_stages, fn, *args))
+    finally:
+        record_stage('compute', time.perf_counter() - start)
+    merge_stages(stages)
+    return result
@@ -0,0 +1,250 @@
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Above this many assets calculate_all_metrics returns the compact
+# correlation summary instead of the nested ticker -> ticker matrix
+LARGE_UNIVERSE_ASSETS = 100
+
+# Assets per tile side; a tile product needs T x block inputs and a
+# block x block float32 result
+DEFAULT_BLOCK_SIZE = 512
+
+# Most correlated other assets listed per asset
+DEFAULT_TOP_K = 5
+
+CORRELATION_MODES = ('auto', 'full', 'compact')
+
+
+def standardize_returns(returns, dtype=np.float32, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Scale returns so the correlation matrix is a plain product Z^T Z.
+
+    Each column is centred and divided by its population standard deviation
+    times sqrt(T) (statistics in float64, result cast to dtype), block_size
+    columns at a time so the float64 temporaries stay small. Assets whose
+    returns never change get a zero column and so zero correlations.
+
+    Args:
+        returns (np.ndarray): Daily asset returns (T x N)
+        dtype: Output dtype (default: float32)
+        block_size (int): Columns standardized at a time
+
+    Returns:
+        np.ndarray: Standardized returns (T x N)
+    """
+    returns = np.asarray(returns, dtype=float)
+    standardized = np.empty(returns.shape, dtype=dtype)
+    for j0 in range(0, returns.shape[1], block_size):
+        centred = returns[:, j0:j0 + block_size] - returns[:, j0:j0 + block_size].mean(axis=0)
+        norms = np.sqrt((centred * centred).sum(axis=0))
+        scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+        standardized[:, j0:j0 + block_size] = centred * scale
+    return standardized
+
+
+def packed_index(i, j, n):
+    """
+    Position of pair (i, j), i < j, in a packed upper triangle.
+
+    The packed buffer holds the strict upper triangle row by row (the
+    condensed form used by scipy.spatial.distance), so pair (i, j) is at
+    n * i - i * (i + 1) / 2 + (j - i - 1).
+    """
+    return n * i - i * (i + 1) // 2 + (j - i - 1)
+
+
+def ledoit_wolf_intensity(standardized, packed):
+    """
+    Ledoit-Wolf shrinkage intensity of the correlation matrix towards identity.
+
+    Standardized returns have unit variance, so the Ledoit-Wolf (2004)
+    estimator shrinks the sample correlation R to (1 - s) R + s I: every
+    off-diagonal entry is multiplied by (1 - s). The intensity needs the
+    squared norm of R, which comes from the packed triangle, and the fourth
+    powers of the returns, so it costs no extra pass over the pairs.
+
+    Args:
+        standardized (np.ndarray): Output of standardize_returns (T x N)
+        packed (np.ndarray): Packed strict upper triangle of R
+
+    Returns:
+        float: Shrinkage intensity s between 0 and 1
+    """
+    t, n = standardized.shape
+    # Squared off-diagonal norm of R, accumulated in float64 chunks
+    off_diagonal_sq = 0.0
+    for start in range(0, len(packed), 1 << 20):
+        chunk = packed[start:start + (1 << 20)].astype(float)
+        off_diagonal_sq += 2.0 * float(np.dot(chunk, chunk))
+    if off_diagonal_sq == 0:
+        return 0.0
+
+    # Distance of R from the identity target: ||R - I||^2 / n
+    delta = off_diagonal_sq / n
+
+    # Variance of the sample estimate: (sum_t ||x_t||^4 / T - ||R||^2) / (n T),
+    # with x_t the unit-variance returns (standardized times sqrt(T))
+    row_norms = np.zeros(t)
+    for j0 in range(0, n, DEFAULT_BLOCK_SIZE):
+        block = standardized[:, j0:j0 + DEFAULT_BLOCK_SIZE].astype(float)
+        row_norms += (block * block).sum(axis=1)
+    row_norms *= t
+    beta = (float(np.dot(row_norms, row_norms)) / t - (n + off_diagonal_sq)) / (n * t)
+
+    return min(max(beta, 0.0), delta) / delta
+
+
+def blocked_correlation(returns, block_size=DEFAULT_BLOCK_SIZE, top_k=DEFAULT_TOP_K):
+    """
+    Correlation matrix of a large universe, computed tile by tile in float32.
+
+    Returns are standardized once; the upper triangle is then built from
+    block x block tile products and written straight into a packed buffer,
+    so the working set is T x block inputs plus one tile, never the full
+    N x N matrix. The most correlated other assets of every asset are
+    tracked across tiles at the same time.
+
+    Args:
+        returns (np.ndarray): Daily asset returns (T x N)
+        block_size (int): Assets per tile side (default: 512)
+        top_k (int): Most correlated other assets kept per asset (default: 5)
+
+    Returns:
+        dict: {
+            'standardized': np.ndarray (T x N float32),
+            'packed': np.ndarray (N(N-1)/2 float32, strict upper triangle),
+            'top_index': np.ndarray (N x k), 'top_value': np.ndarray (N x k)
+        }
+    """
+    z = standardize_returns(returns)
+    n = z.shape[1]
+    k = max(0, min(top_k, n - 1))
+
+    packed = np.empty(n * (n - 1) // 2, dtype=np.float32)
+    top_value = np.full((n, k), -np.inf, dtype=np.float32)
+    top_index = np.full((n, k), -1, dtype=np.int64)
+
+    def update_top(rows, candidates, columns):
+        # Merge each row's candidates with its current top k
+        values = np.concatenate([top_value[rows], candidates], axis=1)
+        indices = np.concatenate([top_index[rows], np.broadcast_to(columns, candidates.shape)], axis=1)
+        keep = np.argpartition(-values, k - 1, axis=1)[:, :k]
+        top_value[rows] = np.take_along_axis(values, keep, axis=1)
+        top_index[rows] = np.take_along_axis(indices, keep, axis=1)
+
+    for i0 in range(0, n, block_size):
+        i1 = min(i0 + block_size, n)
+        for j0 in range(i0, n, block_size):
+            j1 = min(j0 + block_size, n)
+            tile = np.clip(z[:, i0:i1].T @ z[:, j0:j1], -1.0, 1.0)
+            if j0 == i0:
+                np.fill_diagonal(tile, -np.inf)
+
+            # Row r of the tile holds pairs (r, j0..j1); keep those with j > r
+            for r in range(i0, i1):
+                lo = max(j0, r + 1)
+                if lo < j1:
+                    start = packed_index(r, lo, n)
+                    packed[start:start + j1 - lo] = tile[r - i0, lo - j0:]
+
+            if k:
+                columns = np.arange(j0, j1)
+                update_top(np.arange(i0, i1), tile, columns)
+                if j0 != i0:
+                    update_top(np.arange(j0, j1), tile.T, np.arange(i0, i1))
+
+    # Best first
+    order = np.argsort(-top_value, axis=1)
+    return {
+        'standardized': z,
+        'packed': packed,
+        'top_index': np.take_along_axis(top_index, order, axis=1),
+        'top_value': np.take_along_axis(top_value, order, axis=1)
+    }
+
+
+def cluster_order(packed, n):
+    """
+    Order assets so that correlated ones sit together (average linkage).
+
+    Uses the correlation distance sqrt(2 (1 - rho)) on the packed triangle,
+    which is already in scipy's condensed distance layout. Undefined (NaN)
+    correlations of constant assets count as zero, as in compact mode.
+
+    Args:
+        packed (np.ndarray): Packed strict upper triangle of the correlations
+        n (int): Number of assets
+
+    Returns:
+        list: Asset indices in clustered order
+    """
+    if n < 3:
+        return list(range(n))
+    # Imported on first use to keep scipy out of server start-up
+    from scipy.cluster.hierarchy import leaves_list, linkage
+
+    packed = np.nan_to_num(packed.astype(float), nan=0.0)
+    distances = np.sqrt(np.maximum(2.0 * (1.0 - packed), 0.0))
+    return leaves_list(linkage(distances, method='average')).tolist()
+
+
+def correlation_summary(returns, tickers, shrinkage=False, top_k=DEFAULT_TOP_K,
+                        block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Compact correlation structure of a large universe.
+
+    Instead of an N x N nested dict this returns the packed upper triangle
+    (float32), the top_k most correlated other assets of each asset and a
+    hierarchically clustered asset order for the heatmap.
+
+    Args:
+        returns (np.ndarray): Daily asset returns (T x N)
+        tickers (list): Asset tickers (column order)
+        shrinkage (bool): Apply Ledoit-Wolf shrinkage towards identity
+        top_k (int): Most correlated other assets listed per asset
+        block_size (int): Assets per tile side
+
+    Returns:
+        dict: {
+            'tickers': list,
+            'packed': np.ndarray (float32; pair (i, j), i < j, at packed_index(i, j, N)),
+            'order': list (clustered order of asset indices),
+            'top_pairs': {ticker: [{'ticker': str, 'correlation': float}]},
+            'shrinkage': float or None (intensity applied)
+        }
+    """
+    n = len(tickers)
+    logger.info(f"Calculating blocked correlations for {n} assets")
+    blocked = blocked_correlation(returns, block_size=block_size, top_k=top_k)
+    packed = blocked['packed']
+
+    # Shrinkage scales every off-diagonal entry alike, so the top pairs and
+    # their order are unchanged and only the values are rescaled
+    intensity = None
+    scale = 1.0
+    if shrinkage:
+        intensity = ledoit_wolf_intensity(blocked['standardized'], packed)
+        scale = 1.0 - intensity
+        packed *= np.float32(scale)
+
+    top_pairs = {
+        ticker: [
+            {
+                'ticker': tickers[j],
+                'correlation': float(value) * scale
+            }
+            for j, value in zip(blocked['top_index'][i].tolist(), blocked['top_value'][i].tolist())
+        ]
+        for i, ticker in enumerate(tickers)
+    }
+
+    return {
+        'tickers': list(tickers),
+        'packed': packed,
+        'order': cluster_order(packed, n),
+        'top_pairs': top_pairs,
+        'shrinkage': intensity
+    }
@@ -1,11 +1,30 @@
-import yfinance as yf
-import pandas as pd
+import os
+import threading
+import numpy as np
 from datetime import datetime
 import logging
+from price_store import PriceStore
+from price_panel import DEFAULT_PANEL_DIR, PricePanel
+from single_flight import SingleFlight
+from providers import get_provider
+from concurrency import FetchTimeoutError, bounded_upstream
+from instrumentation import PRICE_PANEL_LOOKUPS
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Lazily created shared price store (see get_price_store)
+_price_store = None
+_price_store_lock = threading.Lock()
+
+# Memory-mapped price panel shared with the other server processes (see get_price_panel)
+_price_panel = None
+_price_panel_lock = threading.Lock()
+
+# Deduplicates concurrent downloads when the price store is disabled
+_download_flight = SingleFlight()
+
+
 def fetch_stock_data(ticker, start_date, end_date):
     """
     Fetch historical stock data for a single ticker.
@@ -23,33 +42,166 @@ def fetch_stock_data(ticker, start_date, end_date):
     """
     try:
         logger.info(f"Fetching data for {ticker} from {start_date} to {end_date}")
-        stock = yf.Ticker(ticker)
-        data = stock.history(start=start_date, end=end_date)
+        data = load_close_prices([ticker], start_date, end_date)
 
-        if data.empty:
+        if data.empty or ticker not in data.columns or data[ticker].isna().all():
             raise ValueError(f"No data found for ticker {ticker}")
 
-        return data['Close']
+        return data[ticker].dropna()
 
     except Exception as e:
         logger.error(f"Error fetching data for {ticker}: {str(e)}")
         raise ValueError(f"Failed to fetch data for {ticker}: {str(e)}")
 
 
-def fetch_multiple_tickers(tickers, start_date, end_date):
+def get_price_store():
+    """
+    Return the shared on-disk price store, or None if it is disabled.
+
+    The store is disabled by setting the PRICE_STORE environment variable to "off".
+
+    Returns:
+        PriceStore: Shared price store instance
+    """
+    global _price_store
+
+    if os.environ.get('PRICE_STORE', 'on').lower() in ('off', '0', 'false'):
+        return None
+
+    with _price_store_lock:
+        if _price_store is None:
+            _price_store = PriceStore()
+    return _price_store
+
+
+def get_price_panel():
+    """
+    Return the shared price panel, or None if there is none.
+
+    The panel is read from PRICE_PANEL_DIR and disabled by setting the
+    PRICE_PANEL environment variable to "off". Opening it maps the published
+    arrays without reading them; a panel republished by price_panel.py is
+    picked up on the next call.
+
+    Returns:
+        PricePanel: Current price panel
+    """
+    global _price_panel
+
+    if os.environ.get('PRICE_PANEL', 'on').lower() in ('off', '0', 'false'):
+        return None
+
+    with _price_panel_lock:
+        if _price_panel is None or _price_panel.is_stale():
+            directory = os.environ.get('PRICE_PANEL_DIR', DEFAULT_PANEL_DIR)
+            try:
+                _price_panel = PricePanel(directory)
+                logger.info(
+                    f"Opened price panel {_price_panel.version} with {len(_price_panel.tickers)} tickers"
+                )
+            except (OSError, ValueError, KeyError):
+                _price_panel = None
+    return _price_panel
+
+
+def load_close_prices(tickers, start_date, end_date, provider=None, use_panel=True):
+    """
+    Load close prices from the price provider.
+
+    Requests covered entirely by the shared price panel are served from it
+    without any download. Providers that download over the network go through the on-disk price
+    store (unless it is disabled), and concurrent loads of the same tickers and
+    range share a single download. At most FETCH_CONCURRENCY calls per provider
+    run at once across all requests. Unlike fetch_multiple_tickers, no
+    validation is done on the result.
+
+    Args:
+        tickers (list): List of stock ticker symbols
+        start_date (str): Start date in YYYY-MM-DD format
+        end_date (str): End date in YYYY-MM-DD format
+        provider (PriceProvider, optional): Price source (default: the
+            process-wide provider from providers.get_provider)
+        use_panel (bool): Look in the price panel first (default: True)
+
+    Returns:
+        pd.DataFrame: Close prices with one column per ticker (may be empty)
+    """
+    if provider is None:
+        provider = get_provider()
+
+    panel = get_price_panel() if use_panel else None
+    if panel is not None:
+        if panel.covers(provider.name, tickers, start_date, end_date):
+            PRICE_PANEL_LOOKUPS.inc('hit')
+            return panel.read(tickers, start_date, end_date)
+        PRICE_PANEL_LOOKUPS.inc('miss')
+
+    fetch = bounded_upstream(provider.fetch, provider.name)
+
+    store = get_price_store() if provider.cacheable else None
+    if store is not None:
+        return store.get(tickers, start_date, end_date, fetch)
+
+    # Fetch data for all tickers at once
+    key = (provider.name, tuple(tickers), start_date, end_date)
+    return _download_flight.do(key, lambda: fetch(tickers, start_date, end_date))
+
+
+def download_flight_stats():
+    """
+    Return the download deduplication counters.
+
+    Combines the single-flight counters of direct provider loads and of the
+    price store's range downloads.
+
+    Returns:
+        dict: Calls that started a download, loads served by a download
+            already in flight, and downloads in flight
+    """
+    stats = dict(_download_flight.stats())
+    if _price_store is not None:
+        for name, value in _price_store.flight.stats().items():
+            stats[name] += value
+    return stats
+
+
+def _check_missing_tickers(prices, tickers):
+    """Raise ValueError if any ticker has no data at all."""
+    if prices.empty:
+        raise ValueError("No data found for the provided tickers")
+
+    # Check for missing data
+    missing_tickers = []
+    for ticker in tickers:
+        if ticker not in prices.columns or prices[ticker].isna().all():
+            missing_tickers.append(ticker)
+
+    if missing_tickers:
+        raise ValueError(f"Invalid or missing data for tickers: {', '.join(missing_tickers)}")
+
+
+def fetch_multiple_tickers(tickers, start_date, end_date, provider=None):
     """
     Fetch historical stock data for multiple tickers.
 
+    Prices come from the configured price provider. Tickers and dates in the
+    shared price panel are returned as views of it; downloaded prices are
+    served from the on-disk price store where possible; only days that have
+    never been downloaded are requested from the provider.
+
     Args:
         tickers (list): List of stock ticker symbols
         start_date (str): Start date in YYYY-MM-DD format
         end_date (str): End date in YYYY-MM-DD format
+        provider (PriceProvider, optional): Price source (see load_close_prices)
 
     Returns:
         pd.DataFrame: DataFrame with adjusted close prices for all tickers
 
     Raises:
         ValueError: If any ticker is invalid or data cannot be fetched
+        FetchTimeoutError: If no download slot frees up within the request's
+            fetch timeout (see bounded_upstream)
     """
     try:
         logger.info(f"Fetching data for {len(tickers)} tickers")
@@ -58,38 +210,76 @@ def fetch_multiple_tickers(tickers, start_date, end_date):
         if not tickers or not isinstance(tickers, list):
             raise ValueError("Tickers must be a non-empty list")
 
-        # Fetch data for all tickers at once
-        data = yf.download(tickers, start=start_date, end=end_date, progress=False)
-
-        if data.empty:
-            raise ValueError("No data found for the provided tickers")
+        prices = load_close_prices(tickers, start_date, end_date, provider)
+        _check_missing_tickers(prices, tickers)
 
-        # Extract adjusted close prices
-        if len(tickers) == 1:
-            # For single ticker, yfinance returns a different structure
-            # Create a DataFrame with the single ticker column
-            prices = pd.DataFrame(data['Close'])
-            prices.columns = [tickers[0]]
-        else:
-            prices = data['Close']
-
-        # Check for missing data
-        missing_tickers = []
-        for ticker in tickers:
-            if ticker not in prices.columns or prices[ticker].isna().all():
-                missing_tickers.append(ticker)
-
-        if missing_tickers:
-            raise ValueError(f"Invalid or missing data for tickers: {', '.join(missing_tickers)}")
+        # Keep columns in request order so they line up with the weights
+        # (panel reads already are, and selecting again would copy them)
+        if list(prices.columns) != tickers:
+            prices = prices[tickers]
 
         logger.info(f"Successfully fetched {len(prices)} data points for {len(tickers)} tickers")
         return prices
 
+    except FetchTimeoutError:
+        raise
     except Exception as e:
         logger.error(f"Error fetching multiple tickers: {str(e)}")
         raise ValueError(f"Failed to fetch ticker data: {str(e)}")
 
 
+def fetch_with_benchmark(tickers, start_date, end_date, benchmark='SPY', provider=None):
+    """
+    Fetch portfolio prices and benchmark prices in a single batched download.
+
+    The benchmark is optional: if it cannot be fetched, the portfolio prices are
+    still returned and the benchmark is None.
+
+    Args:
+        tickers (list): List of stock ticker symbols
+        start_date (str): Start date in YYYY-MM-DD format
+        end_date (str): End date in YYYY-MM-DD format
+        benchmark (str): Benchmark ticker symbol (default: SPY)
+        provider (PriceProvider, optional): Price source (see load_close_prices)
+
+    Returns:
+        tuple: (pd.DataFrame of portfolio prices, pd.Series of benchmark prices or None)
+
+    Raises:
+        ValueError: If any portfolio ticker is invalid or data cannot be fetched
+        FetchTimeoutError: If no download slot frees up within the request's
+            fetch timeout (see bounded_upstream)
+    """
+    try:
+        logger.info(f"Fetching data for {len(tickers)} tickers plus benchmark {benchmark}")
+
+        # Validate tickers
+        if not tickers or not isinstance(tickers, list):
+            raise ValueError("Tickers must be a non-empty list")
+
+        request_tickers = tickers if benchmark in tickers else tickers + [benchmark]
+        prices = load_close_prices(request_tickers, start_date, end_date, provider)
+        _check_missing_tickers(prices, tickers)
+
+        benchmark_prices = None
+        if benchmark in prices.columns and not prices[benchmark].isna().all():
+            benchmark_prices = prices[benchmark].dropna()
+        else:
+            logger.warning(f"Could not fetch {benchmark} for beta calculation")
+
+        # Drop days on which only the benchmark traded
+        portfolio_prices = prices[tickers].dropna(how='all')
+
+        logger.info(f"Successfully fetched {len(portfolio_prices)} data points for {len(tickers)} tickers")
+        return portfolio_prices, benchmark_prices
+
+    except FetchTimeoutError:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching tickers with benchmark: {str(e)}")
+        raise ValueError(f"Failed to fetch ticker data: {str(e)}")
+
+
 def validate_weights(weights):
     """
     Validate that portfolio weights sum to 100% (or 1.0).
@@ -125,3 +315,50 @@ def validate_weights(weights):
         raise ValueError(f"Weights must sum to 100%, currently sum to {total}%")
 
     return True
+
+
+def validate_weight_matrix(weights_matrix, num_tickers):
+    """
+    Validate a matrix of portfolio weights (one portfolio per row).
+
+    Each row follows the same rules as validate_weights, but the checks are
+    done on the whole matrix at once so thousands of rows stay cheap.
+
+    Args:
+        weights_matrix (list): List of weight lists, one per portfolio
+        num_tickers (int): Number of tickers each row must cover
+
+    Returns:
+        np.ndarray: Weights as an N x K float array (percentages)
+
+    Raises:
+        ValueError: If the matrix is malformed or any row is invalid
+    """
+    if not weights_matrix or not isinstance(weights_matrix, list):
+        raise ValueError("Weights must be a non-empty list of weight lists")
+
+    # Check that the matrix is rectangular and numeric
+    try:
+        weights_array = np.array(weights_matrix, dtype=float)
+    except (ValueError, TypeError):
+        raise ValueError("All weights must be numeric values with one row per portfolio")
+
+    if weights_array.ndim != 2 or weights_array.shape[1] != num_tickers:
+        raise ValueError(f"Each weight row must have exactly {num_tickers} values (one per ticker)")
+
+    if not np.isfinite(weights_array).all():
+        raise ValueError("All weights must be numeric values")
+
+    # Check for negative weights
+    negative_rows = np.flatnonzero((weights_array < 0).any(axis=1))
+    if len(negative_rows):
+        raise ValueError(f"Weights cannot be negative (row {negative_rows[0]})")
+
+    # Check that every row sums to 100 (with the same tolerance as validate_weights)
+    totals = weights_array.sum(axis=1)
+    bad_rows = np.flatnonzero((totals < 99.9) | (totals > 100.1))
+    if len(bad_rows):
+        row = bad_rows[0]
+        raise ValueError(f"Weights must sum to 100%, row {row} sums to {totals[row]}%")
+
+    return weights_array
@@ -0,0 +1,96 @@
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Smallest max_points accepted: first and last point plus a few buckets
+MIN_POINTS = 10
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Select points with Largest-Triangle-Three-Buckets downsampling.
+
+    The series is split into max_points - 2 buckets between the first and
+    last point. From each bucket the point forming the largest triangle with
+    the previously selected point and the average of the next bucket is kept,
+    which preserves the visual shape of the line.
+
+    Args:
+        x (np.ndarray): Increasing x coordinates (e.g. day numbers)
+        y (np.ndarray): Values
+        max_points (int): Number of points to keep
+
+    Returns:
+        np.ndarray: Sorted indices of the kept points
+    """
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Bucket i covers [edges[i], edges[i + 1]); the last edge is the final point
+    every = (n - 2) / (max_points - 2)
+    edges = np.append((np.arange(max_points - 1) * every).astype(int) + 1, n)
+
+    selected = np.empty(max_points, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # Average point of every bucket up front (the last "bucket" is the final
+    # point); the average of the next bucket is each triangle's third corner
+    counts = np.diff(edges)
+    average_x = np.add.reduceat(x, edges[:-1]) / counts
+    average_y = np.add.reduceat(y, edges[:-1]) / counts
+
+    previous = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+
+        # Twice the triangle area for every candidate in this bucket
+        area = np.abs(
+            (x[previous] - average_x[i + 1]) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (average_y[i + 1] - y[previous])
+        )
+        previous = lo + int(area.argmax())
+        selected[i + 1] = previous
+
+    return selected
+
+
+def minmax_indices(y, max_points):
+    """
+    Select the minimum and maximum of each bucket.
+
+    Keeps every local extreme at bucket resolution, so spikes and troughs
+    (e.g. the maximum drawdown) are never dropped.
+
+    Args:
+        y (np.ndarray): Values
+        max_points (int): Upper bound on the number of points kept
+
+    Returns:
+        np.ndarray: Sorted indices of the kept points
+    """
+    n = len(y)
+    if max_points >= n or max_points < 4:
+        return np.arange(n)
+
+    interior = np.asarray(y[1:-1], dtype=float)
+    size = -(-len(interior) // ((max_points - 2) // 2))
+    buckets = -(-len(interior) // size)
+
+    # Pad the last bucket so all buckets form one 2-D array
+    padded_low = np.full(buckets * size, np.inf)
+    padded_low[:len(interior)] = interior
+    padded_high = np.full(buckets * size, -np.inf)
+    padded_high[:len(interior)] = interior
+
+    offsets = np.arange(buckets) * size + 1
+    lows = offsets + padded_low.reshape(buckets, size).argmin(axis=1)
+    highs = offsets + padded_high.reshape(buckets, size).argmax(axis=1)
+
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
@@ -0,0 +1,351 @@
+import contextvars
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter as TallyCounter
+from contextlib import contextmanager
+
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Latency histogram buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Sampling profiler: interval between stack samples (PROFILE_INTERVAL_MS) and
+# directory the folded stacks are written to (PROFILE_DIR)
+DEFAULT_PROFILE_INTERVAL_MS = 5
+DEFAULT_PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'portfolio-profiles')
+
+# Stage timings of the request being handled: {'endpoint': str, 'stages': [(name, seconds)]}
+_request_state = contextvars.ContextVar('request_state', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels (thread-safe)."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        """Add amount (default 1) to the series with these label values."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram with optional labels (thread-safe)."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        """Record one observation (seconds) for the series with these label values."""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    bucket_labels = _format_labels(self.labelnames, labels, [('le', _format_value(float(bound)))])
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                inf_labels = _format_labels(self.labelnames, labels, [('le', '+Inf')])
+                lines.append(f"{self.name}_bucket{inf_labels} {series['count']}")
+                label_text = _format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{label_text} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{label_text} {series['count']}")
+        return lines
+
+
+class Registry:
+    """
+    Metrics exposed at /api/metrics in the Prometheus text format.
+
+    Holds counters and histograms updated on the hot path, plus collectors:
+    callables run at scrape time that turn existing stats (result cache,
+    single-flight, jobs) into samples, so those stay free to update.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """
+        Register a scrape-time collector.
+
+        Args:
+            collect (callable): Returns a list of (name, type, help, samples)
+                where type is 'counter' or 'gauge' and samples is a list of
+                (labels dict, value)
+        """
+        self._collectors.append(collect)
+
+    def render(self):
+        """
+        Render every metric.
+
+        Returns:
+            str: Prometheus text exposition format (version 0.0.4)
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {str(e)}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    label_text = _format_labels(labels.keys(), labels.values())
+                    lines.append(f"{name}{label_text} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint', ('endpoint', 'method'))
+REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Requests by endpoint and status code', ('endpoint', 'method', 'status'))
+STAGE_DURATION = REGISTRY.histogram(
+    'request_stage_duration_seconds', 'Time spent in each request stage', ('endpoint', 'stage'))
+PRICE_DOWNLOADS = REGISTRY.counter(
+    'price_downloads_total', 'Upstream price downloads by outcome', ('outcome',))
+PRICE_DOWNLOAD_DURATION = REGISTRY.histogram(
+    'price_download_duration_seconds', 'Upstream price download latency')
+PRICE_STORE_LOOKUPS = REGISTRY.counter(
+    'price_store_lookups_total', 'Tickers requested from the price store, by whether a download was needed',
+    ('result',))
+PRICE_PANEL_LOOKUPS = REGISTRY.counter(
+    'price_panel_lookups_total', 'Price loads by whether the shared price panel covered them', ('result',))
+
+
+def start_request(endpoint):
+    """
+    Begin collecting stage timings for the current request.
+
+    Returns:
+        dict: Request state (pass to finish_request)
+    """
+    state = {'endpoint': endpoint, 'stages': [], 'started': time.perf_counter()}
+    _request_state.set(state)
+    return state
+
+
+def record_stage(name, seconds):
+    """Add a stage timing to the current request (ignored outside a request)."""
+    state = _request_state.get()
+    if state is not None:
+        state['stages'].append((name, seconds))
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a block of work as a named stage of the current request.
+
+    Usage:
+        with stage('metrics'):
+            metrics = calculate_all_metrics(...)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def run_with_stages(fn, *args):
+    """
+    Call fn collecting the stages it records into a fresh list.
+
+    Used to run compute functions in pool workers (threads or processes),
+    which do not share the request's state; the caller merges the returned
+    stages with merge_stages.
+
+    Returns:
+        tuple: (result of fn, list of (stage, seconds))
+    """
+    state = {'endpoint': None, 'stages': [], 'started': time.perf_counter()}
+    token = _request_state.set(state)
+    try:
+        return fn(*args), state['stages']
+    finally:
+        _request_state.reset(token)
+
+
+def merge_stages(stages):
+    """Add stages recorded elsewhere (see run_with_stages) to the current request."""
+    for name, seconds in stages:
+        record_stage(name, seconds)
+
+
+def finish_request(state, method, status):
+    """
+    Record the request in the latency histograms.
+
+    Args:
+        state (dict): From start_request
+        method (str): HTTP method
+        status (int): Response status code
+
+    Returns:
+        str: Server-Timing header value (stages summed by name, plus total)
+    """
+    total = time.perf_counter() - state['started']
+    endpoint = state['endpoint']
+    REQUEST_DURATION.observe(total, endpoint, method)
+    REQUESTS.inc(endpoint, method, str(status))
+
+    durations = {}
+    for name, seconds in state['stages']:
+        durations[name] = durations.get(name, 0.0) + seconds
+    for name, seconds in durations.items():
+        STAGE_DURATION.observe(seconds, endpoint, name)
+
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(entries)
+
+
+def profiling_enabled():
+    """Whether per-request profiling may be requested (PROFILE_REQUESTS environment variable)."""
+    return os.environ.get('PROFILE_REQUESTS', 'off').lower() in ('on', '1', 'true')
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stacks of every thread in the process.
+
+    A background thread reads sys._current_frames() every interval and counts
+    each stack in folded form ("thread;module:function;... count"), the input
+    format of flamegraph.pl and speedscope. Only threads of this process are
+    seen: computations in pool processes (CPU_WORKERS > 0) show up as waits,
+    so run with CPU_WORKERS=0 to profile them.
+    """
+
+    def __init__(self, interval=None):
+        """
+        Args:
+            interval (float, optional): Seconds between samples (default:
+                PROFILE_INTERVAL_MS / 1000)
+        """
+        if interval is None:
+            interval = float(os.environ.get('PROFILE_INTERVAL_MS', DEFAULT_PROFILE_INTERVAL_MS)) / 1000
+        self.interval = interval
+        self.samples = TallyCounter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def folded(self):
+        """str: Collected stacks in folded format, most frequent first."""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common()) + '\n'
+
+    def save(self, label):
+        """
+        Write the folded stacks to PROFILE_DIR.
+
+        Args:
+            label (str): Included in the file name (e.g. the endpoint)
+
+        Returns:
+            str: Name of the written file
+        """
+        directory = os.environ.get('PROFILE_DIR', DEFAULT_PROFILE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}.folded"
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(self.folded())
+        logger.info(f"Wrote {sum(self.samples.values())} profile samples to {name}")
+        return name
@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+import uuid
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import logging
+from concurrency import mark_compute_worker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Worker processes running jobs (override with JOB_WORKERS)
+DEFAULT_JOB_WORKERS = 2
+
+# Finished jobs kept for polling; the oldest are dropped first (JOB_RESULTS_MAX)
+DEFAULT_MAX_RESULTS = 100
+
+# Jobs queued or running at once before new submissions are refused (JOB_QUEUE_LIMIT)
+DEFAULT_QUEUE_LIMIT = 100
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+# Set in each worker process by the pool initializer
+_progress_queue = None
+_current_job_id = None
+
+
+class JobQueueFullError(Exception):
+    """Raised when too many jobs are queued or running."""
+
+
+def _init_worker(progress_queue, chunk_workers):
+    """Process pool initializer: keep the queue progress updates are sent on."""
+    global _progress_queue
+    _progress_queue = progress_queue
+    mark_compute_worker(chunk_workers)
+
+
+def report_progress(progress, stage):
+    """
+    Report progress of the job running in this worker process.
+
+    Job functions call this between their steps; outside a job it does nothing.
+
+    Args:
+        progress (float): Fraction done, 0 to 1
+        stage (str): Short description of the current step
+    """
+    if _progress_queue is not None and _current_job_id is not None:
+        _progress_queue.put((_current_job_id, float(progress), stage))
+
+
+def _run_job(job_id, fn, args):
+    """Run a job function in a worker process with progress reporting."""
+    global _current_job_id
+    _current_job_id = job_id
+    try:
+        report_progress(0.0, 'Started')
+        return fn(*args)
+    finally:
+        _current_job_id = None
+
+
+class JobManager:
+    """
+    Runs long computations in a local process pool and keeps their results.
+
+    Jobs are submitted with a module-level (picklable) function and its
+    arguments; the function may call report_progress. Job records hold the
+    status, progress, timings and the result or error, and are kept in a
+    bounded store: when it is full, the oldest finished jobs are dropped.
+    """
+
+    def __init__(self, max_workers=None, max_results=None, queue_limit=None, chunk_workers=None):
+        """
+        Create the job manager (the process pool is started on first submit).
+
+        Args:
+            max_workers (int, optional): Worker processes (default: JOB_WORKERS or 2)
+            chunk_workers (int, optional): Processes each worker spreads chunked
+                simulations over (default: JOB_CHUNK_WORKERS, or the CPU count
+                divided between the workers)
+            max_results (int, optional): Finished jobs kept (default: JOB_RESULTS_MAX or 100)
+            queue_limit (int, optional): Unfinished jobs allowed (default: JOB_QUEUE_LIMIT or 100)
+        """
+        if max_workers is None:
+            max_workers = int(os.environ.get('JOB_WORKERS', DEFAULT_JOB_WORKERS))
+        if chunk_workers is None:
+            chunk_workers = int(os.environ.get('JOB_CHUNK_WORKERS',
+                                               max(1, (os.cpu_count() or 1) // max(max_workers, 1))))
+        if max_results is None:
+            max_results = int(os.environ.get('JOB_RESULTS_MAX', DEFAULT_MAX_RESULTS))
+        if queue_limit is None:
+            queue_limit = int(os.environ.get('JOB_QUEUE_LIMIT', DEFAULT_QUEUE_LIMIT))
+
+        self.max_workers = max_workers
+        self.chunk_workers = chunk_workers
+        self.max_results = max_results
+        self.queue_limit = queue_limit
+
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._progress_queue = None
+
+    def _ensure_pool(self):
+        # Called with the lock held
+        if self._pool is None:
+            self._progress_queue = multiprocessing.Queue()
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                             initargs=(self._progress_queue, self.chunk_workers))
+            threading.Thread(target=self._listen_progress, name='job-progress', daemon=True).start()
+            logger.info(f"Started job pool with {self.max_workers} worker processes")
+
+    def _listen_progress(self):
+        """Apply progress updates sent by the workers."""
+        while True:
+            job_id, progress, stage = self._progress_queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] in ('succeeded', 'failed'):
+                    continue
+                if job['status'] == 'queued':
+                    job['status'] = 'running'
+                    job['started_at'] = time.time()
+                job['progress'] = progress
+                job['stage'] = stage
+
+    def _evict(self):
+        # Drop the oldest finished jobs beyond max_results (lock held)
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in ('succeeded', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.max_results)]:
+            del self._jobs[job_id]
+
+    def submit(self, job_type, fn, *args):
+        """
+        Queue a job.
+
+        Args:
+            job_type (str): Name of the job type (reported back to clients)
+            fn (callable): Module-level function run in a worker process
+            *args: Picklable arguments for fn
+
+        Returns:
+            str: Job id
+
+        Raises:
+            JobQueueFullError: If queue_limit jobs are already unfinished
+        """
+        with self._lock:
+            unfinished = sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'running'))
+            if unfinished >= self.queue_limit:
+                raise JobQueueFullError(f"Too many jobs in progress ({unfinished}); try again later")
+
+            self._ensure_pool()
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'job_type': job_type,
+                'status': 'queued',
+                'progress': 0.0,
+                'stage': 'Queued',
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None
+            }
+            future = self._pool.submit(_run_job, job_id, fn, args)
+
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        logger.info(f"Queued {job_type} job {job_id}")
+        return job_id
+
+    def _finish(self, job_id, future):
+        """Record the outcome of a job."""
+        error = None
+        result = None
+        try:
+            result = future.result()
+        except ValueError as e:
+            error = str(e)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            error = 'An unexpected error occurred'
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job['finished_at'] = time.time()
+            job['started_at'] = job['started_at'] or job['finished_at']
+            if error is None:
+                job.update(status='succeeded', progress=1.0, stage='Done', result=result)
+            else:
+                job.update(status='failed', stage='Failed', error=error)
+            self._evict()
+
+        logger.info(f"Job {job_id} {job['status']}")
+
+    def get(self, job_id):
+        """
+        Look up a job.
+
+        Args:
+            job_id (str): Job id from submit
+
+        Returns:
+            dict: Copy of the job record, or None if unknown or evicted
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def stats(self):
+        """
+        Return job counts by status.
+
+        Returns:
+            dict: Count per status plus the store limits
+        """
+        with self._lock:
+            counts = {status: 0 for status in JOB_STATUSES}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+        return {**counts, 'max_results': self.max_results, 'queue_limit': self.queue_limit}
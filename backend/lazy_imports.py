@@ -0,0 +1,63 @@
+import importlib
+import time
+
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """
+    Module that is imported on first attribute access.
+
+    Lets the server start without loading pandas, scipy and friends: they
+    load with the first request that needs them, or earlier through
+    warm_up. The import itself goes through importlib, whose per-module
+    locks make concurrent first accesses safe.
+
+    Usage:
+        risk_metrics = LazyModule('risk_metrics')
+        risk_metrics.calculate_all_metrics(...)   # imported here
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        """Import the module (once) and return it."""
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def warm_up(names):
+    """
+    Import modules ahead of the first request that needs them.
+
+    Args:
+        names (list): Module names (or LazyModule instances)
+
+    Returns:
+        dict: Seconds taken per module (near zero when already imported)
+    """
+    timings = {}
+    for name in names:
+        start = time.perf_counter()
+        if isinstance(name, LazyModule):
+            name.load()
+            name = name._name
+        else:
+            importlib.import_module(name)
+        timings[name] = time.perf_counter() - start
+    logger.info(f"Warmed up {len(timings)} modules in {sum(timings.values()):.2f}s")
+    return timings
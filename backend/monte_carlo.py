@@ -0,0 +1,268 @@
+import os
+
+import numpy as np
+import logging
+from concurrency import map_chunks
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DISTRIBUTIONS = ('normal', 't', 'bootstrap')
+
+# Working memory allowed per chunk of scenarios (override with MC_MEMORY_BUDGET_MB)
+DEFAULT_MEMORY_BUDGET_MB = 64
+
+# Below this many scenarios spreading chunks over processes costs more than it saves
+MIN_SCENARIOS_FOR_POOL = 200000
+
+# Large runs are split into at least this many chunks so they can be spread
+# over workers; fixed (not tied to the worker count) to keep seeds reproducible
+MIN_CHUNKS = 16
+
+
+def _draw_asset_returns(rng, size, model):
+    """
+    Draw one day of correlated asset returns for ``size`` scenarios.
+
+    Args:
+        rng (np.random.Generator): Random generator for this chunk
+        size (int): Number of scenarios
+        model (dict): Simulation model (see build_model)
+
+    Returns:
+        np.ndarray: size x K simple returns
+    """
+    if model['distribution'] == 'bootstrap':
+        # Whole historical days keep the cross-asset dependence intact
+        rows = rng.integers(0, len(model['historical_returns']), size)
+        return model['historical_returns'][rows]
+
+    # Correlated normal shocks: z @ L^T has covariance L L^T = Σ
+    shocks = rng.standard_normal((size, model['cholesky'].shape[0])) @ model['cholesky'].T
+
+    if model['distribution'] == 't':
+        # Multivariate Student-t with the same covariance as the sample
+        dof = model['dof']
+        chi2 = rng.chisquare(dof, size)
+        shocks *= np.sqrt((dof - 2) / chi2)[:, None]
+
+    return model['mean'] + shocks
+
+
+def _simulate_chunk(task, model):
+    """
+    Simulate portfolio returns over the horizon for one chunk of scenarios.
+
+    Args:
+        task (tuple): (np.random.SeedSequence, number of scenarios)
+        model (dict): Simulation model (see build_model)
+
+    Returns:
+        np.ndarray: Portfolio horizon returns, one per scenario
+    """
+    seed, size = task
+    rng = np.random.default_rng(seed)
+    weights = model['weights']
+
+    if model['horizon'] == 1:
+        if model['distribution'] == 'bootstrap':
+            # Portfolio returns of historical days are all that is needed
+            rows = rng.integers(0, len(model['historical_portfolio_returns']), size)
+            return model['historical_portfolio_returns'][rows]
+
+        # One day is linear in the shocks: w·(μ + L z) = w·μ + (L^T w)·z, and
+        # (L^T w)·z for iid standard normal z is normal with std ||L^T w||,
+        # so a single draw per scenario is exact and no size x K matrix is built
+        portfolio_std = np.linalg.norm(model['cholesky'].T @ weights)
+        shocks = rng.standard_normal(size) * portfolio_std
+        if model['distribution'] == 't':
+            dof = model['dof']
+            shocks *= np.sqrt((dof - 2) / rng.chisquare(dof, size))
+        return model['mean'] @ weights + shocks
+
+    # Multi-day: compound each asset over the horizon (buy-and-hold), which is
+    # not linear in the shocks, so asset-level paths are needed
+    growth = np.ones((size, len(weights)))
+    for _ in range(model['horizon']):
+        growth *= 1 + _draw_asset_returns(rng, size, model)
+
+    return (growth - 1) @ weights
+
+
+def build_model(prices_df, weights, horizon=1, distribution='normal', dof=5):
+    """
+    Estimate the simulation model from historical prices.
+
+    Args:
+        prices_df (pd.DataFrame): DataFrame with asset prices (columns = tickers)
+        weights (list): Portfolio weights (sum to 100)
+        horizon (int): Holding period in trading days
+        distribution (str): 'normal', 't' (Student-t) or 'bootstrap'
+        dof (float): Degrees of freedom for the Student-t distribution
+
+    Returns:
+        dict: Mean vector, Cholesky factor and inputs for the simulation
+
+    Raises:
+        ValueError: If the parameters are invalid
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Distribution must be one of: {', '.join(DISTRIBUTIONS)}")
+    if distribution == 't' and dof <= 2:
+        raise ValueError("Student-t degrees of freedom must be greater than 2")
+    if int(horizon) < 1:
+        raise ValueError("Horizon must be at least 1 day")
+
+    weights_decimal = np.array(weights, dtype=float) / 100.0
+    returns = prices_df.pct_change().dropna().to_numpy(dtype=float)
+
+    if len(returns) < 2:
+        raise ValueError("Not enough data to estimate the return distribution")
+
+    mean = returns.mean(axis=0)
+    covariance = np.atleast_2d(np.cov(returns, rowvar=False))
+
+    # A tiny ridge keeps the factorization stable for collinear assets
+    try:
+        cholesky = np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        ridge = 1e-10 * np.trace(covariance) / len(covariance)
+        cholesky = np.linalg.cholesky(covariance + ridge * np.eye(len(covariance)))
+
+    return {
+        'weights': weights_decimal,
+        'mean': mean,
+        'cholesky': cholesky,
+        'historical_returns': returns,
+        'historical_portfolio_returns': returns @ weights_decimal,
+        'horizon': int(horizon),
+        'distribution': distribution,
+        'dof': float(dof)
+    }
+
+
+def simulation_draws(n_scenarios, horizon, num_assets):
+    """
+    Random draws a simulation needs, the measure its run time scales with.
+
+    One-day runs draw once per scenario (see _simulate_chunk); multi-day runs
+    draw every asset on every day.
+
+    Args:
+        n_scenarios (int): Number of scenarios
+        horizon (int): Holding period in trading days
+        num_assets (int): Number of assets
+
+    Returns:
+        int: Number of draws
+    """
+    return n_scenarios if horizon == 1 else n_scenarios * horizon * num_assets
+
+
+def _chunk_sizes(n_scenarios, num_assets, horizon, memory_budget_mb):
+    """Split the scenarios into chunks that fit the memory budget."""
+    # Multi-day chunks hold a growth matrix, a shock matrix and a temporary
+    # (3 x K doubles per scenario); one-day chunks only hold a few vectors
+    bytes_per_scenario = 8 * num_assets * 3 + 16 if horizon > 1 else 32
+    chunk_size = max(1, int(memory_budget_mb * 1024 * 1024 // bytes_per_scenario))
+
+    if n_scenarios >= MIN_SCENARIOS_FOR_POOL:
+        chunk_size = min(chunk_size, -(-n_scenarios // MIN_CHUNKS))
+
+    sizes = [chunk_size] * (n_scenarios // chunk_size)
+    if n_scenarios % chunk_size:
+        sizes.append(n_scenarios % chunk_size)
+    return sizes
+
+
+def simulate_portfolio_returns(model, n_scenarios, seed=None, memory_budget_mb=None):
+    """
+    Simulate portfolio horizon returns in fixed-size chunks.
+
+    Every chunk gets its own child seed from one SeedSequence, so results are
+    identical no matter which process runs the chunks (see map_chunks). Only
+    the portfolio return per scenario is kept; asset-level paths never exceed
+    one chunk.
+
+    Args:
+        model (dict): Simulation model from build_model
+        n_scenarios (int): Number of scenarios to simulate
+        seed (int, optional): Seed for reproducible results
+        memory_budget_mb (float, optional): Working memory per chunk
+
+    Returns:
+        np.ndarray: Simulated portfolio returns over the horizon
+    """
+    if memory_budget_mb is None:
+        memory_budget_mb = float(os.environ.get('MC_MEMORY_BUDGET_MB', DEFAULT_MEMORY_BUDGET_MB))
+
+    sizes = _chunk_sizes(n_scenarios, len(model['weights']), model['horizon'], memory_budget_mb)
+
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = list(zip(seeds, sizes))
+
+    results = np.empty(n_scenarios)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+    chunks = map_chunks(_simulate_chunk, tasks, model, parallel=n_scenarios >= MIN_SCENARIOS_FOR_POOL)
+    for i, chunk in enumerate(chunks):
+        results[offsets[i]:offsets[i + 1]] = chunk
+
+    return results
+
+
+def calculate_monte_carlo_var(prices_df, weights, confidence_levels=(0.95, 0.99), horizon=1,
+                              n_scenarios=100000, distribution='normal', dof=5, seed=None,
+                              memory_budget_mb=None):
+    """
+    Calculate Monte Carlo VaR and Expected Shortfall for a portfolio.
+
+    Scenarios are drawn from the historical mean and covariance (via the
+    Cholesky factor), from a Student-t with the same covariance, or by
+    bootstrapping historical days. Multi-day horizons compound each asset.
+
+    Args:
+        prices_df (pd.DataFrame): DataFrame with asset prices (columns = tickers)
+        weights (list): Portfolio weights (sum to 100)
+        confidence_levels (tuple): Confidence levels (e.g. 0.95, 0.99)
+        horizon (int): Holding period in trading days (default: 1)
+        n_scenarios (int): Number of simulated scenarios
+        distribution (str): 'normal', 't' or 'bootstrap'
+        dof (float): Degrees of freedom for the Student-t distribution
+        seed (int, optional): Seed for reproducible results
+        memory_budget_mb (float, optional): Working memory per chunk
+
+    Returns:
+        dict: VaR and ES per confidence level (as positive losses) plus
+            simulation settings and summary statistics
+    """
+    logger.info(f"Running Monte Carlo VaR with {n_scenarios} {distribution} scenarios over {horizon} days")
+
+    model = build_model(prices_df, weights, horizon, distribution, dof)
+    simulated = simulate_portfolio_returns(model, int(n_scenarios), seed, memory_budget_mb)
+
+    # One partial sort gives every lower-tail cut-off we need
+    cutoffs = sorted({max(0, int(np.floor((1 - c) * len(simulated))) - 1) for c in confidence_levels})
+    partitioned = np.partition(simulated, cutoffs)
+
+    var = {}
+    expected_shortfall = {}
+    for confidence_level in confidence_levels:
+        k = max(0, int(np.floor((1 - confidence_level) * len(simulated))) - 1)
+        key = f"{confidence_level * 100:g}"
+        var[key] = float(-partitioned[k])
+        # Expected Shortfall: average loss in the tail beyond VaR
+        expected_shortfall[key] = float(-partitioned[:k + 1].mean())
+
+    logger.info("Monte Carlo VaR calculated successfully")
+
+    return {
+        'var': var,
+        'expected_shortfall': expected_shortfall,
+        'mean_return': float(simulated.mean()),
+        'volatility': float(simulated.std()),
+        'horizon': model['horizon'],
+        'distribution': distribution,
+        'n_scenarios': int(n_scenarios),
+        'seed': seed
+    }
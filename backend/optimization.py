@@ -0,0 +1,370 @@
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Points on the efficient frontier returned by default
+DEFAULT_FRONTIER_POINTS = 100
+
+# Ridge added to the covariance diagonal (relative to its mean variance) so
+# the active-set systems stay positive definite when history is short
+COVARIANCE_RIDGE = 1e-10
+
+# Golden-section steps used to refine the maximum Sharpe portfolio between
+# frontier points
+SHARPE_REFINE_STEPS = 20
+
+
+def portfolio_bounds(num_assets, min_weight=0.0, max_weight=1.0, asset_bounds=None):
+    """
+    Build long-only per-asset weight bounds.
+
+    Args:
+        num_assets (int): Number of assets
+        min_weight (float): Lower bound for every asset (decimal, default: 0)
+        max_weight (float): Upper bound for every asset (decimal, default: 1)
+        asset_bounds (dict, optional): {asset index: (low, high)} overrides
+
+    Returns:
+        tuple: (lower, upper) np.ndarrays of decimal weights
+
+    Raises:
+        ValueError: If a bound is outside [0, 1] or no fully invested
+            portfolio fits the bounds
+    """
+    lower = np.full(num_assets, float(min_weight))
+    upper = np.full(num_assets, float(max_weight))
+    for index, (low, high) in (asset_bounds or {}).items():
+        lower[index] = low
+        upper[index] = high
+
+    if (lower < 0).any() or (upper > 1).any() or (lower > upper).any():
+        raise ValueError('Weight bounds must satisfy 0 <= min <= max <= 100')
+    if lower.sum() > 1 + 1e-12 or upper.sum() < 1 - 1e-12:
+        raise ValueError('No fully invested portfolio fits the weight bounds '
+                         f"(minimums sum to {lower.sum() * 100:.2f}%, maximums to {upper.sum() * 100:.2f}%)")
+    return lower, upper
+
+
+def _feasible_weights(lower, upper):
+    """Fully invested weights inside the bounds: the slack shared pro rata."""
+    room = upper - lower
+    if room.sum() == 0:
+        return lower.copy()
+    return lower + room * (1 - lower.sum()) / room.sum()
+
+
+def max_return_weights(mean, lower, upper):
+    """
+    Highest expected return portfolio within the bounds.
+
+    Starting from the minimum weights, the remaining budget goes to the
+    assets with the highest expected returns, each up to its maximum.
+
+    Args:
+        mean (np.ndarray): Expected asset returns (K,)
+        lower (np.ndarray): Minimum weights (K,)
+        upper (np.ndarray): Maximum weights (K,)
+
+    Returns:
+        np.ndarray: Weights (K,)
+    """
+    weights = lower.copy()
+    remaining = 1 - lower.sum()
+    for i in np.argsort(-mean, kind='stable'):
+        if remaining <= 0:
+            break
+        add = min(upper[i] - lower[i], remaining)
+        weights[i] += add
+        remaining -= add
+    return weights
+
+
+def solve_qp(covariance, linear, constraints, targets, lower, upper, start, max_iter=None, tol=1e-12):
+    """
+    Minimize 1/2 w' C w + c' w subject to A w = b and lower <= w <= upper.
+
+    Primal active-set method: assets sitting at a bound are held there and
+    the equality-constrained problem is solved over the free assets; a step
+    that would cross a bound stops at it and fixes that asset, and at a
+    stationary point the asset whose bound multiplier has the wrong sign is
+    released. Starting from a nearby feasible point (e.g. the previous
+    frontier portfolio) the working set is already almost right, so a solve
+    usually takes only a handful of iterations.
+
+    Args:
+        covariance (np.ndarray): Positive definite matrix C (K x K)
+        linear (np.ndarray): Linear term c (K,)
+        constraints (np.ndarray): Equality constraint rows A (M x K)
+        targets (np.ndarray): Right-hand sides b (M,)
+        lower (np.ndarray): Lower bounds (K,)
+        upper (np.ndarray): Upper bounds (K,)
+        start (np.ndarray): Feasible starting weights (K,)
+        max_iter (int, optional): Iteration limit (default: 4 K + 50)
+        tol (float): Step and multiplier tolerance
+
+    Returns:
+        tuple: (weights, iterations)
+    """
+    # Imported on first use to keep scipy out of server start-up
+    from scipy.linalg import cho_factor, cho_solve
+
+    num_assets = len(start)
+    max_iter = max_iter or 4 * num_assets + 50
+    weights = np.clip(start, lower, upper)
+
+    # Working set: -1 held at the lower bound, +1 at the upper bound, 0 free
+    state = np.zeros(num_assets, dtype=np.int8)
+    state[weights <= lower + 1e-12] = -1
+    state[(weights >= upper - 1e-12) & (state == 0)] = 1
+
+    for iteration in range(1, max_iter + 1):
+        free = state == 0
+        weights[state == -1] = lower[state == -1]
+        weights[state == 1] = upper[state == 1]
+        gradient = covariance @ weights + linear
+
+        # Equality-constrained step over the free assets via the Schur
+        # complement: p = C_f^-1 (A_f' nu - g_f) with A_f p = b - A w (zero
+        # once the constraints hold, so feasibility is kept from then on)
+        residual = targets - constraints @ weights
+        step = np.zeros(num_assets)
+        if free.any():
+            free_constraints = constraints[:, free]
+            factor = cho_factor(covariance[np.ix_(free, free)])
+            inverse_gradient = cho_solve(factor, gradient[free])
+            inverse_constraints = cho_solve(factor, free_constraints.T)
+            schur = free_constraints @ inverse_constraints
+            multipliers = np.linalg.lstsq(schur, residual + free_constraints @ inverse_gradient, rcond=None)[0]
+            step[free] = inverse_constraints @ multipliers - inverse_gradient
+        else:
+            multipliers = np.linalg.lstsq(constraints.T, gradient, rcond=None)[0]
+
+        if np.abs(step).max() <= tol * max(1.0, np.abs(weights).max()):
+            # Stationary on the working set: check the bound multipliers
+            reduced = gradient - constraints.T @ multipliers
+            violation = np.where(state == -1, -reduced, np.where(state == 1, reduced, 0.0))
+            worst = int(np.argmax(violation))
+            if violation[worst] <= tol * max(1.0, np.abs(gradient).max()):
+                return weights, iteration
+            state[worst] = 0
+            continue
+
+        # Longest step up to 1 that keeps every free asset within its bounds
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(step < 0, (lower - weights) / step,
+                              np.where(step > 0, (upper - weights) / step, np.inf))
+        ratios[~free] = np.inf
+        blocking = int(np.argmin(ratios))
+        alpha = min(1.0, max(ratios[blocking], 0.0))
+        weights += alpha * step
+        if alpha < 1.0:
+            state[blocking] = -1 if step[blocking] < 0 else 1
+
+    logger.warning(f"Active-set solve stopped after {max_iter} iterations")
+    return weights, max_iter
+
+
+def portfolio_stats(weights, mean, covariance, risk_free_rate):
+    """Annualized expected return, volatility and Sharpe Ratio of weights."""
+    expected_return = float(mean @ weights)
+    volatility = float(np.sqrt(max(weights @ covariance @ weights, 0.0)))
+    sharpe = (expected_return - risk_free_rate) / volatility if volatility > 0 else None
+    return {'expected_return': expected_return, 'volatility': volatility, 'sharpe': sharpe}
+
+
+class FrontierSolver:
+    """
+    Minimum-variance portfolios for target returns over one covariance matrix.
+
+    The annualized mean and covariance are computed once; every solve reuses
+    them and warm-starts from a nearby solved portfolio, slid just far
+    enough towards the minimum-variance or maximum-return portfolio to hit
+    the new target (box constraints are convex, so the start is feasible).
+    """
+
+    def __init__(self, returns, lower, upper, risk_free_rate=0.04):
+        """
+        Args:
+            returns (np.ndarray): Daily asset returns (T x K)
+            lower (np.ndarray): Minimum weights (K,)
+            upper (np.ndarray): Maximum weights (K,)
+            risk_free_rate (float): Annual risk-free rate (default: 4% = 0.04)
+        """
+        returns = np.asarray(returns, dtype=float)
+        if len(returns) < 2:
+            raise ValueError("Not enough data to estimate expected returns and covariance")
+
+        # Annualized statistics, computed once for every solve
+        self.mean = returns.mean(axis=0) * 252
+        self.covariance = np.atleast_2d(np.cov(returns, rowvar=False)) * 252
+        ridge = COVARIANCE_RIDGE * max(np.trace(self.covariance) / len(self.mean), 1e-12)
+        self._system = self.covariance + ridge * np.eye(len(self.mean))
+
+        self.lower = lower
+        self.upper = upper
+        self.risk_free_rate = risk_free_rate
+        self.iterations = 0
+
+        # Ends of the frontier
+        self.min_variance, _ = self._solve(np.ones((1, len(self.mean))), np.ones(1),
+                                           _feasible_weights(lower, upper))
+        self.max_return = max_return_weights(self.mean, lower, upper)
+
+    def _solve(self, constraints, targets, start):
+        weights, iterations = solve_qp(self._system, np.zeros(len(self.mean)), constraints, targets,
+                                       self.lower, self.upper, start)
+        self.iterations += iterations
+        return weights, iterations
+
+    def solve(self, target, start, below=None, above=None):
+        """
+        Minimum-variance portfolio with expected return target.
+
+        Args:
+            target (float): Annualized expected return, between the
+                minimum-variance and maximum returns
+            start (np.ndarray): Feasible weights to warm-start from
+            below (np.ndarray, optional): Feasible weights with a return at
+                or below target (default: the minimum-variance portfolio)
+            above (np.ndarray, optional): Feasible weights with a return at
+                or above target (default: the maximum-return portfolio)
+
+        Returns:
+            np.ndarray: Weights (K,)
+        """
+        # Slide the start towards the portfolio on the target's side; the
+        # closer that portfolio, the fewer assets change bound
+        current = self.mean @ start
+        if target >= current:
+            anchor = self.max_return if above is None else above
+        else:
+            anchor = self.min_variance if below is None else below
+        gap = self.mean @ anchor - current
+        fraction = (target - current) / gap if gap != 0 else 0.0
+        start = start + min(max(fraction, 0.0), 1.0) * (anchor - start)
+
+        constraints = np.vstack([np.ones(len(self.mean)), self.mean])
+        weights, _ = self._solve(constraints, np.array([1.0, target]), start)
+        return weights
+
+    def stats(self, weights):
+        return portfolio_stats(weights, self.mean, self.covariance, self.risk_free_rate)
+
+    def sharpe(self, weights):
+        sharpe = self.stats(weights)['sharpe']
+        return -np.inf if sharpe is None else sharpe
+
+    def frontier(self, points=DEFAULT_FRONTIER_POINTS):
+        """
+        Efficient frontier at evenly spaced target returns.
+
+        Each point warm-starts from the previous one.
+
+        Args:
+            points (int): Number of frontier points
+
+        Returns:
+            tuple: (targets (N,), weights (N x K)) as np.ndarrays
+        """
+        low = self.mean @ self.min_variance
+        high = self.mean @ self.max_return
+        if high - low <= 1e-12 * max(1.0, abs(high)):
+            return np.array([low]), self.min_variance[None, :]
+
+        targets = np.linspace(low, high, points)
+        weights = np.empty((points, len(self.mean)))
+        weights[0] = self.min_variance
+        for i in range(1, points):
+            weights[i] = self.solve(targets[i], weights[i - 1])
+        return targets, weights
+
+    def max_sharpe(self, targets, weights):
+        """
+        Maximum Sharpe portfolio, refined between frontier points.
+
+        The Sharpe Ratio is unimodal along the frontier, so the best frontier
+        point brackets the optimum; a golden-section search over the target
+        return between its neighbours then refines it, warm-starting every
+        solve from the best point.
+
+        Args:
+            targets (np.ndarray): Frontier target returns (N,)
+            weights (np.ndarray): Frontier weights (N x K)
+
+        Returns:
+            np.ndarray: Weights (K,)
+        """
+        sharpes = np.array([self.sharpe(w) for w in weights])
+        best = int(np.argmax(sharpes))
+        if len(targets) < 3:
+            return weights[best]
+
+        # Bracket between the neighbouring frontier points, which also serve
+        # as the warm-start anchors
+        below = weights[max(best - 1, 0)]
+        above = weights[min(best + 1, len(targets) - 1)]
+        low, high = self.mean @ below, self.mean @ above
+        best_weights, best_sharpe = weights[best], sharpes[best]
+        ratio = (np.sqrt(5) - 1) / 2
+        a, b = high - ratio * (high - low), low + ratio * (high - low)
+        wa = self.solve(a, best_weights, below, above)
+        wb = self.solve(b, best_weights, below, above)
+        sa, sb = self.sharpe(wa), self.sharpe(wb)
+        for _ in range(SHARPE_REFINE_STEPS):
+            if sa >= sb:
+                high, b, wb, sb = b, a, wa, sa
+                a = high - ratio * (high - low)
+                wa = self.solve(a, wb, below, above)
+                sa = self.sharpe(wa)
+            else:
+                low, a, wa, sa = a, b, wb, sb
+                b = low + ratio * (high - low)
+                wb = self.solve(b, wa, below, above)
+                sb = self.sharpe(wb)
+
+        for candidate, sharpe in ((wa, sa), (wb, sb)):
+            if sharpe > best_sharpe:
+                best_weights, best_sharpe = candidate, sharpe
+        return best_weights
+
+
+def optimize_portfolio(returns, lower, upper, points=DEFAULT_FRONTIER_POINTS, risk_free_rate=0.04,
+                       current_weights=None):
+    """
+    Minimum-variance, maximum Sharpe and efficient frontier portfolios.
+
+    Args:
+        returns (np.ndarray): Daily asset returns (T x K)
+        lower (np.ndarray): Minimum weights as decimals (K,)
+        upper (np.ndarray): Maximum weights as decimals (K,)
+        points (int): Number of frontier points (default: 100)
+        risk_free_rate (float): Annual risk-free rate (default: 4% = 0.04)
+        current_weights (np.ndarray, optional): Weights (decimals) to place
+            against the frontier
+
+    Returns:
+        dict: {
+            'min_variance', 'max_sharpe': {'weights' (percent), 'expected_return',
+                'volatility', 'sharpe'},
+            'frontier': [{'expected_return', 'volatility', 'sharpe', 'weights'}],
+            'current': stats of current_weights or None,
+            'iterations': total active-set iterations
+        }
+    """
+    logger.info(f"Optimizing {np.shape(returns)[1]} assets ({points} frontier points)")
+    solver = FrontierSolver(returns, lower, upper, risk_free_rate)
+    targets, frontier_weights = solver.frontier(points)
+    max_sharpe = solver.max_sharpe(targets, frontier_weights)
+
+    def describe(weights):
+        return {**solver.stats(weights), 'weights': (weights * 100).tolist()}
+
+    return {
+        'min_variance': describe(solver.min_variance),
+        'max_sharpe': describe(max_sharpe),
+        'frontier': [describe(weights) for weights in frontier_weights],
+        'current': solver.stats(current_weights) if current_weights is not None else None,
+        'iterations': solver.iterations
+    }
@@ -0,0 +1,161 @@
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PortfolioContext:
+    """
+    Prepared per-request view of a portfolio's prices and derived series.
+
+    The returns panel, portfolio returns and cumulative value are computed once
+    as contiguous NumPy arrays and shared by every metric and stress-test
+    function, instead of each one calling ``pct_change`` or renormalizing
+    prices on its own. Derived series are computed lazily on first access, so
+    callers that only need prices (e.g. stress tests alone) never pay for
+    returns, and nothing is computed more than once.
+
+    Attributes:
+        tickers (list): Asset tickers (column order of the arrays)
+        weights (np.ndarray): Portfolio weights as decimals (K,)
+        dates (pd.DatetimeIndex): Price dates (T,)
+        day_numbers (np.ndarray): Price dates as days since 1970-01-01 (T,)
+        prices (np.ndarray): Aligned asset prices (T x K)
+        returns_index (pd.DatetimeIndex): Dates of the returns rows (R,)
+        returns (np.ndarray): Daily asset returns, rows with gaps dropped (R x K)
+        portfolio_returns (np.ndarray): Daily portfolio returns (R,)
+        cumulative_returns (np.ndarray): Growth of 1 invested at the start (R,)
+        benchmark_returns (np.ndarray): Benchmark returns aligned to
+            returns_index, NaN where missing (R,), or None
+    """
+
+    def __init__(self, prices_df, weights, benchmark_prices=None):
+        """
+        Build the context from prices and weights.
+
+        Args:
+            prices_df (pd.DataFrame): DataFrame with asset prices (columns = tickers)
+            weights (list): Portfolio weights (sum to 100)
+            benchmark_prices (pd.Series, optional): Benchmark prices for beta calculation
+        """
+        self.tickers = list(prices_df.columns)
+        self.weights = np.asarray(weights, dtype=float) / 100.0
+
+        self.dates = prices_df.index
+        self.day_numbers = self.dates.values.astype('datetime64[D]').astype(np.int64)
+        self.prices = np.ascontiguousarray(prices_df.to_numpy(dtype=float))
+
+        self._prices_df = prices_df
+        self._benchmark_prices = benchmark_prices
+
+    @cached_property
+    def _asset_returns(self):
+        # Calculate daily returns for each asset once: (P_t - P_t-1) / P_t-1
+        return self._prices_df.pct_change().dropna()
+
+    @cached_property
+    def returns_index(self):
+        return self._asset_returns.index
+
+    @cached_property
+    def returns(self):
+        return np.ascontiguousarray(self._asset_returns.to_numpy(dtype=float))
+
+    @cached_property
+    def portfolio_returns(self):
+        return self.returns @ self.weights
+
+    @cached_property
+    def cumulative_returns(self):
+        return np.cumprod(1 + self.portfolio_returns)
+
+    @cached_property
+    def benchmark_returns(self):
+        if self._benchmark_prices is None:
+            return None
+        benchmark_returns = self._benchmark_prices.pct_change().reindex(self.returns_index)
+        return benchmark_returns.to_numpy(dtype=float)
+
+    @cached_property
+    def returns_day_numbers(self):
+        """np.ndarray: returns_index as days since 1970-01-01 (R,)."""
+        return self.returns_index.values.astype('datetime64[D]').astype(np.int64)
+
+    @cached_property
+    def returns_dates(self):
+        """list: returns_index formatted as YYYY-MM-DD strings."""
+        return self.returns_index.strftime('%Y-%m-%d').tolist()
+
+    @cached_property
+    def portfolio_returns_series(self):
+        """pd.Series: Portfolio returns indexed by date."""
+        return pd.Series(self.portfolio_returns, index=self.returns_index)
+
+    @cached_property
+    def drawdown(self):
+        """np.ndarray: Drawdown of the cumulative value from its running peak (R,)."""
+        running_max = np.maximum.accumulate(self.cumulative_returns)
+        return (self.cumulative_returns - running_max) / running_max
+
+    @cached_property
+    def filled_prices(self):
+        """np.ndarray: Prices with missing values as 0, for weighted sums (T x K)."""
+        return np.nan_to_num(self.prices, nan=0.0)
+
+    @cached_property
+    def normalized_value(self):
+        """np.ndarray: Buy-and-hold portfolio value starting at 100 (T,)."""
+        return self.window_value(0, len(self.prices))
+
+    def window_value(self, lo, hi):
+        """
+        Buy-and-hold portfolio value over rows [lo, hi), starting at 100.
+
+        Each asset is normalized to 100 at row ``lo``; assets without a price
+        there contribute nothing, as in stress_tests.calculate_portfolio_value.
+
+        Args:
+            lo (int): First price row (inclusive)
+            hi (int): Last price row (exclusive)
+
+        Returns:
+            np.ndarray: Portfolio value for each row in the window
+        """
+        window = self.prices[lo:hi]
+        normalized = window / window[0] * 100
+        return np.nan_to_num(normalized, nan=0.0) @ self.weights
+
+    def date_range_rows(self, start_date, end_date):
+        """
+        Find the price rows that fall within [start_date, end_date].
+
+        Args:
+            start_date (str): First date in YYYY-MM-DD format (inclusive)
+            end_date (str): Last date in YYYY-MM-DD format (inclusive)
+
+        Returns:
+            tuple: (lo, hi) row bounds, hi exclusive
+        """
+        lo, hi = self.date_ranges_rows([start_date], [end_date])
+        return int(lo[0]), int(hi[0])
+
+    def date_ranges_rows(self, start_dates, end_dates):
+        """
+        Find the price rows of many date ranges with one searchsorted each side.
+
+        Args:
+            start_dates (list): First dates in YYYY-MM-DD format (inclusive)
+            end_dates (list): Last dates in YYYY-MM-DD format (inclusive)
+
+        Returns:
+            tuple: (lo, hi) integer arrays of row bounds, hi exclusive
+        """
+        start_days = np.array(start_dates, dtype='datetime64[D]').astype(np.int64)
+        end_days = np.array(end_dates, dtype='datetime64[D]').astype(np.int64)
+        lo = np.searchsorted(self.day_numbers, start_days, side='left')
+        hi = np.searchsorted(self.day_numbers, end_days, side='right')
+        return lo, hi
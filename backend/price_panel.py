@@ -0,0 +1,229 @@
+"""
+Shared read-only price panel.
+
+A panel is a snapshot of a ticker universe that every server process maps
+from the same files, so the universe is held in memory once per host rather
+than once per worker. Build or refresh it from the backend directory with:
+
+    python price_panel.py AAPL MSFT GOOGL --start 2015-01-01 --end 2026-01-01
+    python price_panel.py --tickers-file universe.txt --start 2015-01-01 --end 2026-01-01
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default location of the panel (override with PRICE_PANEL_DIR)
+DEFAULT_PANEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.price_panel')
+
+INDEX_FILE = 'panel.json'
+
+
+def _day_number(date_str):
+    return int(np.datetime64(date_str, 'D').astype(np.int64))
+
+
+class PricePanel:
+    """
+    Memory-mapped panel of daily close prices.
+
+    The panel is stored as two ``.npy`` files opened with ``mmap_mode='r'``:
+    a tickers x days float64 matrix (NaN where a ticker did not trade) and
+    the trading-day numbers since 1970-01-01. A small JSON index maps tickers
+    to rows and records the calendar range covered (start inclusive, end
+    exclusive) and the provider the prices came from. Opening a panel only
+    reads the index and the array headers; pages are shared through the OS
+    page cache by every process that maps the same files.
+
+    Each ticker's prices are contiguous, so a date range of consecutive
+    tickers is a plain view of the map.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Directory holding panel.json and the arrays
+
+        Raises:
+            OSError, ValueError: If the panel is missing or unreadable
+        """
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.mtime = os.stat(self.index_path).st_mtime_ns
+        with open(self.index_path) as f:
+            index = json.load(f)
+
+        self.version = index['version']
+        self.provider = index['provider']
+        self.start_day = index['start_day']
+        self.end_day = index['end_day']
+        self.tickers = index['tickers']
+        self.rows = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.days = np.load(os.path.join(directory, f"days-{self.version}.npy"), mmap_mode='r')
+        self.prices = np.load(os.path.join(directory, f"prices-{self.version}.npy"), mmap_mode='r')
+
+    def is_stale(self):
+        """Whether a newer panel has been published since this one was opened."""
+        try:
+            return os.stat(self.index_path).st_mtime_ns != self.mtime
+        except OSError:
+            return True
+
+    def covers(self, provider_name, tickers, start_date, end_date):
+        """
+        Whether the panel can serve this request on its own.
+
+        Args:
+            provider_name (str): Name of the configured price provider
+            tickers (list): Requested tickers
+            start_date (str): Start date in YYYY-MM-DD format
+            end_date (str): End date in YYYY-MM-DD format (exclusive)
+
+        Returns:
+            bool: True if every ticker and the whole range are in the panel
+        """
+        return (
+            provider_name == self.provider
+            and _day_number(start_date) >= self.start_day
+            and _day_number(end_date) <= self.end_day
+            and all(ticker in self.rows for ticker in tickers)
+        )
+
+    def read(self, tickers, start_date, end_date):
+        """
+        Close prices for [start_date, end_date) as a DataFrame over the map.
+
+        When the tickers are consecutive rows of the panel (e.g. the whole
+        universe in panel order) the frame wraps a read-only view without
+        copying; otherwise only the requested tickers are gathered. Days on
+        which none of the tickers traded are left out, as in the price store.
+
+        Args:
+            tickers (list): Tickers in the panel (see covers)
+            start_date (str): Start date in YYYY-MM-DD format
+            end_date (str): End date in YYYY-MM-DD format (exclusive)
+
+        Returns:
+            pd.DataFrame: Close prices, one column per ticker in request order
+        """
+        lo = int(np.searchsorted(self.days, _day_number(start_date), side='left'))
+        hi = int(np.searchsorted(self.days, _day_number(end_date), side='left'))
+
+        rows = [self.rows[ticker] for ticker in tickers]
+        if rows == list(range(rows[0], rows[0] + len(rows))):
+            block = self.prices[rows[0]:rows[0] + len(rows), lo:hi]
+        else:
+            block = self.prices[rows, lo:hi]
+
+        index = pd.DatetimeIndex(self.days[lo:hi].astype('datetime64[D]'), name='Date')
+        # The transpose of a C-ordered tickers x days block is the layout
+        # pandas keeps internally, so the frame does not copy it
+        prices = pd.DataFrame(block.T, index=index, columns=list(tickers), copy=False)
+
+        traded = ~np.isnan(block).all(axis=0)
+        if not traded.all():
+            prices = prices[traded]
+        return prices
+
+
+def write_panel(directory, prices, start_date, end_date, provider_name):
+    """
+    Publish a new panel, replacing the current one.
+
+    The arrays are written under a fresh version and the index is swapped
+    in atomically, so readers never see a torn panel. Processes that still
+    map an older version keep their pages until they reopen; the old files
+    are unlinked straight away.
+
+    Args:
+        directory (str): Panel directory
+        prices (pd.DataFrame): Close prices, one column per ticker
+        start_date (str): First covered date (inclusive)
+        end_date (str): Last covered date (exclusive)
+        provider_name (str): Provider the prices came from
+
+    Returns:
+        str: Version of the published panel
+    """
+    os.makedirs(directory, exist_ok=True)
+    prices = prices.sort_index().dropna(how='all')
+    version = uuid.uuid4().hex[:12]
+
+    days = prices.index.values.astype('datetime64[D]').astype(np.int64)
+    matrix = np.ascontiguousarray(prices.to_numpy(dtype=np.float64).T)
+    np.save(os.path.join(directory, f"days-{version}.npy"), days)
+    np.save(os.path.join(directory, f"prices-{version}.npy"), matrix)
+
+    index_path = os.path.join(directory, INDEX_FILE)
+    tmp_index_path = index_path + '.tmp'
+    with open(tmp_index_path, 'w') as f:
+        json.dump({
+            'version': version,
+            'provider': provider_name,
+            'start_day': _day_number(start_date),
+            'end_day': _day_number(end_date),
+            'tickers': [str(ticker) for ticker in prices.columns],
+            'built_at': time.time()
+        }, f)
+    os.replace(tmp_index_path, index_path)
+
+    for path in glob.glob(os.path.join(directory, '*-*.npy')):
+        if not path.endswith(f"-{version}.npy"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    logger.info(
+        f"Published price panel {version}: {matrix.shape[0]} tickers x {matrix.shape[1]} days "
+        f"({matrix.nbytes / 1e6:.1f} MB)"
+    )
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the shared price panel')
+    parser.add_argument('tickers', nargs='*', help='Tickers in the universe')
+    parser.add_argument('--tickers-file', help='File with one ticker per line')
+    parser.add_argument('--start', required=True, help='First date (YYYY-MM-DD, inclusive)')
+    parser.add_argument('--end', required=True, help='Last date (YYYY-MM-DD, exclusive)')
+    parser.add_argument('--dir', help='Panel directory (default: PRICE_PANEL_DIR)')
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers.extend(line.strip().upper() for line in f if line.strip())
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        parser.error('No tickers given')
+
+    # Imported here: data_fetcher reads panels through this module
+    from data_fetcher import load_close_prices
+    from providers import get_provider
+
+    provider = get_provider()
+    prices = load_close_prices(tickers, args.start, args.end, provider, use_panel=False)
+    missing = [ticker for ticker in tickers if ticker not in prices.columns or prices[ticker].isna().all()]
+    if missing:
+        logger.warning(f"Leaving out tickers without data: {', '.join(missing)}")
+    prices = prices[[ticker for ticker in tickers if ticker not in missing]]
+    if prices.empty:
+        sys.exit('No price data to publish')
+
+    directory = args.dir or os.environ.get('PRICE_PANEL_DIR', DEFAULT_PANEL_DIR)
+    write_panel(directory, prices, args.start, args.end, provider.name)
+
+
+if __name__ == '__main__':
+    main()
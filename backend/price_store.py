@@ -0,0 +1,311 @@
+import contextlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import logging
+from single_flight import SingleFlight
+from instrumentation import PRICE_STORE_LOOKUPS
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within the process
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default location of the on-disk price store (override with PRICE_STORE_DIR)
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.price_store')
+
+# How long a cached range that reaches into the future (i.e. past today) is
+# trusted before its tail is downloaded again, in seconds
+DEFAULT_TAIL_TTL = 3600
+
+# One record per trading day: day number since 1970-01-01 and close price
+RECORD_DTYPE = np.dtype([('day', '<i8'), ('close', '<f8')])
+
+EPOCH = date(1970, 1, 1)
+
+
+def to_day_number(date_str):
+    """
+    Convert a YYYY-MM-DD string to a day number since 1970-01-01.
+
+    Args:
+        date_str (str): Date in YYYY-MM-DD format
+
+    Returns:
+        int: Days since the epoch
+    """
+    return (datetime.strptime(date_str, '%Y-%m-%d').date() - EPOCH).days
+
+
+def from_day_number(day):
+    """
+    Convert a day number since 1970-01-01 back to a YYYY-MM-DD string.
+
+    Args:
+        day (int): Days since the epoch
+
+    Returns:
+        str: Date in YYYY-MM-DD format
+    """
+    return str(np.datetime64(int(day), 'D'))
+
+
+class PriceStore:
+    """
+    Persistent on-disk store of daily close prices, partitioned by ticker.
+
+    Each ticker is kept in its own memory-mappable ``.npy`` file of
+    ``(day, close)`` records sorted by day, next to a small JSON sidecar that
+    records which calendar range has already been downloaded. Keeping the
+    covered range separately from the records means weekends and holidays at
+    the edges of a request never look like missing data.
+
+    Date ranges follow yfinance semantics: start is inclusive, end exclusive.
+    """
+
+    def __init__(self, directory=None, tail_ttl=None):
+        self.directory = directory or os.environ.get('PRICE_STORE_DIR', DEFAULT_STORE_DIR)
+        if tail_ttl is None:
+            tail_ttl = float(os.environ.get('PRICE_STORE_TAIL_TTL', DEFAULT_TAIL_TTL))
+        self.tail_ttl = tail_ttl
+        self._lock = threading.Lock()
+        self.flight = SingleFlight()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _base_path(self, ticker):
+        # Tickers like BRK-B or ^GSPC are fine, but keep path separators out
+        safe_name = re.sub(r'[^A-Za-z0-9._^=-]', '_', ticker)
+        return os.path.join(self.directory, safe_name)
+
+    def _paths(self, ticker):
+        base = self._base_path(ticker)
+        return base + '.npy', base + '.json'
+
+    @contextlib.contextmanager
+    def _ticker_lock(self, ticker):
+        """Hold the ticker's lock file, so other processes sharing the store wait."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._base_path(ticker) + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _replace(self, path, mode, dump):
+        """
+        Atomically replace path with what dump writes to a new file.
+
+        The temporary file has a unique name, so concurrent writers never
+        share it and readers never see a torn file.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(path) + '.',
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, mode) as f:
+                dump(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _read_meta(self, ticker):
+        _, meta_path = self._paths(ticker)
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_records(self, ticker):
+        data_path, _ = self._paths(ticker)
+        try:
+            return np.load(data_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return np.empty(0, dtype=RECORD_DTYPE)
+
+    def missing_ranges(self, ticker, start_day, end_day):
+        """
+        Work out which part of [start_day, end_day) still has to be downloaded.
+
+        The covered range is always kept contiguous, so at most a head and a
+        tail range are returned. Days from the one the tail was downloaded on
+        may hold provisional (intraday) prices, so once the cached copy is
+        older than ``tail_ttl`` they are downloaded again.
+
+        Args:
+            ticker (str): Stock ticker symbol
+            start_day (int): First requested day number (inclusive)
+            end_day (int): Last requested day number (exclusive)
+
+        Returns:
+            list: List of (start_day, end_day) tuples to download
+        """
+        meta = self._read_meta(ticker)
+        if meta is None:
+            return [(start_day, end_day)]
+
+        covered_start = meta['start_day']
+        covered_end = meta['end_day']
+        today = (date.today() - EPOCH).days
+
+        # Coverage from the download day on was provisional; trust it only
+        # while fresh, then fetch that day again once it has settled
+        updated_at = meta.get('updated_at', 0)
+        updated_day = (date.fromtimestamp(updated_at) - EPOCH).days if updated_at else today
+        if covered_end > updated_day and time.time() - updated_at > self.tail_ttl:
+            covered_end = max(updated_day, covered_start)
+
+        ranges = []
+        if start_day < covered_start:
+            ranges.append((start_day, covered_start))
+        if end_day > covered_end:
+            # Start from the covered end (not the request start) so the
+            # covered range stays contiguous after the merge
+            ranges.append((covered_end, end_day))
+        return ranges
+
+    def read(self, ticker, start_day, end_day):
+        """
+        Read cached close prices for [start_day, end_day).
+
+        Args:
+            ticker (str): Stock ticker symbol
+            start_day (int): First day number (inclusive)
+            end_day (int): Last day number (exclusive)
+
+        Returns:
+            pd.Series: Close prices indexed by date (may be empty)
+        """
+        records = self._read_records(ticker)
+        days = records['day']
+        lo = np.searchsorted(days, start_day, side='left')
+        hi = np.searchsorted(days, end_day, side='left')
+        window = records[lo:hi]
+
+        index = pd.DatetimeIndex(window['day'].astype('datetime64[D]'), name='Date')
+        return pd.Series(np.array(window['close']), index=index, name=ticker)
+
+    def write(self, ticker, prices, start_day, end_day):
+        """
+        Merge freshly downloaded prices into the store and extend its coverage.
+
+        Args:
+            ticker (str): Stock ticker symbol
+            prices (pd.Series): Downloaded close prices indexed by date
+            start_day (int): First downloaded day number (inclusive)
+            end_day (int): Last downloaded day number (exclusive)
+        """
+        prices = prices.dropna()
+        new_records = np.empty(len(prices), dtype=RECORD_DTYPE)
+        new_records['day'] = prices.index.values.astype('datetime64[D]').astype(np.int64)
+        new_records['close'] = prices.values
+
+        data_path, meta_path = self._paths(ticker)
+
+        # Threads of this process, then other processes sharing the store,
+        # so no read-merge-write loses another one's rows
+        with self._lock, self._ticker_lock(ticker):
+            existing = np.array(self._read_records(ticker))
+            meta = self._read_meta(ticker)
+
+            # New rows win over cached ones for the same day (e.g. a refreshed tail)
+            merged = np.concatenate([new_records, existing])
+            _, unique_idx = np.unique(merged['day'], return_index=True)
+            merged = merged[unique_idx]
+
+            # Never persist tickers without any data (typically invalid symbols)
+            if len(merged) == 0:
+                return
+
+            # updated_at dates the tail, so a head-only download keeps it
+            updated_at = time.time()
+            if meta is not None:
+                if end_day < meta['end_day']:
+                    updated_at = meta.get('updated_at', updated_at)
+                start_day = min(start_day, meta['start_day'])
+                end_day = max(end_day, meta['end_day'])
+
+            # Data before the sidecar: coverage never claims rows not yet on disk
+            self._replace(data_path, 'wb', lambda f: np.save(f, merged))
+            self._replace(meta_path, 'w', lambda f: json.dump({
+                'start_day': int(start_day),
+                'end_day': int(end_day),
+                'updated_at': updated_at
+            }, f))
+
+    def get(self, tickers, start_date, end_date, download):
+        """
+        Return close prices for the tickers, downloading only what is missing.
+
+        Tickers that are missing the same range are downloaded together in a
+        single batched call, so a cold request costs one download and a warm
+        one costs none. Ranges already being downloaded by another thread are
+        waited on rather than downloaded again.
+
+        Args:
+            tickers (list): List of stock ticker symbols
+            start_date (str): Start date in YYYY-MM-DD format
+            end_date (str): End date in YYYY-MM-DD format (exclusive)
+            download (callable): ``download(tickers, start_date, end_date)``
+                returning a DataFrame of close prices with one column per ticker
+
+        Returns:
+            pd.DataFrame: Close prices for all tickers, columns in request order
+        """
+        start_day = to_day_number(start_date)
+        end_day = to_day_number(end_date)
+
+        # Group tickers by the range they are missing
+        pending = {}
+        for ticker in tickers:
+            missing_ranges = self.missing_ranges(ticker, start_day, end_day)
+            PRICE_STORE_LOOKUPS.inc('miss' if missing_ranges else 'hit')
+            for missing in missing_ranges:
+                pending.setdefault(missing, []).append(ticker)
+
+        for (range_start, range_end), range_tickers in pending.items():
+            def download_range(owned_keys, range_start=range_start, range_end=range_end):
+                owned_tickers = [key[0] for key in owned_keys]
+                logger.info(
+                    f"Downloading {len(owned_tickers)} tickers for "
+                    f"{from_day_number(range_start)} to {from_day_number(range_end)}"
+                )
+                downloaded = download(owned_tickers, from_day_number(range_start), from_day_number(range_end))
+                for ticker in owned_tickers:
+                    if downloaded is not None and ticker in downloaded.columns:
+                        series = downloaded[ticker]
+                    else:
+                        series = pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+                    self.write(ticker, series, range_start, range_end)
+                return {key: True for key in owned_keys}
+
+            # Concurrent requests missing the same (ticker, range) share one download
+            self.flight.do_many(
+                [(ticker, range_start, range_end) for ticker in range_tickers],
+                download_range
+            )
+
+        if not pending:
+            logger.info(f"Served {len(tickers)} tickers entirely from the price store")
+
+        prices = pd.concat(
+            [self.read(ticker, start_day, end_day) for ticker in tickers],
+            axis=1
+        )
+        return prices.sort_index()
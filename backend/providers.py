@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Available providers, selected with the PRICE_PROVIDER environment variable
+PROVIDER_NAMES = ('yfinance', 'file', 'synthetic')
+
+
+class PriceProvider:
+    """
+    Source of daily close prices.
+
+    Subclasses implement ``fetch``. Providers whose data is expensive to get
+    (network downloads) set ``cacheable`` so results go through the on-disk
+    price store; local providers are read directly.
+    """
+
+    name = 'base'
+    cacheable = False
+
+    def fetch(self, tickers, start_date, end_date):
+        """
+        Fetch close prices for several tickers.
+
+        Args:
+            tickers (list): List of stock ticker symbols
+            start_date (str): Start date in YYYY-MM-DD format
+            end_date (str): End date in YYYY-MM-DD format (exclusive)
+
+        Returns:
+            pd.DataFrame: Close prices with one column per ticker found (may be empty)
+        """
+        raise NotImplementedError
+
+
+class YFinanceProvider(PriceProvider):
+    """Close prices downloaded from Yahoo Finance."""
+
+    name = 'yfinance'
+    cacheable = True
+
+    def fetch(self, tickers, start_date, end_date):
+        # Imported on first use: yfinance and its dependencies are slow to load
+        import yfinance as yf
+
+        data = yf.download(tickers, start=start_date, end=end_date, progress=False)
+
+        if data.empty:
+            return pd.DataFrame()
+
+        # Extract adjusted close prices
+        if len(tickers) == 1:
+            # For single ticker, yfinance returns a different structure
+            # Create a DataFrame with the single ticker column
+            prices = pd.DataFrame(data['Close'])
+            prices.columns = [tickers[0]]
+        else:
+            prices = data['Close']
+
+        return prices
+
+
+class FileProvider(PriceProvider):
+    """
+    Close prices read from a local directory with one file per ticker.
+
+    Files are named ``<TICKER>.parquet`` or ``<TICKER>.csv`` and hold a date
+    column (``Date`` or the first column) and a ``Close`` column (falling back
+    to ``Adj Close`` or the first value column). Parsed files are kept in
+    memory until their modification time changes, so new or updated files
+    are picked up without a restart.
+    """
+
+    name = 'file'
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.environ.get('PRICE_DATA_DIR', 'data')
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _load(self, ticker):
+        base = os.path.join(self.directory, ticker)
+        for path, reader in ((base + '.parquet', pd.read_parquet), (base + '.csv', pd.read_csv)):
+            try:
+                modified = os.stat(path).st_mtime_ns
+                break
+            except OSError:
+                continue
+        else:
+            # Missing files are not cached, so a file added later is found
+            return None
+
+        with self._lock:
+            cached = self._series.get(ticker)
+            if cached is not None and cached[0] == (path, modified):
+                return cached[1]
+
+        frame = reader(path)
+        if 'Date' in frame.columns:
+            frame = frame.set_index('Date')
+        elif not isinstance(frame.index, pd.DatetimeIndex):
+            frame = frame.set_index(frame.columns[0])
+
+        for column in ('Close', 'Adj Close', frame.columns[0]):
+            if column in frame.columns:
+                series = frame[column]
+                break
+
+        series.index = pd.to_datetime(series.index)
+        series = series.sort_index().astype(float).rename(ticker)
+
+        with self._lock:
+            self._series[ticker] = ((path, modified), series)
+        return series
+
+    def fetch(self, tickers, start_date, end_date):
+        start = pd.Timestamp(start_date)
+        end = pd.Timestamp(end_date)
+
+        columns = {}
+        for ticker in tickers:
+            series = self._load(ticker)
+            if series is None:
+                logger.warning(f"No price file for {ticker} in {self.directory}")
+                continue
+            columns[ticker] = series[(series.index >= start) & (series.index < end)]
+
+        if not columns:
+            return pd.DataFrame()
+        return pd.concat(columns, axis=1)
+
+
+class SyntheticProvider(PriceProvider):
+    """
+    Deterministic geometric Brownian motion prices for any ticker.
+
+    Every ticker gets its own drift, volatility and market beta derived from a
+    hash of its symbol, plus a shared market factor so correlations look
+    realistic. Paths start at ORIGIN on a business-day calendar, so the price of
+    a ticker on a given day is the same whatever range is requested. A fixed
+    ``latency`` (SYNTHETIC_LATENCY seconds) can be added to every fetch to
+    emulate download time in load tests.
+    """
+
+    name = 'synthetic'
+    ORIGIN = '1980-01-01'
+
+    def __init__(self, seed=None, latency=None):
+        if seed is None:
+            seed = int(os.environ.get('SYNTHETIC_SEED', 0))
+        if latency is None:
+            latency = float(os.environ.get('SYNTHETIC_LATENCY', 0))
+        self.seed = seed
+        self.latency = latency
+
+    def _shocks(self, key, length):
+        # Same seed -> same stream, so shorter paths are prefixes of longer ones
+        rng = np.random.default_rng([self.seed, zlib.crc32(key.encode('utf-8'))])
+        return rng.standard_normal(length)
+
+    def _path(self, ticker, length):
+        # Paths are regenerated on every call, which is cheaper than keeping
+        # them in memory for thousands of tickers
+
+        # Ticker parameters from its hash: drift 2-12%, idiosyncratic vol 10-30%, beta 0.5-1.5
+        params = np.random.default_rng([self.seed, zlib.crc32(ticker.encode('utf-8')), 1]).random(3)
+        annual_drift = 0.02 + 0.10 * params[0]
+        annual_vol = 0.10 + 0.20 * params[1]
+        beta = 0.5 + params[2]
+
+        daily_vol = annual_vol / np.sqrt(252)
+        market = self._shocks('__market__', length) * (0.18 / np.sqrt(252))
+        idiosyncratic = self._shocks(ticker, length) * daily_vol
+        log_returns = (annual_drift / 252 - 0.5 * daily_vol ** 2) + beta * market + idiosyncratic
+
+        return 100.0 * np.exp(np.cumsum(log_returns))
+
+    def fetch(self, tickers, start_date, end_date):
+        if self.latency:
+            time.sleep(self.latency)
+
+        # Business days from ORIGIN to end_date (np.is_busday is much faster
+        # than pd.bdate_range for decades of days)
+        days = np.arange(np.datetime64(self.ORIGIN), np.datetime64(end_date), dtype='datetime64[D]')
+        calendar = days[np.is_busday(days)]
+        first = np.searchsorted(calendar, np.datetime64(start_date))
+        dates = pd.DatetimeIndex(calendar[first:])
+
+        if len(dates) == 0:
+            return pd.DataFrame()
+
+        prices = pd.DataFrame(
+            {ticker: self._path(ticker, len(calendar))[first:] for ticker in tickers},
+            index=dates
+        )
+        prices.index.name = 'Date'
+        return prices
+
+
+def create_provider(name=None):
+    """
+    Create a price provider by name.
+
+    Args:
+        name (str, optional): 'yfinance', 'file' or 'synthetic' (default: the
+            PRICE_PROVIDER environment variable, or 'yfinance')
+
+    Returns:
+        PriceProvider: New provider instance
+
+    Raises:
+        ValueError: If the provider name is unknown
+    """
+    name = (name or os.environ.get('PRICE_PROVIDER', 'yfinance')).lower()
+
+    if name == 'yfinance':
+        return YFinanceProvider()
+    if name == 'file':
+        return FileProvider()
+    if name == 'synthetic':
+        return SyntheticProvider()
+
+    raise ValueError(f"Unknown price provider '{name}'. Choose one of: {', '.join(PROVIDER_NAMES)}")
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """
+    Return the process-wide price provider, creating it on first use.
+
+    Returns:
+        PriceProvider: Active provider
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = create_provider()
+            logger.info(f"Using '{_provider.name}' price provider")
+        return _provider
+
+
+def set_provider(provider):
+    """
+    Replace the process-wide price provider (e.g. for benchmarks or tests).
+
+    Args:
+        provider (PriceProvider): Provider to use from now on
+    """
+    global _provider
+    with _provider_lock:
+        _provider = provider
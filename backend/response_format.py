@@ -0,0 +1,146 @@
+import re
+
+import numpy as np
+import logging
+
+try:
+    import msgpack
+except ImportError:  # optional: without it every response is JSON
+    msgpack = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# MessagePack extension types for typed arrays (little-endian buffers)
+EXT_DAYS = 1      # int32 days since 1970-01-01
+EXT_FLOAT64 = 2   # float64 values, NaN for missing
+EXT_FLOAT32 = 3   # float32 arrays (e.g. the packed correlation triangle)
+
+# Marker key of a table encoded column by column
+COLUMNS_KEY = '__columns__'
+
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def available_mimetypes():
+    """
+    Response formats this server can produce, preferred first.
+
+    JSON comes first so clients that do not ask for MessagePack keep
+    getting JSON (including axios' default ``application/json, */*``).
+
+    Returns:
+        list: Supported mimetypes
+    """
+    if msgpack is None:
+        return [JSON_MIMETYPE]
+    return [JSON_MIMETYPE, MSGPACK_MIMETYPE]
+
+
+def negotiate_mimetype(accept_mimetypes):
+    """
+    Pick the response format from the request's Accept header.
+
+    Args:
+        accept_mimetypes (werkzeug.datastructures.MIMEAccept): request.accept_mimetypes
+
+    Returns:
+        str: JSON_MIMETYPE or MSGPACK_MIMETYPE
+    """
+    return accept_mimetypes.best_match(available_mimetypes(), default=JSON_MIMETYPE)
+
+
+def _is_date_list(values):
+    return bool(values) and all(isinstance(v, str) and DATE_PATTERN.match(v) for v in values)
+
+
+def _is_number_list(values):
+    return bool(values) and all(
+        v is None or (isinstance(v, (int, float, np.number)) and not isinstance(v, bool)) for v in values
+    )
+
+
+def _is_table(rows):
+    # Rows of the same keys, one of them 'date' (chart series like
+    # portfolio_values), whose other fields are all numbers
+    if not rows or not all(isinstance(row, dict) for row in rows):
+        return False
+    keys = rows[0].keys()
+    if 'date' not in keys or not all(row.keys() == keys for row in rows):
+        return False
+    return all(_is_number_list([row[key] for row in rows]) for key in keys if key != 'date') and \
+        _is_date_list([row['date'] for row in rows])
+
+
+def _days(dates):
+    days = np.array(dates, dtype='datetime64[D]').astype(np.int32)
+    return msgpack.ExtType(EXT_DAYS, days.astype('<i4').tobytes())
+
+
+def _float64(values):
+    array = np.array([np.nan if v is None else v for v in values], dtype='<f8')
+    return msgpack.ExtType(EXT_FLOAT64, array.tobytes())
+
+
+def to_columnar(value):
+    """
+    Convert a JSON-ready result into its columnar MessagePack form.
+
+    Lists of per-day dicts ({'date': ..., 'value': ...}) become one column
+    per key under a COLUMNS_KEY marker, date lists become int32 day offsets,
+    number lists become float64 buffers and float32 arrays stay float32. Everything else is unchanged,
+    so the client can rebuild the JSON shape exactly.
+
+    Args:
+        value: Result dict (or any part of it)
+
+    Returns:
+        Structure that msgpack can pack
+    """
+    if isinstance(value, dict):
+        return {key: to_columnar(item) for key, item in value.items()}
+
+    if isinstance(value, list):
+        if _is_table(value):
+            keys = list(value[0].keys())
+            columns = {COLUMNS_KEY: keys}
+            for key in keys:
+                column = [row[key] for row in value]
+                columns[key] = _days(column) if key == 'date' else _float64(column)
+            return columns
+        if _is_date_list(value):
+            return _days(value)
+        if _is_number_list(value):
+            return _float64(value)
+        return [to_columnar(item) for item in value]
+
+    if isinstance(value, np.ndarray):
+        if value.dtype == np.float32:
+            return msgpack.ExtType(EXT_FLOAT32, value.astype('<f4').tobytes())
+        return to_columnar(value.tolist())
+
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return value
+
+
+def serialize(result, mimetype, json_dumps):
+    """
+    Serialize a result in the negotiated format.
+
+    Args:
+        result (dict): JSON-ready result
+        mimetype (str): JSON_MIMETYPE or MSGPACK_MIMETYPE
+        json_dumps (callable): JSON serializer used for JSON_MIMETYPE (the
+            Flask app's, so both paths handle the same types)
+
+    Returns:
+        bytes: Response body
+    """
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(to_columnar(result), use_bin_type=True)
+    return json_dumps(result).encode('utf-8')
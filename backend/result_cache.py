@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Defaults for the shared result cache (override with environment variables)
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 900
+
+
+def make_cache_key(kind, tickers, weights, start_date, end_date):
+    """
+    Build a content-addressed cache key for a portfolio request.
+
+    The key is a SHA-256 hash of the normalized request, so requests that only
+    differ in formatting (e.g. 40 vs 40.0, stray whitespace) share an entry.
+
+    Args:
+        kind (str): Name of the computation (e.g. "metrics", "stress_test")
+        tickers (list): List of stock ticker symbols
+        weights (list): Portfolio weights
+        start_date (str): Start date in YYYY-MM-DD format
+        end_date (str): End date in YYYY-MM-DD format
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    normalized = {
+        'kind': kind,
+        'tickers': [str(t).strip().upper() for t in tickers],
+        'weights': [round(float(w), 10) for w in weights],
+        'start_date': start_date,
+        'end_date': end_date
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def make_etag(body):
+    """
+    Build a strong ETag from a serialized response body.
+
+    Args:
+        body (bytes): Response body
+
+    Returns:
+        str: Quoted ETag value
+    """
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of serialized API responses with a time-to-live.
+
+    Entries are evicted least-recently-used once ``max_entries`` is reached or
+    the stored bodies together exceed ``max_bytes`` (a body larger than that
+    is not stored at all), and are treated as missing once older than ``ttl``
+    seconds. All operations are thread-safe.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, max_bytes=None):
+        if max_entries is None:
+            max_entries = int(os.environ.get('RESULT_CACHE_SIZE', DEFAULT_MAX_ENTRIES))
+        if ttl is None:
+            ttl = float(os.environ.get('RESULT_CACHE_TTL', DEFAULT_TTL_SECONDS))
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('RESULT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+        Look up a cached entry.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            dict: {'body': bytes, 'etag': str, 'status': int} or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and time.monotonic() - entry['stored_at'] > self.ttl:
+                del self._entries[key]
+                self._bytes -= len(entry['body'])
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, status=200):
+        """
+        Store a serialized response.
+
+        Args:
+            key (str): Cache key
+            body (bytes): Response body
+            status (int): HTTP status of the response
+
+        Returns:
+            dict: The entry (not kept if the body alone exceeds max_bytes)
+        """
+        entry = {
+            'body': body,
+            'etag': make_etag(body),
+            'status': status,
+            'stored_at': time.monotonic()
+        }
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous['body'])
+            if len(body) > self.max_bytes:
+                return entry
+
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted['body'])
+                self.evictions += 1
+
+        return entry
+
+    def clear(self):
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Return cache counters.
+
+        Returns:
+            dict: Size, capacity (entries and bytes), TTL and
+                hit/miss/eviction/expiration counts
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
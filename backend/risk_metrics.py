@@ -1,7 +1,17 @@
 import numpy as np
+from statistics import NormalDist
+
 import pandas as pd
-from scipy import stats
 import logging
+from portfolio_context import PortfolioContext
+from tail_risk import DEFAULT_CONFIDENCE_LEVELS, calculate_tail_risk
+from risk_attribution import calculate_risk_attribution
+from backtest import DEFAULT_SCHEDULE, run_backtest
+from downsampling import lttb_indices, minmax_indices
+from correlation import (LARGE_UNIVERSE_ASSETS, DEFAULT_TOP_K, cluster_order, correlation_summary,
+                         ledoit_wolf_intensity, standardize_returns)
+from rolling_metrics import (DEFAULT_WINDOWS, rolling_volatility, rolling_sharpe, rolling_beta,
+                             rolling_correlation, rolling_historical_var)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -99,7 +109,7 @@ def calculate_parametric_var(returns, confidence_level=0.95):
     sigma = returns.std()
 
     # Get z-score for confidence level (e.g., 1.645 for 95%, 2.326 for 99%)
-    z_score = stats.norm.ppf(1 - confidence_level)
+    z_score = NormalDist().inv_cdf(1 - confidence_level)
 
     # Calculate VaR: negative because we want loss as positive
     var = -(mu + sigma * z_score)
@@ -196,7 +206,7 @@ def calculate_beta(portfolio_returns, benchmark_returns):
     return beta
 
 
-def calculate_correlation_matrix(prices_df):
+def calculate_correlation_matrix(prices_df, context=None, shrinkage=False):
     """
     Calculate correlation matrix between all assets.
 
@@ -204,16 +214,40 @@ def calculate_correlation_matrix(prices_df):
 
     Args:
         prices_df (pd.DataFrame): DataFrame with asset prices
+        context (PortfolioContext, optional): Prepared context whose returns
+            panel is reused instead of recomputing returns
+        shrinkage (bool): Apply Ledoit-Wolf shrinkage towards identity
+            (default: False); the intensity is in ``attrs['shrinkage']``
 
     Returns:
-        pd.DataFrame: Correlation matrix
+        pd.DataFrame: Correlation matrix (NaN against assets whose price
+            never changes)
     """
-    # Calculate returns
-    returns = prices_df.pct_change().dropna()
-
-    # Calculate correlation matrix
-    correlation_matrix = returns.corr()
-
+    if context is not None:
+        returns = context.returns
+        tickers = context.tickers
+    else:
+        # Calculate returns
+        returns = prices_df.pct_change().dropna().to_numpy(dtype=float)
+        tickers = list(prices_df.columns)
+
+    # Returns have no gaps after dropna, so NumPy's dense corrcoef gives the
+    # same result as DataFrame.corr at a fraction of the cost (NaN for
+    # constant assets)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = np.atleast_2d(np.corrcoef(returns, rowvar=False))
+    np.fill_diagonal(correlation, 1.0)
+
+    # Shrinking towards identity scales the off-diagonal entries
+    intensity = None
+    if shrinkage:
+        upper = np.nan_to_num(correlation[np.triu_indices(len(tickers), 1)], nan=0.0)
+        intensity = ledoit_wolf_intensity(standardize_returns(returns, dtype=float), upper)
+        correlation *= 1.0 - intensity
+        np.fill_diagonal(correlation, 1.0)
+
+    correlation_matrix = pd.DataFrame(correlation, index=tickers, columns=tickers)
+    correlation_matrix.attrs['shrinkage'] = intensity
     return correlation_matrix
 
 
@@ -248,102 +282,378 @@ def calculate_rolling_volatility(portfolio_returns, window=30):
     Returns:
         pd.Series: Annualized rolling volatility
     """
-    # Calculate rolling standard deviation
-    rolling_std = portfolio_returns.rolling(window=window).std()
+    # Annualized rolling standard deviation from window sums (O(T) for any window)
+    volatility = rolling_volatility(portfolio_returns.to_numpy(), windows=[window])[window]
+
+    return pd.Series(volatility, index=portfolio_returns.index)
+
+
+def _chart_rows(context, values, key, lo, hi, max_points, method):
+    """Per-day {'date', key} rows for rows [lo, hi), downsampled if needed."""
+    if max_points is not None and hi - lo > max_points:
+        if method == 'minmax':
+            rows = lo + minmax_indices(values[lo:hi], max_points)
+        else:
+            rows = lo + lttb_indices(context.returns_day_numbers[lo:hi], values[lo:hi], max_points)
+    else:
+        rows = range(lo, hi)
+
+    dates = context.returns_dates
+    values = values.tolist()
+    return [
+        {
+            'date': dates[row],
+            key: values[row]
+        }
+        for row in rows
+    ]
+
+
+def _rolling_rows(context, values, max_points, method='lttb'):
+    """Per-day {'date', 'value'} rows where a rolling value exists, downsampled if needed."""
+    rows = np.flatnonzero(np.isfinite(values))
+    if max_points is not None and len(rows) > max_points:
+        if method == 'minmax':
+            rows = rows[minmax_indices(values[rows], max_points)]
+        else:
+            rows = rows[lttb_indices(context.returns_day_numbers[rows], values[rows], max_points)]
+
+    dates = context.returns_dates
+    return [
+        {
+            'date': dates[row],
+            'value': value
+        }
+        for row, value in zip(rows.tolist(), values[rows].tolist())
+    ]
 
-    # Annualize: multiply by sqrt(252)
-    rolling_volatility = rolling_std * np.sqrt(252)
 
-    return rolling_volatility
+def calculate_rolling_series(context, windows=DEFAULT_WINDOWS, pairs=None, max_points=None,
+                             risk_free_rate=0.04):
+    """
+    Rolling volatility, Sharpe Ratio, historical VaR, beta and pairwise
+    correlations for several windows.
 
+    Every statistic comes from window sums (or a sorted sliding window for
+    VaR), so each costs O(T) per window whatever the window length.
+    Portfolio series are downsampled with LTTB; the (possibly many)
+    correlation series keep each bucket's minimum and maximum, which is
+    vectorized and keeps correlation spikes.
 
-def calculate_all_metrics(prices_df, weights, benchmark_prices=None):
+    Args:
+        context (PortfolioContext): Prepared portfolio series
+        windows (iterable): Window lengths in days (default: 30, 60 and 252)
+        pairs (list, optional): (ticker, ticker) pairs to correlate (default: all)
+        max_points (int, optional): Maximum points per series (default: all)
+        risk_free_rate (float): Annual risk-free rate for the Sharpe Ratio
+
+    Returns:
+        dict: {window: {'volatility', 'sharpe', 'var_95', 'var_99', 'beta',
+            'correlation'}} with per-day rows; beta is None without a
+            benchmark and correlation maps "A/B" to rows
+    """
+    returns = context.portfolio_returns
+
+    # Asset pairs as column indices
+    if pairs is None:
+        pairs = [(a, b) for i, a in enumerate(context.tickers) for b in context.tickers[i + 1:]]
+    columns = {ticker: i for i, ticker in enumerate(context.tickers)}
+    pair_columns = [(columns[a], columns[b]) for a, b in pairs]
+
+    # Each family of statistics covers every window in one pass
+    volatility = rolling_volatility(returns, windows)
+    sharpe = rolling_sharpe(returns, windows, risk_free_rate)
+    var = rolling_historical_var(returns, windows, confidence_levels=(0.95, 0.99))
+    correlation = rolling_correlation(context.returns, windows, pair_columns)
+    beta = None
+    if context.benchmark_returns is not None:
+        beta = rolling_beta(returns, context.benchmark_returns, windows)
+
+    return {
+        str(window): {
+            'volatility': _rolling_rows(context, volatility[window], max_points),
+            'sharpe': _rolling_rows(context, sharpe[window], max_points),
+            'var_95': _rolling_rows(context, var[window][0.95], max_points),
+            'var_99': _rolling_rows(context, var[window][0.99], max_points),
+            'beta': _rolling_rows(context, beta[window], max_points) if beta is not None else None,
+            'correlation': {
+                f"{a}/{b}": _rolling_rows(context, correlation[window][:, k], max_points, 'minmax')
+                for k, (a, b) in enumerate(pairs)
+            }
+        }
+        for window in sorted(volatility)
+    }
+
+
+def calculate_chart_series(context, rolling_window=30, max_points=None, start_date=None, end_date=None):
+    """
+    Build the per-day chart series, optionally for a date range and downsampled.
+
+    Series are always computed over the full history (so values and drawdowns
+    are relative to the real start and peaks) and then cut to the range.
+    Portfolio value and rolling volatility are downsampled with LTTB; the
+    drawdown keeps the minimum and maximum of every bucket so troughs survive.
+
+    Args:
+        context (PortfolioContext): Prepared portfolio series
+        rolling_window (int): Rolling volatility window in days (default: 30)
+        max_points (int, optional): Maximum points per series (default: all)
+        start_date (str, optional): First date to include (YYYY-MM-DD)
+        end_date (str, optional): Last date to include (YYYY-MM-DD)
+
+    Returns:
+        dict: portfolio_values, drawdown_data and rolling_volatility lists
+    """
+    # Rows of the returns index inside the requested range
+    days = context.returns_day_numbers
+    lo, hi = 0, len(days)
+    if start_date is not None:
+        lo = int(np.searchsorted(days, np.datetime64(start_date, 'D').astype(np.int64), side='left'))
+    if end_date is not None:
+        hi = int(np.searchsorted(days, np.datetime64(end_date, 'D').astype(np.int64), side='right'))
+    hi = max(lo, hi)
+
+    # Portfolio values over time: initial value times cumulative growth
+    portfolio_values = 100000 * context.cumulative_returns
+
+    # Calculate rolling volatility (the first window-1 days have no value)
+    rolling_volatility = calculate_rolling_volatility(
+        context.portfolio_returns_series, window=rolling_window
+    ).to_numpy()
+
+    return {
+        'portfolio_values': _chart_rows(context, portfolio_values, 'value', lo, hi, max_points, 'lttb'),
+        'drawdown_data': _chart_rows(context, context.drawdown, 'drawdown', lo, hi, max_points, 'minmax'),
+        'rolling_volatility': _chart_rows(context, rolling_volatility, 'volatility',
+                                          max(lo, rolling_window - 1), hi, max_points, 'lttb')
+    }
+
+
+def calculate_backtest(context, schedule=DEFAULT_SCHEDULE, drift_threshold=None, transaction_cost=0.0,
+                       risk_free_rate=0.04, max_points=None):
+    """
+    Backtest the portfolio's target weights under a rebalancing policy.
+
+    Unlike calculate_all_metrics (constant weights, i.e. rebalanced daily
+    for free) and the stress tests (buy-and-hold), the weights here drift
+    between rebalances and trading back to target costs transaction_cost
+    per unit traded.
+
+    Args:
+        context (PortfolioContext): Prepared portfolio series
+        schedule (str): Calendar schedule ('none', 'daily', 'weekly',
+            'monthly', 'quarterly' or 'annually')
+        drift_threshold (float, optional): Also rebalance when a weight
+            drifts more than this from target (decimal, e.g. 0.05)
+        transaction_cost (float): Cost per unit traded (e.g. 0.001 for 10 bps)
+        risk_free_rate (float): Annual risk-free rate for the Sharpe Ratio
+        max_points (int, optional): Maximum points per series (default: all)
+
+    Returns:
+        dict: {
+            'summary': headline statistics,
+            'portfolio_values', 'drawdown_data': per-day rows,
+            'rebalances': {'dates': list, 'turnover': np.ndarray}
+        }
+    """
+    result = run_backtest(context.returns, context.weights, context.returns_day_numbers, schedule,
+                          drift_threshold, transaction_cost, risk_free_rate)
+
+    value = result['value']
+    running_max = np.maximum.accumulate(value)
+    drawdown = (value - running_max) / running_max
+    num_days = len(value)
+
+    dates = context.returns_dates
+    return {
+        'summary': result['summary'],
+        'portfolio_values': _chart_rows(context, 100000 * value, 'value', 0, num_days, max_points, 'lttb'),
+        'drawdown_data': _chart_rows(context, drawdown, 'drawdown', 0, num_days, max_points, 'minmax'),
+        'rebalances': {
+            'dates': [dates[row] for row in result['rebalance_rows']],
+            'turnover': result['turnover']
+        }
+    }
+
+
+def calculate_batch_metrics(prices_df, weights_matrix, benchmark_prices=None, risk_free_rate=0.04):
+    """
+    Calculate headline risk metrics for many portfolios over the same assets.
+
+    Asset returns are computed once and every portfolio's returns come from a
+    single matrix multiply: R_p = R @ W^T (T x K times K x N). All metrics are
+    then evaluated column-wise, without a Python loop over portfolios.
+
+    Args:
+        prices_df (pd.DataFrame): DataFrame with asset prices (columns = tickers)
+        weights_matrix (array-like): N x K portfolio weights (rows sum to 100)
+        benchmark_prices (pd.Series, optional): Benchmark prices for beta calculation
+        risk_free_rate (float): Annual risk-free rate (default: 4% = 0.04)
+
+    Returns:
+        dict: Metric name -> np.ndarray with one value per portfolio
+    """
+    logger.info("Calculating batch risk metrics...")
+
+    # Convert weights from percentage to decimal (N x K)
+    weights_decimal = np.asarray(weights_matrix, dtype=float) / 100.0
+
+    # Asset returns once for all portfolios (T x K)
+    asset_returns = prices_df.pct_change().dropna()
+    returns_array = asset_returns.to_numpy(dtype=float)
+
+    # Portfolio returns for every row in one matrix multiply (T x N)
+    portfolio_returns = returns_array @ weights_decimal.T
+
+    # Volatility
+    mean_returns = portfolio_returns.mean(axis=0)
+    daily_volatility = portfolio_returns.std(axis=0, ddof=1)
+    annual_volatility = daily_volatility * np.sqrt(252)
+
+    # Historical, parametric and Cornish-Fisher VaR and Expected Shortfall of
+    # every column from one partial sort
+    tail = calculate_tail_risk(portfolio_returns, (0.95, 0.99))
+
+    # Sharpe Ratio
+    annual_return = mean_returns * 252
+    sharpe_ratio = (annual_return - risk_free_rate) / annual_volatility
+
+    # Maximum Drawdown from the running peak of each cumulative value column
+    cumulative_returns = np.cumprod(1 + portfolio_returns, axis=0)
+    running_max = np.maximum.accumulate(cumulative_returns, axis=0)
+    max_drawdown = np.abs(((cumulative_returns - running_max) / running_max).min(axis=0))
+
+    # Beta against the benchmark on the dates both series have
+    beta = None
+    if benchmark_prices is not None:
+        benchmark_returns = benchmark_prices.pct_change().reindex(asset_returns.index).to_numpy(dtype=float)
+        valid = ~np.isnan(benchmark_returns)
+        aligned_benchmark = benchmark_returns[valid]
+        aligned_portfolios = portfolio_returns[valid]
+
+        benchmark_deviation = aligned_benchmark - aligned_benchmark.mean()
+        portfolio_deviation = aligned_portfolios - aligned_portfolios.mean(axis=0)
+        covariance = benchmark_deviation @ portfolio_deviation / (len(aligned_benchmark) - 1)
+        beta = covariance / aligned_benchmark.var(ddof=1)
+
+    logger.info(f"Batch risk metrics calculated for {weights_decimal.shape[0]} portfolios")
+
+    return {
+        'annual_return': annual_return,
+        'daily_volatility': daily_volatility,
+        'annual_volatility': annual_volatility,
+        'sharpe_ratio': sharpe_ratio,
+        'max_drawdown': max_drawdown,
+        'historical_var_95': tail['historical_var']['95'],
+        'historical_var_99': tail['historical_var']['99'],
+        'parametric_var_95': tail['parametric_var']['95'],
+        'parametric_var_99': tail['parametric_var']['99'],
+        'expected_shortfall_95': tail['expected_shortfall']['95'],
+        'expected_shortfall_99': tail['expected_shortfall']['99'],
+        'cornish_fisher_var_95': tail['cornish_fisher_var']['95'],
+        'cornish_fisher_var_99': tail['cornish_fisher_var']['99'],
+        'beta': beta
+    }
+
+
+def calculate_all_metrics(prices_df, weights, benchmark_prices=None, context=None, max_points=None,
+                          correlation_mode='auto', shrinkage=False, top_k=DEFAULT_TOP_K,
+                          confidence_levels=DEFAULT_CONFIDENCE_LEVELS):
     """
     Calculate all risk metrics for a portfolio.
 
+    Correlations come back as a nested ticker -> ticker matrix plus a
+    clustered ticker order for the heatmap ("full" mode), or for large
+    universes as a compact summary under 'correlation' with a packed upper
+    triangle, the top correlated pairs per asset and the clustered order
+    ("compact" mode). "auto" picks compact above LARGE_UNIVERSE_ASSETS assets.
+
     Args:
         prices_df (pd.DataFrame): DataFrame with asset prices
         weights (list): Portfolio weights (sum to 100)
         benchmark_prices (pd.Series, optional): Benchmark prices for beta calculation
+        context (PortfolioContext, optional): Prepared returns and value series
+            shared with the stress tests; built from the arguments if omitted
+        max_points (int, optional): Downsample each chart series to at most
+            this many points (default: every day)
+        correlation_mode (str): "auto", "full" or "compact" (default: "auto")
+        shrinkage (bool): Apply Ledoit-Wolf shrinkage to the correlations
+        top_k (int): Most correlated pairs per asset in compact mode
+        confidence_levels (iterable): Levels reported under 'tail_risk' and
+            'risk_attribution' (95% and 99% are always included for the
+            'var' summary)
 
     Returns:
         dict: Dictionary containing all calculated metrics
     """
     logger.info("Calculating risk metrics...")
 
-    # Calculate portfolio returns
-    portfolio_returns = calculate_portfolio_returns(prices_df, weights)
+    # Returns, cumulative value and drawdown are computed once in the context
+    if context is None:
+        context = PortfolioContext(prices_df, weights, benchmark_prices)
 
-    # Calculate portfolio values over time
-    portfolio_values = calculate_portfolio_values(portfolio_returns)
+    # Portfolio returns
+    portfolio_returns = context.portfolio_returns_series
 
     # Calculate volatility
     daily_volatility = calculate_volatility(portfolio_returns, annualize=False)
     annual_volatility = calculate_volatility(portfolio_returns, annualize=True)
 
-    # Calculate rolling volatility
-    rolling_volatility = calculate_rolling_volatility(portfolio_returns, window=30)
-
-    # Calculate VaR at different confidence levels
-    historical_var_95 = calculate_historical_var(portfolio_returns, 0.95)
-    historical_var_99 = calculate_historical_var(portfolio_returns, 0.99)
-    parametric_var_95 = calculate_parametric_var(portfolio_returns, 0.95)
-    parametric_var_99 = calculate_parametric_var(portfolio_returns, 0.99)
+    # VaR and Expected Shortfall at every confidence level from one partial sort
+    levels = sorted(set(float(c) for c in confidence_levels) | {0.95, 0.99})
+    tail_risk = calculate_tail_risk(context.portfolio_returns, levels)
+    daily_var = {
+        f"{measure}_{label}": tail_risk[name][label]
+        for measure, name in (('historical', 'historical_var'), ('parametric', 'parametric_var'),
+                              ('expected_shortfall', 'expected_shortfall'),
+                              ('cornish_fisher', 'cornish_fisher_var'))
+        for label in ('95', '99')
+    }
 
     # Annualize VaR (multiply by sqrt(252))
-    annual_historical_var_95 = historical_var_95 * np.sqrt(252)
-    annual_historical_var_99 = historical_var_99 * np.sqrt(252)
-    annual_parametric_var_95 = parametric_var_95 * np.sqrt(252)
-    annual_parametric_var_99 = parametric_var_99 * np.sqrt(252)
+    annual_var = {name: value * np.sqrt(252) for name, value in daily_var.items()}
+
+    # Per-position marginal, component and incremental VaR from one
+    # covariance-vector product
+    risk_attribution = calculate_risk_attribution(context.returns, context.weights, context.tickers, levels)
 
     # Calculate Sharpe Ratio
     sharpe_ratio = calculate_sharpe_ratio(portfolio_returns)
 
-    # Calculate Maximum Drawdown
-    drawdown_data = calculate_max_drawdown(portfolio_returns)
-
-    # Calculate correlation matrix
-    correlation_matrix = calculate_correlation_matrix(prices_df)
+    # Maximum Drawdown from the shared drawdown series
+    max_drawdown = abs(context.drawdown.min())
+
+    # Calculate correlations: nested matrix, or packed summary for large universes
+    if correlation_mode == 'auto':
+        correlation_mode = 'compact' if len(context.tickers) > LARGE_UNIVERSE_ASSETS else 'full'
+    if correlation_mode == 'compact':
+        correlation = correlation_summary(context.returns, context.tickers, shrinkage=shrinkage, top_k=top_k)
+        correlation_matrix = None
+        correlation_order = correlation['order']
+        correlation_shrinkage = correlation['shrinkage']
+    else:
+        correlation = None
+        matrix = calculate_correlation_matrix(prices_df, context=context, shrinkage=shrinkage)
+        # Undefined correlations (constant prices) are sent as null, not NaN
+        correlation_matrix = matrix.astype(object).where(matrix.notna(), None).to_dict()
+        correlation_order = cluster_order(matrix.to_numpy()[np.triu_indices(len(matrix), 1)], len(matrix))
+        correlation_shrinkage = matrix.attrs['shrinkage']
 
     # Calculate Beta if benchmark provided
     beta = None
-    if benchmark_prices is not None:
-        benchmark_returns = benchmark_prices.pct_change().dropna()
-        beta = calculate_beta(portfolio_returns, benchmark_returns)
+    if context.benchmark_returns is not None:
+        valid = ~np.isnan(context.benchmark_returns)
+        beta = calculate_beta(context.portfolio_returns[valid], context.benchmark_returns[valid])
 
     # Calculate annualized return
     annual_return = portfolio_returns.mean() * 252
 
-    # Prepare portfolio values for chart
-    portfolio_values_list = [
-        {
-            'date': date.strftime('%Y-%m-%d'),
-            'value': float(value)
-        }
-        for date, value in portfolio_values.items()
-    ]
-
-    # Prepare drawdown data for chart
-    drawdown_list = [
-        {
-            'date': date.strftime('%Y-%m-%d'),
-            'drawdown': float(dd)
-        }
-        for date, dd in drawdown_data['drawdown_series'].items()
-    ]
-
-    # Prepare rolling volatility data for chart
-    rolling_volatility_list = [
-        {
-            'date': date.strftime('%Y-%m-%d'),
-            'volatility': float(vol)
-        }
-        for date, vol in rolling_volatility.dropna().items()
-    ]
+    # Chart series (portfolio value, drawdown, rolling volatility)
+    chart_series = calculate_chart_series(context, max_points=max_points)
 
     # Prepare return distribution for histogram (create bins)
     num_bins = 50
-    returns_array = portfolio_returns.values
+    returns_array = context.portfolio_returns
     hist, bin_edges = np.histogram(returns_array, bins=num_bins)
 
     return_distribution = [
@@ -361,26 +671,23 @@ def calculate_all_metrics(prices_df, weights, benchmark_prices=None):
         'daily_volatility': daily_volatility,
         'annual_volatility': annual_volatility,
         'sharpe_ratio': sharpe_ratio,
-        'max_drawdown': drawdown_data['max_drawdown'],
+        'max_drawdown': max_drawdown,
         'var': {
-            'daily': {
-                'historical_95': historical_var_95,
-                'historical_99': historical_var_99,
-                'parametric_95': parametric_var_95,
-                'parametric_99': parametric_var_99
-            },
-            'annual': {
-                'historical_95': annual_historical_var_95,
-                'historical_99': annual_historical_var_99,
-                'parametric_95': annual_parametric_var_95,
-                'parametric_99': annual_parametric_var_99
-            }
+            'daily': daily_var,
+            'annual': annual_var
         },
+        'tail_risk': tail_risk,
+        'risk_attribution': risk_attribution,
         'beta': beta,
-        'correlation_matrix': correlation_matrix.to_dict(),
-        'portfolio_values': portfolio_values_list,
-        'drawdown_data': drawdown_list,
-        'rolling_volatility': rolling_volatility_list,
+        'correlation_matrix': correlation_matrix,
+        'correlation_order': correlation_order,
+        'correlation_shrinkage': correlation_shrinkage,
+        'correlation': correlation,
+        **chart_series,
+        'chart_resolution': {
+            'total_points': len(context.returns_index),
+            'max_points': max_points
+        },
         'return_distribution': return_distribution
     }
 
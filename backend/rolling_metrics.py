@@ -0,0 +1,328 @@
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rolling windows in trading days (about 1.5 months, 3 months and 1 year)
+DEFAULT_WINDOWS = (30, 60, 252)
+
+# Asset pairs whose products are accumulated at once in rolling_correlation;
+# bounds the temporary (T x block) arrays for large portfolios
+PAIR_BLOCK_SIZE = 256
+
+# Returns partitioned at once in rolling_historical_var (window ends x window
+# length); bounds the temporary block for long windows
+VAR_BLOCK_ELEMENTS = 1 << 20
+
+
+def _prefix_sums(values):
+    """
+    Cumulative sums with a leading zero row.
+
+    Window sums then come from one subtraction per window end:
+    sum(values[t - w + 1:t + 1]) = prefix[t + 1] - prefix[t + 1 - w].
+    """
+    values = np.asarray(values, dtype=float)
+    prefix = np.zeros((len(values) + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=prefix[1:])
+    return prefix
+
+
+def _window_sums(prefix, window):
+    """
+    Sums over every window of a prefix-sum array, aligned to the window end.
+
+    Returns an array the length of the original series whose first
+    window - 1 rows (incomplete windows) are NaN.
+    """
+    sums = np.empty((len(prefix) - 1,) + prefix.shape[1:])
+    sums[:window - 1] = np.nan
+    np.subtract(prefix[window:], prefix[:-window], out=sums[window - 1:])
+    return sums
+
+
+def _rounding_floor(prefix_sq):
+    """
+    Sums of squared deviations below this are rounding noise, i.e. zero.
+
+    Window sums are differences of running totals, so they carry an absolute
+    error relative to the final total rather than to the window itself; a
+    window of constant values would otherwise show a tiny spurious variance.
+    """
+    return 64 * np.finfo(float).eps * prefix_sq[-1]
+
+
+def _validate_windows(windows, length):
+    windows = sorted({int(w) for w in windows})
+    if not windows or windows[0] < 2:
+        raise ValueError('Rolling windows must be at least 2 days')
+    if windows[-1] > length:
+        raise ValueError(f"Rolling window of {windows[-1]} days is longer than the "
+                         f"{length} days of returns")
+    return windows
+
+
+def rolling_mean_std(returns, windows=DEFAULT_WINDOWS):
+    """
+    Rolling mean and sample standard deviation for several windows at once.
+
+    Prefix sums of the returns and their squares are built once; each window
+    then costs one subtraction per day, so the work is O(T) per window
+    whatever its length. Returns are centred on their overall mean first to
+    keep the sums small and the variance free of cancellation error.
+
+    Args:
+        returns (np.ndarray): Daily returns (T,)
+        windows (iterable): Window lengths in days
+
+    Returns:
+        dict: {window: (mean, std)} arrays of length T, NaN before the first
+            full window
+    """
+    returns = np.asarray(returns, dtype=float)
+    windows = _validate_windows(windows, len(returns))
+
+    # Centre once so the sums of squares stay well conditioned
+    shift = returns.mean()
+    centred = returns - shift
+    prefix = _prefix_sums(centred)
+    prefix_sq = _prefix_sums(centred * centred)
+
+    result = {}
+    for window in windows:
+        total = _window_sums(prefix, window)
+        total_sq = _window_sums(prefix_sq, window)
+
+        # Sample variance: (sum x^2 - (sum x)^2 / n) / (n - 1)
+        ss = total_sq - total * total / window
+        ss[ss <= _rounding_floor(prefix_sq)] = 0.0
+        std = np.sqrt(ss / (window - 1))
+        result[window] = (total / window + shift, std)
+
+    return result
+
+
+def rolling_volatility(returns, windows=DEFAULT_WINDOWS, annualize=True):
+    """
+    Rolling volatility for several windows.
+
+    Args:
+        returns (np.ndarray): Daily returns (T,)
+        windows (iterable): Window lengths in days
+        annualize (bool): Multiply by sqrt(252) (default: True)
+
+    Returns:
+        dict: {window: volatility array (T,)}, NaN before the first full window
+    """
+    scale = np.sqrt(252) if annualize else 1.0
+    return {
+        window: std * scale
+        for window, (_, std) in rolling_mean_std(returns, windows).items()
+    }
+
+
+def rolling_sharpe(returns, windows=DEFAULT_WINDOWS, risk_free_rate=0.04):
+    """
+    Rolling annualized Sharpe Ratio for several windows.
+
+    Args:
+        returns (np.ndarray): Daily returns (T,)
+        windows (iterable): Window lengths in days
+        risk_free_rate (float): Annual risk-free rate (default: 4% = 0.04)
+
+    Returns:
+        dict: {window: Sharpe array (T,)}, NaN before the first full window
+            and where the window has no volatility
+    """
+    result = {}
+    for window, (mean, std) in rolling_mean_std(returns, windows).items():
+        annual_volatility = std * np.sqrt(252)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = (mean * 252 - risk_free_rate) / annual_volatility
+        sharpe[annual_volatility == 0] = np.nan
+        result[window] = sharpe
+    return result
+
+
+def _rolling_covariances(x, y, windows):
+    """
+    Rolling sample covariance of x and y plus the variance of y.
+
+    NaN in either series marks a missing day: it is left out of every window
+    it falls in, and the window uses the days it does have.
+
+    Returns:
+        dict: {window: (cov_xy, var_y)} arrays (T,)
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+
+    # Centre on the mean of the valid days and zero out the missing ones
+    x = np.where(valid, x - x[valid].mean(), 0.0)
+    y = np.where(valid, y - y[valid].mean(), 0.0)
+
+    prefix_n = _prefix_sums(valid.astype(float))
+    prefix_x = _prefix_sums(x)
+    prefix_y = _prefix_sums(y)
+    prefix_yy = _prefix_sums(y * y)
+    prefix_xy = _prefix_sums(x * y)
+
+    result = {}
+    for window in windows:
+        n = _window_sums(prefix_n, window)
+        sx = _window_sums(prefix_x, window)
+        sy = _window_sums(prefix_y, window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            denominator = np.where(n > 1, n - 1, np.nan)
+            cov_xy = (_window_sums(prefix_xy, window) - sx * sy / n) / denominator
+            ss_y = _window_sums(prefix_yy, window) - sy * sy / n
+            ss_y[ss_y <= _rounding_floor(prefix_yy)] = 0.0
+            var_y = ss_y / denominator
+        result[window] = (cov_xy, var_y)
+    return result
+
+
+def rolling_beta(portfolio_returns, benchmark_returns, windows=DEFAULT_WINDOWS):
+    """
+    Rolling Beta against a benchmark for several windows.
+
+    Formula per window: β = Cov(R_p, R_m) / Var(R_m). Days where the
+    benchmark is missing (NaN) are skipped.
+
+    Args:
+        portfolio_returns (np.ndarray): Portfolio daily returns (T,)
+        benchmark_returns (np.ndarray): Benchmark daily returns (T,), NaN where missing
+        windows (iterable): Window lengths in days
+
+    Returns:
+        dict: {window: beta array (T,)}, NaN before the first full window and
+            where the benchmark does not move
+    """
+    windows = _validate_windows(windows, len(portfolio_returns))
+
+    result = {}
+    for window, (cov_xy, var_m) in _rolling_covariances(portfolio_returns, benchmark_returns,
+                                                          windows).items():
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta = cov_xy / var_m
+        beta[var_m == 0] = np.nan
+        result[window] = beta
+    return result
+
+
+def rolling_correlation(returns, windows=DEFAULT_WINDOWS, pairs=None):
+    """
+    Rolling pairwise correlation between assets for several windows.
+
+    Every asset's prefix sums are built once; the products of each pair are
+    accumulated in blocks of PAIR_BLOCK_SIZE pairs, so the cost is O(T) per
+    pair and window and memory stays bounded for large portfolios.
+
+    Args:
+        returns (np.ndarray): Daily asset returns (T x K)
+        windows (iterable): Window lengths in days
+        pairs (list, optional): (i, j) column index pairs (default: all i < j)
+
+    Returns:
+        dict: {window: correlation array (T x P)} with one column per pair,
+            NaN before the first full window and where an asset does not move
+    """
+    returns = np.asarray(returns, dtype=float)
+    windows = _validate_windows(windows, len(returns))
+    if pairs is None:
+        pairs = [(i, j) for i in range(returns.shape[1]) for j in range(i + 1, returns.shape[1])]
+    pairs = np.asarray(pairs, dtype=int).reshape(-1, 2)
+
+    # Centre every asset once; prefix sums of values and squares per asset
+    centred = returns - returns.mean(axis=0)
+    prefix = _prefix_sums(centred)
+    prefix_sq = _prefix_sums(centred * centred)
+
+    # Per-asset window sums and inverse root sums of squares are shared by
+    # every pair; an asset that does not move gets NaN instead of infinity
+    asset_terms = {}
+    for window in windows:
+        total = _window_sums(prefix, window)
+        ss = _window_sums(prefix_sq, window) - total * total / window
+        ss[ss <= _rounding_floor(prefix_sq)] = 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse_root = np.where(ss > 0, 1.0 / np.sqrt(ss), np.nan)
+        asset_terms[window] = (total / np.sqrt(window), inverse_root)
+
+    result = {window: np.empty((len(returns), len(pairs))) for window in windows}
+    for start in range(0, len(pairs), PAIR_BLOCK_SIZE):
+        block = pairs[start:start + PAIR_BLOCK_SIZE]
+        left, right = block[:, 0], block[:, 1]
+        prefix_xy = _prefix_sums(centred[:, left] * centred[:, right])
+
+        for window in windows:
+            scaled_total, inverse_root = asset_terms[window]
+
+            # corr = (sum xy - sum x sum y / n) / sqrt(ss_x ss_y)
+            correlation = _window_sums(prefix_xy, window)
+            correlation -= scaled_total[:, left] * scaled_total[:, right]
+            correlation *= inverse_root[:, left]
+            correlation *= inverse_root[:, right]
+            np.clip(correlation, -1.0, 1.0, out=result[window][:, start:start + len(block)])
+
+    return result
+
+
+def rolling_historical_var(returns, windows=DEFAULT_WINDOWS, confidence_levels=(0.95, 0.99)):
+    """
+    Rolling Historical VaR for several windows and confidence levels.
+
+    The windows are strided views of the returns, partitioned a block of
+    window ends at a time so the smallest returns (down to the deepest tail
+    percentile) come first. Sorting those gives the order statistics, which
+    are interpolated linearly (as np.percentile). Partitioning is O(w) per
+    window end, so a window of w days costs O(T w) in total, in vectorized
+    blocks of at most VAR_BLOCK_ELEMENTS returns.
+
+    Args:
+        returns (np.ndarray): Daily returns (T,)
+        windows (iterable): Window lengths in days
+        confidence_levels (tuple): Confidence levels (default: 95% and 99%)
+
+    Returns:
+        dict: {window: {confidence_level: VaR array (T,)}} as positive losses,
+            NaN before the first full window
+    """
+    values = np.asarray(returns, dtype=float)
+    windows = _validate_windows(windows, len(values))
+
+    result = {}
+    for window in windows:
+        # Position of each tail percentile in a sorted window: lower index and weight
+        positions = [(level, *divmod((1 - level) * (window - 1), 1)) for level in confidence_levels]
+        positions = [(level, int(index), weight) for level, index, weight in positions]
+        kth = sorted({index for _, index, _ in positions}
+                     | {index + 1 for _, index, weight in positions if weight})
+        head = kth[-1] + 1
+
+        windowed = np.lib.stride_tricks.sliding_window_view(values, window)
+        order_stats = np.empty((len(windowed), len(kth)))
+        block = max(VAR_BLOCK_ELEMENTS // window, 1)
+        for start in range(0, len(windowed), block):
+            # One partition brings the `head` smallest returns to the front
+            # (much faster than partitioning around every kth), then sorting
+            # just those gives all the order statistics
+            smallest = np.partition(windowed[start:start + block], head - 1, axis=1)[:, :head]
+            smallest.sort(axis=1)
+            order_stats[start:start + block] = smallest[:, kth]
+
+        column = {k: i for i, k in enumerate(kth)}
+        result[window] = {}
+        for level, index, weight in positions:
+            var = np.full(len(values), np.nan)
+            low = order_stats[:, column[index]]
+            if weight:
+                high = order_stats[:, column[index + 1]]
+                var[window - 1:] = -(low + (high - low) * weight)
+            else:
+                var[window - 1:] = -low
+            result[window][level] = var
+
+    return result
@@ -0,0 +1,467 @@
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upper bound on elements of the (scenarios x assets) shock block evaluated at
+# once; larger scenario sets are processed in several blocks
+SCENARIO_BLOCK_ELEMENTS = 1 << 22
+
+# Worst scenarios (and mildest breaches) listed per portfolio
+DEFAULT_TOP_N = 10
+
+# Bins of the per-portfolio P&L histogram
+HISTOGRAM_BINS = 40
+
+# Percentiles of the P&L distribution reported per portfolio
+PNL_PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+def _parse_shocks(shocks, names, field, ranges=False):
+    """
+    Check a {name: shock} (or {name: [low, high]}) mapping against known names.
+
+    Returns:
+        dict: {index into names: shock or (low, high)}
+    """
+    if shocks is None:
+        return {}
+    if not isinstance(shocks, dict):
+        raise ValueError(f"{field} must be an object of name: value")
+
+    lookup = {str(name).upper().strip(): i for i, name in enumerate(names)}
+    parsed = {}
+    for name, value in shocks.items():
+        index = lookup.get(str(name).upper().strip())
+        if index is None:
+            raise ValueError(f"{field} references {name}, which is not one of: {', '.join(names) or 'none'}")
+        try:
+            if ranges:
+                low, high = (float(v) for v in value)
+                value = (low, high)
+                bounds = value
+            else:
+                value = float(value)
+                bounds = (value,)
+        except (ValueError, TypeError):
+            kind = 'a [low, high] range' if ranges else 'a number'
+            raise ValueError(f"{field} for {name} must be {kind}")
+        if not all(np.isfinite(bounds)) or min(bounds) < -1:
+            raise ValueError(f"{field} for {name} must be finite returns of at least -1 (-100%)")
+        if ranges and value[1] < value[0]:
+            raise ValueError(f"{field} range for {name} has high below low")
+        parsed[index] = value
+    return parsed
+
+
+def validate_scenario_spec(spec, tickers, factors=None, max_scenarios=None):
+    """
+    Check and normalize a hypothetical scenario specification.
+
+    Scenarios shock asset returns directly ('shocks', keyed by ticker) and/or
+    factor returns ('factor_shocks', keyed by factor proxy ticker, mapped to
+    the assets through regression betas). Besides named scenarios, a 'grid'
+    (every combination of evenly spaced shocks) and a 'random' set (uniform
+    draws) can be generated over shock ranges, e.g. for reverse stress tests.
+
+    Args:
+        spec (dict): {
+            'scenarios': [{'name', 'shocks': {ticker: r}, 'factor_shocks': {factor: r}}],
+            'grid': {'shocks': {ticker: [lo, hi]}, 'factor_shocks': {...}, 'steps': int},
+            'random': {'shocks': {...}, 'factor_shocks': {...}, 'n_scenarios': int, 'seed': int}
+        } (every part optional, at least one scenario overall)
+        tickers (list): Portfolio tickers
+        factors (list, optional): Factor proxy tickers
+        max_scenarios (int, optional): Upper bound on the total scenario count
+
+    Returns:
+        dict: Normalized spec with ticker/factor indices and 'scenario_count'
+
+    Raises:
+        ValueError: If the specification is malformed or too large
+    """
+    factors = list(factors or [])
+    if not isinstance(spec, dict):
+        raise ValueError('Scenario specification must be an object')
+
+    # Named scenarios
+    named = spec.get('scenarios') or []
+    if not isinstance(named, list):
+        raise ValueError('scenarios must be a list')
+    scenarios = []
+    for i, scenario in enumerate(named):
+        if not isinstance(scenario, dict):
+            raise ValueError(f"Scenario {i + 1} must be an object")
+        shocks = _parse_shocks(scenario.get('shocks'), tickers, 'shocks')
+        factor_shocks = _parse_shocks(scenario.get('factor_shocks'), factors, 'factor_shocks')
+        if not shocks and not factor_shocks:
+            raise ValueError(f"Scenario {i + 1} needs shocks or factor_shocks")
+        scenarios.append({
+            'name': str(scenario.get('name') or f"Scenario {i + 1}"),
+            'shocks': shocks,
+            'factor_shocks': factor_shocks
+        })
+
+    # Generated scenarios over shock ranges
+    generated = {}
+    for kind in ('grid', 'random'):
+        options = spec.get(kind)
+        if options is None:
+            continue
+        if not isinstance(options, dict):
+            raise ValueError(f"{kind} must be an object")
+        shocks = _parse_shocks(options.get('shocks'), tickers, f"{kind} shocks", ranges=True)
+        factor_shocks = _parse_shocks(options.get('factor_shocks'), factors, f"{kind} factor_shocks",
+                                      ranges=True)
+        if not shocks and not factor_shocks:
+            raise ValueError(f"{kind} needs shock ranges in shocks or factor_shocks")
+
+        try:
+            if kind == 'grid':
+                steps = int(options.get('steps', 5))
+                settings = {'steps': steps}
+            else:
+                seed = options.get('seed')
+                settings = {'n_scenarios': int(options.get('n_scenarios', 1000)),
+                            'seed': int(seed) if seed is not None else None}
+        except (ValueError, TypeError, OverflowError):
+            raise ValueError(f"{kind} settings must be integers")
+
+        if kind == 'grid':
+            if steps < 2:
+                raise ValueError('grid steps must be at least 2')
+            count = steps ** (len(shocks) + len(factor_shocks))
+        else:
+            count = settings['n_scenarios']
+            if count < 1:
+                raise ValueError('random n_scenarios must be positive')
+
+        generated[kind] = {'shocks': shocks, 'factor_shocks': factor_shocks, 'count': count, **settings}
+
+    scenario_count = len(scenarios) + sum(g['count'] for g in generated.values())
+    if scenario_count == 0:
+        raise ValueError('At least one scenario, grid or random set is required')
+    if max_scenarios is not None and scenario_count > max_scenarios:
+        raise ValueError(f"{scenario_count} scenarios requested; at most {max_scenarios} are allowed")
+
+    return {
+        'factors': factors,
+        'scenarios': scenarios,
+        'grid': generated.get('grid'),
+        'random': generated.get('random'),
+        'scenario_count': scenario_count
+    }
+
+
+def build_scenarios(spec):
+    """
+    Expand a validated spec into shock matrices.
+
+    Only assets that some scenario shocks directly get a column, so the
+    matrices stay small however many assets the portfolio has. NaN marks a
+    shock the scenario leaves unspecified: an unspecified factor does not
+    move, an unspecified asset follows its factor-implied return.
+
+    Args:
+        spec (dict): Output of validate_scenario_spec
+
+    Returns:
+        dict: {
+            'labels': list (one per scenario),
+            'factor_shocks': np.ndarray (S x F),
+            'asset_columns': np.ndarray (indices of directly shocked assets),
+            'asset_shocks': np.ndarray (S x A)
+        }
+    """
+    num_factors = len(spec['factors'])
+    asset_columns = set()
+    for part in spec['scenarios'] + [spec[kind] for kind in ('grid', 'random') if spec[kind]]:
+        asset_columns.update(part['shocks'])
+    asset_columns = sorted(asset_columns)
+    asset_position = {index: j for j, index in enumerate(asset_columns)}
+
+    labels = []
+    factor_blocks = []
+    asset_blocks = []
+
+    # Named scenarios, one row each
+    if spec['scenarios']:
+        factor_block = np.full((len(spec['scenarios']), num_factors), np.nan)
+        asset_block = np.full((len(spec['scenarios']), len(asset_columns)), np.nan)
+        for row, scenario in enumerate(spec['scenarios']):
+            labels.append(scenario['name'])
+            for index, value in scenario['factor_shocks'].items():
+                factor_block[row, index] = value
+            for index, value in scenario['shocks'].items():
+                asset_block[row, asset_position[index]] = value
+        factor_blocks.append(factor_block)
+        asset_blocks.append(asset_block)
+
+    # Grid and random sets: one column per shocked variable, filled at once
+    for kind in ('grid', 'random'):
+        options = spec[kind]
+        if not options:
+            continue
+        variables = ([('factor', i, r) for i, r in options['factor_shocks'].items()] +
+                     [('asset', i, r) for i, r in options['shocks'].items()])
+        lows = np.array([r[0] for _, _, r in variables])
+        highs = np.array([r[1] for _, _, r in variables])
+
+        if kind == 'grid':
+            steps = options['steps']
+            # Row-major enumeration of every combination of step indices
+            index_grid = np.indices((steps,) * len(variables)).reshape(len(variables), -1).T
+            values = lows + (highs - lows) * index_grid / (steps - 1)
+        else:
+            rng = np.random.default_rng(options['seed'])
+            values = rng.uniform(lows, highs, size=(options['count'], len(variables)))
+
+        factor_block = np.full((len(values), num_factors), np.nan)
+        asset_block = np.full((len(values), len(asset_columns)), np.nan)
+        for column, (target, index, _) in enumerate(variables):
+            if target == 'factor':
+                factor_block[:, index] = values[:, column]
+            else:
+                asset_block[:, asset_position[index]] = values[:, column]
+        labels.extend(f"{kind} #{i + 1}" for i in range(len(values)))
+        factor_blocks.append(factor_block)
+        asset_blocks.append(asset_block)
+
+    return {
+        'labels': labels,
+        'factor_shocks': np.vstack(factor_blocks),
+        'asset_columns': np.asarray(asset_columns, dtype=np.int64),
+        'asset_shocks': np.vstack(asset_blocks)
+    }
+
+
+def estimate_factor_betas(asset_returns, factor_returns):
+    """
+    Regress every asset's daily returns on the factor returns (with intercept).
+
+    Days where a factor or the asset is missing (NaN) are left out. Assets
+    with complete data share one least-squares solve; the others are solved
+    one by one on their own days.
+
+    Args:
+        asset_returns (np.ndarray): Daily asset returns (T x K)
+        factor_returns (np.ndarray): Daily factor returns (T x F)
+
+    Returns:
+        tuple: (betas (F x K), r_squared (K,)) as np.ndarrays
+
+    Raises:
+        ValueError: If there are too few days to estimate the betas
+    """
+    num_factors = factor_returns.shape[1]
+    num_assets = asset_returns.shape[1]
+    factor_days = ~np.isnan(factor_returns).any(axis=1)
+    asset_days = ~np.isnan(asset_returns) & factor_days[:, None]
+
+    betas = np.full((num_factors, num_assets), np.nan)
+    r_squared = np.full(num_assets, np.nan)
+
+    def solve(rows, columns):
+        if rows.sum() < num_factors + 2:
+            raise ValueError("Not enough overlapping days to estimate factor betas")
+        design = np.column_stack([np.ones(rows.sum()), factor_returns[rows]])
+        target = asset_returns[np.ix_(rows, columns)]
+        coefficients, _, _, _ = np.linalg.lstsq(design, target, rcond=None)
+        residuals = target - design @ coefficients
+        total = ((target - target.mean(axis=0)) ** 2).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r_squared[columns] = np.where(total > 0, 1 - (residuals ** 2).sum(axis=0) / total, np.nan)
+        betas[:, columns] = coefficients[1:]
+
+    complete = asset_days[factor_days].all(axis=0)
+    if complete.any():
+        solve(factor_days, np.flatnonzero(complete))
+    for column in np.flatnonzero(~complete):
+        solve(asset_days[:, column], np.array([column]))
+
+    return betas, r_squared
+
+
+def scenario_pnl(scenarios, betas, weights_matrix, block_elements=SCENARIO_BLOCK_ELEMENTS):
+    """
+    Portfolio return of every scenario for every portfolio.
+
+    Asset shocks are the factor shocks times the betas, overridden where a
+    scenario shocks an asset directly and floored at -100%; the P&L of a
+    block of scenarios for all portfolios is then one matrix product
+    (portfolios x assets times assets x scenarios).
+
+    Args:
+        scenarios (dict): Output of build_scenarios
+        betas (np.ndarray): Factor betas (F x K)
+        weights_matrix (np.ndarray): Portfolio weights as decimals (P x K)
+        block_elements (int): Scenario x asset elements evaluated at once
+
+    Returns:
+        np.ndarray: Portfolio returns (P x S), one row per portfolio so that
+            per-portfolio reductions run over contiguous memory
+    """
+    weights_matrix = np.atleast_2d(np.asarray(weights_matrix, dtype=float))
+    factor_shocks = np.nan_to_num(scenarios['factor_shocks'])
+    asset_columns = scenarios['asset_columns']
+    num_scenarios = len(factor_shocks)
+    num_assets = weights_matrix.shape[1]
+
+    pnl = np.empty((len(weights_matrix), num_scenarios))
+    block_size = max(1, block_elements // max(num_assets, 1))
+    for start in range(0, num_scenarios, block_size):
+        stop = min(start + block_size, num_scenarios)
+
+        # Factor-implied asset returns, then the direct asset shocks
+        asset_returns = factor_shocks[start:stop] @ betas
+        direct = scenarios['asset_shocks'][start:stop]
+        asset_returns[:, asset_columns] = np.where(np.isnan(direct), asset_returns[:, asset_columns], direct)
+        np.maximum(asset_returns, -1.0, out=asset_returns)
+
+        pnl[:, start:stop] = weights_matrix @ asset_returns.T
+
+    return pnl
+
+
+def pnl_histograms(pnl, bins=HISTOGRAM_BINS):
+    """
+    Histogram of each portfolio's scenario P&L (P x S), all rows at once.
+
+    Returns:
+        tuple: (edges (P x bins+1), counts (P x bins)) as np.ndarrays
+    """
+    num_portfolios = len(pnl)
+    low = pnl.min(axis=1)
+    high = pnl.max(axis=1)
+    width = np.where(high > low, (high - low) / bins, 1.0)
+    edges = low[:, None] + width[:, None] * np.arange(bins + 1)
+
+    # Bin of every value, offset per portfolio so one bincount covers all
+    bin_index = np.clip(((pnl - low[:, None]) / width[:, None]).astype(np.int64), 0, bins - 1)
+    offsets = bin_index + np.arange(num_portfolios)[:, None] * bins
+    counts = np.bincount(offsets.ravel(), minlength=num_portfolios * bins).reshape(num_portfolios, bins)
+    return edges, counts
+
+
+def _scenario_entry(scenarios, row, spec_names, value):
+    """Describe one scenario: label, P&L and the shocks it specifies."""
+    factor_names, ticker_names = spec_names
+    factor_shocks = {
+        factor_names[index]: float(shock)
+        for index, shock in enumerate(scenarios['factor_shocks'][row]) if not np.isnan(shock)
+    }
+    shocks = {
+        ticker_names[column]: float(shock)
+        for column, shock in zip(scenarios['asset_columns'], scenarios['asset_shocks'][row]) if not np.isnan(shock)
+    }
+    return {'name': scenarios['labels'][row], 'pnl': float(value), 'shocks': shocks,
+            'factor_shocks': factor_shocks}
+
+
+def run_scenario_analysis(prices_df, weights_matrix, spec, factor_prices=None, top_n=DEFAULT_TOP_N,
+                          loss_threshold=None):
+    """
+    Apply hypothetical shock scenarios to one or many portfolios.
+
+    Args:
+        prices_df (pd.DataFrame): Portfolio asset prices (columns = tickers)
+        weights_matrix (array-like): Portfolio weights in percent (P x K)
+        spec (dict): Output of validate_scenario_spec
+        factor_prices (pd.DataFrame, optional): Prices of the factor proxies,
+            on the same dates as prices_df (required if spec has factors)
+        top_n (int): Worst scenarios (and mildest breaches) listed per portfolio
+        loss_threshold (float, optional): Loss (e.g. 0.2 = 20%) for the
+            reverse stress test
+
+    Returns:
+        dict: Factor betas, the named scenarios' P&L and, per portfolio, the
+            P&L distribution, worst scenarios and reverse stress results
+    """
+    tickers = list(prices_df.columns)
+    factors = spec['factors']
+    weights_decimal = np.atleast_2d(np.asarray(weights_matrix, dtype=float)) / 100.0
+    logger.info(f"Running {spec['scenario_count']} scenarios for {len(weights_decimal)} portfolios")
+
+    # Factor betas from daily returns over the requested period
+    betas = np.zeros((0, len(tickers)))
+    r_squared = None
+    if factors:
+        prices = prices_df.to_numpy(dtype=float)
+        proxies = factor_prices[factors].to_numpy(dtype=float)
+        betas, r_squared = estimate_factor_betas(prices[1:] / prices[:-1] - 1, proxies[1:] / proxies[:-1] - 1)
+        betas = np.nan_to_num(betas)
+
+    scenarios = build_scenarios(spec)
+    pnl = scenario_pnl(scenarios, betas, weights_decimal)
+    names = (factors, tickers)
+
+    # Distribution of each portfolio's P&L across scenarios (row-wise)
+    num_portfolios, num_scenarios = pnl.shape
+    percentiles = np.percentile(pnl, PNL_PERCENTILES, axis=1)
+    edges, counts = pnl_histograms(pnl)
+    top_n = min(top_n, num_scenarios)
+    worst = np.argpartition(pnl, top_n - 1, axis=1)[:, :top_n] if top_n else np.empty((num_portfolios, 0), int)
+
+    # Reverse stress test: how often the loss is breached, and the breaching
+    # scenarios with the smallest shocks (the most plausible ones)
+    shock_size = None
+    if loss_threshold is not None:
+        shock_size = np.sqrt(np.nansum(scenarios['factor_shocks'] ** 2, axis=1) +
+                             np.nansum(scenarios['asset_shocks'] ** 2, axis=1))
+        breaches = pnl <= -loss_threshold
+
+    portfolios = []
+    for p in range(num_portfolios):
+        portfolio_pnl = pnl[p]
+        rows = worst[p][np.argsort(portfolio_pnl[worst[p]])]
+        portfolio = {
+            'distribution': {
+                'mean': float(portfolio_pnl.mean()),
+                'std': float(portfolio_pnl.std()),
+                'min': float(portfolio_pnl.min()),
+                'max': float(portfolio_pnl.max()),
+                'probability_of_loss': float((portfolio_pnl < 0).mean()),
+                'percentiles': {str(q): float(v) for q, v in zip(PNL_PERCENTILES, percentiles[:, p])},
+                'histogram': {'edges': edges[p].tolist(), 'counts': counts[p].tolist()}
+            },
+            'worst_scenarios': [_scenario_entry(scenarios, row, names, portfolio_pnl[row]) for row in rows],
+            'reverse_stress': None
+        }
+
+        if loss_threshold is not None:
+            breach_rows = np.flatnonzero(breaches[p])
+            mildest = breach_rows[np.argsort(shock_size[breach_rows], kind='stable')[:top_n]]
+            portfolio['reverse_stress'] = {
+                'loss_threshold': loss_threshold,
+                'breach_count': int(len(breach_rows)),
+                'breach_probability': float(len(breach_rows) / num_scenarios),
+                'mildest_breaches': [
+                    {**_scenario_entry(scenarios, row, names, portfolio_pnl[row]), 'shock_size': float(shock_size[row])}
+                    for row in mildest
+                ]
+            }
+        portfolios.append(portfolio)
+
+    # Named scenarios are reported in full
+    named = [
+        {**_scenario_entry(scenarios, row, names, 0.0), 'pnl': pnl[:, row].tolist()}
+        for row in range(len(spec['scenarios']))
+    ]
+
+    return {
+        'tickers': tickers,
+        'factors': factors,
+        'betas': {
+            ticker: {factor: float(betas[f, k]) for f, factor in enumerate(factors)}
+            for k, ticker in enumerate(tickers)
+        } if factors else None,
+        'r_squared': {
+            ticker: float(r_squared[k]) if np.isfinite(r_squared[k]) else None
+            for k, ticker in enumerate(tickers)
+        } if factors else None,
+        'scenario_count': num_scenarios,
+        'portfolio_count': num_portfolios,
+        'scenarios': named,
+        'portfolios': portfolios
+    }
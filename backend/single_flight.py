@@ -0,0 +1,127 @@
+import threading
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """A single in-flight call that other threads can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls for the same key within one process.
+
+    While a call for a key is running, any other thread asking for the same key
+    waits for it and receives the same result (or exception) instead of starting
+    its own call. Nothing is cached once the call finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """
+        Run ``fn()`` for ``key`` unless a call for the same key is in flight.
+
+        Args:
+            key (hashable): Identity of the call
+            fn (callable): Function to run when this thread owns the key
+
+        Returns:
+            The result of ``fn()``, possibly computed by another thread
+        """
+        return self.do_many([key], lambda owned: {key: fn()})[key]
+
+    def do_many(self, keys, fn):
+        """
+        Run one batched call for every key that is not already in flight.
+
+        Keys already owned by another thread are waited on; the remaining keys
+        are claimed and passed to a single ``fn(owned_keys)`` call, which must
+        return a dict mapping each owned key to its result.
+
+        Args:
+            keys (list): Hashable keys needed by the caller
+            fn (callable): ``fn(owned_keys) -> {key: result}``
+
+        Returns:
+            dict: Result for every requested key
+
+        Raises:
+            Exception: Whatever ``fn`` raised, for owned or waited-on keys
+        """
+        owned = []
+        waiting = {}
+
+        # Claim free keys and remember the calls we have to wait for
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                call = self._calls.get(key)
+                if call is None:
+                    call = _Call()
+                    self._calls[key] = call
+                    owned.append(key)
+                else:
+                    waiting[key] = call
+            if owned:
+                self.calls += 1
+            self.shared += len(waiting)
+
+        results = {}
+
+        if owned:
+            error = None
+            try:
+                batch_results = fn(owned)
+            except Exception as e:
+                error = e
+                batch_results = {}
+
+            # Publish results (or the error) to anyone waiting on our keys
+            with self._lock:
+                for key in owned:
+                    call = self._calls.pop(key)
+                    call.error = error
+                    call.result = batch_results.get(key)
+                    call.done.set()
+
+            if error is not None:
+                raise error
+
+            for key in owned:
+                results[key] = batch_results.get(key)
+
+        if waiting:
+            logger.info(f"Waiting on {len(waiting)} in-flight downloads started by other requests")
+
+        for key, call in waiting.items():
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            results[key] = call.result
+
+        return results
+
+    def stats(self):
+        """
+        Return call counters.
+
+        Returns:
+            dict: Number of calls made and number of keys served by another call
+        """
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'shared': self.shared,
+                'in_flight': len(self._calls)
+            }
@@ -0,0 +1,589 @@
+import numpy as np
+from statistics import NormalDist
+
+import pandas as pd
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Lower-tail probabilities tracked for historical VaR (95% and 99% confidence)
+VAR_TAILS = (0.05, 0.01)
+
+
+class RunningMoments:
+    """
+    Running mean and variance of a scalar series (Welford's algorithm).
+
+    Each update is O(1) and numerically stable, unlike summing x and x².
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value):
+        """Add one observation."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def variance(self, ddof=1):
+        """Variance of the observations so far (NaN if too few)."""
+        if self.count - ddof <= 0:
+            return float('nan')
+        return self.m2 / (self.count - ddof)
+
+    def std(self, ddof=1):
+        """Standard deviation of the observations so far (NaN if too few)."""
+        return float(np.sqrt(self.variance(ddof)))
+
+    @classmethod
+    def from_values(cls, values):
+        """Build the state for a whole array at once."""
+        moments = cls()
+        values = np.asarray(values, dtype=float)
+        moments.count = len(values)
+        if len(values):
+            moments.mean = float(values.mean())
+            moments.m2 = float(((values - moments.mean) ** 2).sum())
+        return moments
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+    @classmethod
+    def from_dict(cls, state):
+        moments = cls()
+        moments.count = int(state['count'])
+        moments.mean = float(state['mean'])
+        moments.m2 = float(state['m2'])
+        return moments
+
+
+class RunningCovariance:
+    """
+    Running mean vector and covariance matrix of a vector series.
+
+    Welford's update generalized to K dimensions: the co-moment matrix gets an
+    outer product per observation, so each update is O(K²).
+    """
+
+    def __init__(self, size):
+        self.count = 0
+        self.mean = np.zeros(size)
+        self.comoment = np.zeros((size, size))
+
+    def update(self, values):
+        """Add one observation vector."""
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.comoment += np.outer(delta, values - self.mean)
+
+    def covariance(self, ddof=1):
+        """Covariance matrix of the observations so far (NaN if too few)."""
+        if self.count - ddof <= 0:
+            return np.full_like(self.comoment, np.nan)
+        return self.comoment / (self.count - ddof)
+
+    def correlation(self):
+        """Correlation matrix of the observations so far."""
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = self.comoment / np.outer(std, std)
+        np.fill_diagonal(correlation, 1.0)
+        return correlation
+
+    @classmethod
+    def from_values(cls, values):
+        """Build the state for a whole T x K array at once."""
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        covariance = cls(values.shape[1])
+        covariance.count = len(values)
+        if len(values):
+            covariance.mean = values.mean(axis=0)
+            deviation = values - covariance.mean
+            covariance.comoment = deviation.T @ deviation
+        return covariance
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean.tolist(), 'comoment': self.comoment.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        mean = np.array(state['mean'], dtype=float)
+        covariance = cls(len(mean))
+        covariance.count = int(state['count'])
+        covariance.mean = mean
+        covariance.comoment = np.array(state['comoment'], dtype=float).reshape(len(mean), len(mean))
+        return covariance
+
+
+class DrawdownTracker:
+    """Cumulative value, running peak and current/maximum drawdown."""
+
+    def __init__(self):
+        self.value = 1.0
+        # No peak until the first return: the peak is taken over values after
+        # each return, as in calculate_max_drawdown
+        self.peak = None
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+
+    def update(self, daily_return):
+        """Compound one daily return into the value and update the drawdowns."""
+        self.value *= 1 + daily_return
+        self.peak = self.value if self.peak is None else max(self.peak, self.value)
+        self.drawdown = (self.value - self.peak) / self.peak
+        self.max_drawdown = max(self.max_drawdown, -self.drawdown)
+
+    @classmethod
+    def from_returns(cls, returns):
+        """Build the state for a whole array of returns at once."""
+        tracker = cls()
+        if len(returns):
+            cumulative = np.cumprod(1 + np.asarray(returns, dtype=float))
+            running_max = np.maximum.accumulate(cumulative)
+            drawdown = (cumulative - running_max) / running_max
+            tracker.value = float(cumulative[-1])
+            tracker.peak = float(running_max[-1])
+            tracker.drawdown = float(drawdown[-1])
+            tracker.max_drawdown = float(-drawdown.min())
+        return tracker
+
+    def to_dict(self):
+        return {
+            'value': self.value,
+            'peak': self.peak,
+            'drawdown': self.drawdown,
+            'max_drawdown': self.max_drawdown
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        tracker = cls()
+        tracker.value = float(state['value'])
+        tracker.peak = None if state['peak'] is None else float(state['peak'])
+        tracker.drawdown = float(state['drawdown'])
+        tracker.max_drawdown = float(state['max_drawdown'])
+        return tracker
+
+
+class RollingWindow:
+    """
+    Fixed-size ring buffer of the latest returns for rolling volatility.
+
+    Appends overwrite the oldest slot in place, so memory stays at ``window``
+    floats and each append is O(1); the standard deviation is O(window).
+    """
+
+    def __init__(self, window):
+        self.window = int(window)
+        self.buffer = np.zeros(self.window)
+        self.count = 0
+        self.position = 0
+
+    def append(self, value):
+        """Add one value, dropping the oldest once the window is full."""
+        self.buffer[self.position] = value
+        self.position = (self.position + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+
+    def values(self):
+        """Values currently in the window, oldest first."""
+        if self.count < self.window:
+            return self.buffer[:self.count].copy()
+        return np.roll(self.buffer, -self.position)
+
+    def std(self, ddof=1):
+        """Standard deviation of a full window (NaN until the window fills)."""
+        if self.count < self.window:
+            return float('nan')
+        return float(self.buffer.std(ddof=ddof))
+
+    @classmethod
+    def from_values(cls, window, values):
+        """Build the window from the tail of an array."""
+        rolling = cls(window)
+        for value in np.asarray(values, dtype=float)[-rolling.window:]:
+            rolling.append(value)
+        return rolling
+
+    def to_dict(self):
+        return {'window': self.window, 'values': self.values().tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls.from_values(state['window'], state['values'])
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate with the P² algorithm (Jain & Chlamtac, 1985).
+
+    Five markers track the minimum, p/2, p, (1+p)/2 quantiles and the maximum;
+    each observation moves the marker positions and adjusts heights with a
+    piecewise-parabolic fit. State is constant size and updates are O(1). The
+    estimate is approximate, but close to the sample quantile for the
+    thousands of daily returns a portfolio history holds.
+    """
+
+    def __init__(self, p):
+        self.p = float(p)
+        self.heights = []
+        self.positions = np.arange(1.0, 6.0)
+        self.desired = np.array([1.0, 1 + 2 * self.p, 1 + 4 * self.p, 3 + 2 * self.p, 5.0])
+        self.increments = np.array([0.0, self.p / 2, self.p, (1 + self.p) / 2, 1.0])
+
+    @property
+    def count(self):
+        if len(self.heights) < 5:
+            return len(self.heights)
+        return int(self.positions[4])
+
+    def update(self, value):
+        """Add one observation."""
+        # The first five observations are kept exactly and become the markers
+        if len(self.heights) < 5:
+            self.heights.append(float(value))
+            if len(self.heights) == 5:
+                self.heights.sort()
+                self.heights = np.array(self.heights)
+            return
+
+        heights = self.heights
+        positions = self.positions
+
+        # Find the cell containing the value, widening the extremes if needed
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = int(np.searchsorted(heights, value, side='right')) - 1
+
+        positions[cell + 1:] += 1
+        self.desired += self.increments
+
+        # Move the three middle markers towards their desired positions
+        for i in (1, 2, 3):
+            offset = self.desired[i] - positions[i]
+            if ((offset >= 1 and positions[i + 1] - positions[i] > 1)
+                    or (offset <= -1 and positions[i - 1] - positions[i] < -1)):
+                step = 1.0 if offset > 0 else -1.0
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, step)
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i, step):
+        h, n = self.heights, self.positions
+        return h[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i, step):
+        j = i + int(step)
+        h, n = self.heights, self.positions
+        return h[i] + step * (h[j] - h[i]) / (n[j] - n[i])
+
+    def value(self):
+        """Current quantile estimate (NaN with no observations)."""
+        if len(self.heights) == 0:
+            return float('nan')
+        if len(self.heights) < 5:
+            return float(np.percentile(self.heights, self.p * 100))
+        return float(self.heights[2])
+
+    @classmethod
+    def from_values(cls, p, values):
+        """
+        Seed the markers from a whole sample.
+
+        Marker heights are set to the exact sample quantiles at their desired
+        positions, so the estimate starts equal to np.percentile and only
+        later appends are approximate.
+        """
+        sketch = cls(p)
+        values = np.asarray(values, dtype=float)
+        if len(values) < 5:
+            for value in values:
+                sketch.update(value)
+            return sketch
+
+        n = len(values)
+        quantiles = np.array([0.0, sketch.p / 2, sketch.p, (1 + sketch.p) / 2, 1.0])
+        sketch.heights = np.percentile(values, quantiles * 100)
+        sketch.desired = 1 + (n - 1) * quantiles
+        # Marker positions are integers; nudge them so they stay strictly increasing
+        positions = np.round(sketch.desired)
+        for i in (1, 2, 3):
+            positions[i] = min(max(positions[i], positions[i - 1] + 1), n - (4 - i))
+        sketch.positions = positions
+        return sketch
+
+    def to_dict(self):
+        return {
+            'p': self.p,
+            'heights': list(map(float, self.heights)),
+            'positions': self.positions.tolist(),
+            'desired': self.desired.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state['p'])
+        heights = [float(h) for h in state['heights']]
+        sketch.heights = np.array(heights) if len(heights) == 5 else heights
+        sketch.positions = np.array(state['positions'], dtype=float)
+        sketch.desired = np.array(state['desired'], dtype=float)
+        return sketch
+
+
+class StreamingMetrics:
+    """
+    Incrementally updated risk metrics for a fixed-weight portfolio.
+
+    Seed the engine from the price history with ``from_prices`` and then call
+    ``append`` once per new trading day. Each append costs O(K²) for the asset
+    covariance (O(K) without it) instead of recomputing every metric over the
+    full history, and ``metrics`` reads the headline numbers from the state.
+    Results match calculate_all_metrics within floating-point tolerance,
+    except historical VaR, which comes from a P² quantile sketch and is
+    approximate after the seed. ``to_dict``/``from_dict`` persist the state
+    between runs (e.g. for a nightly job).
+    """
+
+    def __init__(self, tickers, weights, rolling_window=30, risk_free_rate=0.04):
+        """
+        Create an empty engine.
+
+        Args:
+            tickers (list): Asset tickers (order of the price vectors)
+            weights (list): Portfolio weights (sum to 100)
+            rolling_window (int): Rolling volatility window in days (default: 30)
+            risk_free_rate (float): Annual risk-free rate (default: 4% = 0.04)
+        """
+        self.tickers = list(tickers)
+        self.weights = np.asarray(weights, dtype=float) / 100.0
+        self.rolling_window = int(rolling_window)
+        self.risk_free_rate = float(risk_free_rate)
+
+        self.last_date = None
+        self.last_prices = None
+        self.last_benchmark_price = None
+
+        self.returns = RunningMoments()
+        self.asset_covariance = RunningCovariance(len(self.tickers))
+        # Portfolio and benchmark returns on the days both exist, for beta
+        self.benchmark_covariance = RunningCovariance(2)
+        self.drawdown = DrawdownTracker()
+        self.rolling = RollingWindow(self.rolling_window)
+        self.quantiles = {p: P2Quantile(p) for p in VAR_TAILS}
+
+    @classmethod
+    def from_prices(cls, prices_df, weights, benchmark_prices=None, rolling_window=30, risk_free_rate=0.04):
+        """
+        Seed the engine from a price history in one vectorized pass.
+
+        Args:
+            prices_df (pd.DataFrame): DataFrame with asset prices (columns = tickers)
+            weights (list): Portfolio weights (sum to 100)
+            benchmark_prices (pd.Series, optional): Benchmark prices for beta calculation
+            rolling_window (int): Rolling volatility window in days
+            risk_free_rate (float): Annual risk-free rate
+
+        Returns:
+            StreamingMetrics: Engine whose state covers the whole history
+        """
+        engine = cls(prices_df.columns, weights, rolling_window, risk_free_rate)
+
+        if prices_df.empty:
+            return engine
+
+        # Same returns as the batch functions: rows with gaps are dropped
+        asset_returns = prices_df.pct_change().dropna()
+        returns = asset_returns.to_numpy(dtype=float)
+        portfolio_returns = returns @ engine.weights
+
+        engine.returns = RunningMoments.from_values(portfolio_returns)
+        engine.asset_covariance = RunningCovariance.from_values(returns)
+        engine.drawdown = DrawdownTracker.from_returns(portfolio_returns)
+        engine.rolling = RollingWindow.from_values(engine.rolling_window, portfolio_returns)
+        engine.quantiles = {p: P2Quantile.from_values(p, portfolio_returns) for p in VAR_TAILS}
+
+        if benchmark_prices is not None:
+            benchmark_prices = benchmark_prices.dropna()
+            benchmark_returns = benchmark_prices.pct_change().reindex(asset_returns.index).to_numpy(dtype=float)
+            valid = ~np.isnan(benchmark_returns)
+            engine.benchmark_covariance = RunningCovariance.from_values(
+                np.column_stack([portfolio_returns[valid], benchmark_returns[valid]])
+            )
+            if len(benchmark_prices):
+                engine.last_benchmark_price = float(benchmark_prices.iloc[-1])
+
+        engine.last_date = str(prices_df.index[-1].date())
+        engine.last_prices = prices_df.iloc[-1].to_numpy(dtype=float)
+        return engine
+
+    def append(self, date, prices, benchmark_price=None):
+        """
+        Add one trading day.
+
+        A day with a missing asset price produces no return, and neither does
+        the day after it, matching ``pct_change().dropna()`` in the batch
+        functions.
+
+        Args:
+            date (str): Trading date in YYYY-MM-DD format (after the last one)
+            prices (array-like): Close price per ticker, in ticker order
+            benchmark_price (float, optional): Benchmark close on that date
+
+        Returns:
+            float: The day's portfolio return, or None if it has none
+
+        Raises:
+            ValueError: If the date is not after the last one or the prices
+                do not match the tickers
+        """
+        date = str(pd.Timestamp(date).date())
+        if self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"Date {date} is not after the last date {self.last_date}")
+
+        prices = np.asarray(prices, dtype=float)
+        if prices.shape != (len(self.tickers),):
+            raise ValueError(f"Expected {len(self.tickers)} prices, got {prices.size}")
+
+        previous_prices = self.last_prices
+        previous_benchmark = self.last_benchmark_price
+        self.last_date = date
+        self.last_prices = prices
+
+        # Benchmark returns use the benchmark's own previous close
+        benchmark_return = None
+        if benchmark_price is not None and not np.isnan(benchmark_price):
+            if previous_benchmark is not None:
+                benchmark_return = benchmark_price / previous_benchmark - 1
+            self.last_benchmark_price = float(benchmark_price)
+
+        if previous_prices is None:
+            return None
+
+        asset_returns = prices / previous_prices - 1
+        if np.isnan(asset_returns).any():
+            return None
+
+        portfolio_return = float(asset_returns @ self.weights)
+
+        self.returns.update(portfolio_return)
+        self.asset_covariance.update(asset_returns)
+        self.drawdown.update(portfolio_return)
+        self.rolling.append(portfolio_return)
+        for sketch in self.quantiles.values():
+            sketch.update(portfolio_return)
+
+        if benchmark_return is not None:
+            self.benchmark_covariance.update(np.array([portfolio_return, benchmark_return]))
+
+        return portfolio_return
+
+    def metrics(self):
+        """
+        Headline metrics from the current state.
+
+        Returns:
+            dict: Same keys and units as the scalar metrics of
+                calculate_all_metrics, plus the current drawdown, the latest
+                rolling volatility and the number of returns seen
+        """
+        daily_volatility = self.returns.std()
+        annual_volatility = daily_volatility * np.sqrt(252)
+        annual_return = self.returns.mean * 252
+
+        var = {'daily': {}, 'annual': {}}
+        for p in VAR_TAILS:
+            label = f"{(1 - p) * 100:g}"
+            historical = -self.quantiles[p].value()
+            parametric = -(self.returns.mean + daily_volatility * NormalDist().inv_cdf(p))
+            var['daily'][f"historical_{label}"] = historical
+            var['daily'][f"parametric_{label}"] = parametric
+            var['annual'][f"historical_{label}"] = historical * np.sqrt(252)
+            var['annual'][f"parametric_{label}"] = parametric * np.sqrt(252)
+
+        beta = None
+        if self.benchmark_covariance.count > 1:
+            covariance = self.benchmark_covariance.covariance()
+            beta = float(covariance[0, 1] / covariance[1, 1])
+
+        # Symmetric, so each row is also the column pandas' to_dict would give
+        correlation = self.asset_covariance.correlation().tolist()
+        correlation_matrix = {ticker: dict(zip(self.tickers, row)) for ticker, row in zip(self.tickers, correlation)}
+
+        return {
+            'date': self.last_date,
+            'observations': self.returns.count,
+            'annual_return': annual_return,
+            'daily_volatility': daily_volatility,
+            'annual_volatility': annual_volatility,
+            'sharpe_ratio': (annual_return - self.risk_free_rate) / annual_volatility,
+            'max_drawdown': self.drawdown.max_drawdown,
+            'current_drawdown': self.drawdown.drawdown,
+            'rolling_volatility': self.rolling.std() * np.sqrt(252),
+            'var': var,
+            'beta': beta,
+            'correlation_matrix': correlation_matrix
+        }
+
+    def to_dict(self):
+        """
+        Serialize the state to plain JSON-compatible types.
+
+        Returns:
+            dict: State that from_dict restores
+        """
+        return {
+            'tickers': self.tickers,
+            'weights': (self.weights * 100).tolist(),
+            'rolling_window': self.rolling_window,
+            'risk_free_rate': self.risk_free_rate,
+            'last_date': self.last_date,
+            'last_prices': None if self.last_prices is None else self.last_prices.tolist(),
+            'last_benchmark_price': self.last_benchmark_price,
+            'returns': self.returns.to_dict(),
+            'asset_covariance': self.asset_covariance.to_dict(),
+            'benchmark_covariance': self.benchmark_covariance.to_dict(),
+            'drawdown': self.drawdown.to_dict(),
+            'rolling': self.rolling.to_dict(),
+            'quantiles': [sketch.to_dict() for sketch in self.quantiles.values()]
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Restore an engine saved with to_dict.
+
+        Args:
+            state (dict): Serialized state
+
+        Returns:
+            StreamingMetrics: Engine ready for further appends
+        """
+        engine = cls(state['tickers'], state['weights'], state['rolling_window'], state['risk_free_rate'])
+        engine.last_date = state['last_date']
+        if state['last_prices'] is not None:
+            engine.last_prices = np.array(state['last_prices'], dtype=float)
+        engine.last_benchmark_price = state['last_benchmark_price']
+        engine.returns = RunningMoments.from_dict(state['returns'])
+        engine.asset_covariance = RunningCovariance.from_dict(state['asset_covariance'])
+        engine.benchmark_covariance = RunningCovariance.from_dict(state['benchmark_covariance'])
+        engine.drawdown = DrawdownTracker.from_dict(state['drawdown'])
+        engine.rolling = RollingWindow.from_dict(state['rolling'])
+        engine.quantiles = {sketch['p']: P2Quantile.from_dict(sketch) for sketch in state['quantiles']}
+        return engine
@@ -1,25 +1,88 @@
+import json
+import os
+from datetime import datetime
+
 import numpy as np
-import pandas as pd
 import logging
+from portfolio_context import PortfolioContext
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Define historical crisis periods
-CRISIS_PERIODS = {
-    'covid_crash': {
-        'name': 'COVID-19 Market Crash',
-        'start_date': '2020-02-20',
-        'end_date': '2020-03-23',
-        'description': 'Market crash during COVID-19 pandemic onset'
-    },
-    '2022_downturn': {
-        'name': '2022 Market Downturn',
-        'start_date': '2022-01-01',
-        'end_date': '2022-10-12',
-        'description': 'Market decline due to inflation and rate hikes'
-    }
-}
+# Historical crisis periods: crisis_periods.json next to this module, or the
+# JSON file named by STRESS_PERIODS_FILE ({id: {name, start_date, end_date,
+# description}})
+DEFAULT_PERIODS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crisis_periods.json')
+
+# Upper bound on elements of the padded (windows x days x assets) price block
+# evaluated at once; larger requests are split into several blocks
+STRESS_BLOCK_ELEMENTS = 1 << 23
+
+
+def validate_crisis_periods(periods):
+    """
+    Check and normalize crisis period definitions.
+
+    Args:
+        periods (dict or list): {id: {name, start_date, end_date, description}}
+            or a list of such dicts (each with an optional 'id')
+
+    Returns:
+        dict: Crisis periods by id
+
+    Raises:
+        ValueError: If a period is missing fields or has invalid dates
+    """
+    if isinstance(periods, list):
+        periods = {
+            str(period.get('id') or f"period_{i + 1}") if isinstance(period, dict) else str(i): period
+            for i, period in enumerate(periods)
+        }
+    if not isinstance(periods, dict) or not periods:
+        raise ValueError('Crisis periods must be a non-empty list or object')
+
+    validated = {}
+    for period_id, period in periods.items():
+        if not isinstance(period, dict):
+            raise ValueError(f"Crisis period {period_id} must be an object")
+        try:
+            start = datetime.strptime(period['start_date'], '%Y-%m-%d')
+            end = datetime.strptime(period['end_date'], '%Y-%m-%d')
+        except KeyError:
+            raise ValueError(f"Crisis period {period_id} needs start_date and end_date")
+        except (ValueError, TypeError):
+            raise ValueError(f"Crisis period {period_id} dates must be in YYYY-MM-DD format")
+        if end < start:
+            raise ValueError(f"Crisis period {period_id} ends before it starts")
+
+        validated[period_id] = {
+            'name': str(period.get('name') or period_id),
+            'start_date': period['start_date'],
+            'end_date': period['end_date'],
+            'description': str(period.get('description', ''))
+        }
+    return validated
+
+
+def load_crisis_periods(path=None):
+    """
+    Load crisis periods from a JSON file.
+
+    Args:
+        path (str, optional): File to read (default: STRESS_PERIODS_FILE or
+            crisis_periods.json next to this module)
+
+    Returns:
+        dict: Crisis periods by id
+    """
+    path = path or os.environ.get('STRESS_PERIODS_FILE') or DEFAULT_PERIODS_FILE
+    with open(path) as f:
+        periods = validate_crisis_periods(json.load(f))
+    logger.info(f"Loaded {len(periods)} crisis periods from {path}")
+    return periods
+
+
+CRISIS_PERIODS = load_crisis_periods()
 
 
 def calculate_portfolio_value(prices_df, weights):
@@ -45,7 +108,128 @@ def calculate_portfolio_value(prices_df, weights):
     return portfolio_value
 
 
-def calculate_stress_period_metrics(prices_df, weights, start_date, end_date, period_name):
+def stress_window_metrics(context, weights_matrix, periods, block_elements=STRESS_BLOCK_ELEMENTS):
+    """
+    Evaluate many stress windows for many portfolios in one vectorized pass.
+
+    All window bounds are found with one searchsorted per side on the
+    precomputed date index. Each window's prices are gathered into a padded
+    (windows x days x assets) block, and the buy-and-hold values of every
+    (window, portfolio) pair come from one batched matrix multiply with the
+    weights scaled by each asset's price at the window start. Returns, worst
+    days and drawdowns are then reduced along the day axis, with the padding
+    masked out; nothing loops over windows or portfolios in Python.
+
+    Args:
+        context (PortfolioContext): Prepared price arrays
+        weights_matrix (np.ndarray): Portfolio weights as decimals (P x K)
+        periods (list): Crisis period dicts with start_date and end_date
+        block_elements (int): Padded price elements evaluated at once
+
+    Returns:
+        dict: Arrays of shape (W, P): start_value, end_value, total_return,
+            worst_day_return, worst_day_row, max_drawdown; and of shape (W,):
+            lo, hi (price rows, hi exclusive) and valid (at least two days)
+    """
+    weights_matrix = np.atleast_2d(np.asarray(weights_matrix, dtype=float))
+    num_periods = len(periods)
+    num_portfolios, num_assets = weights_matrix.shape
+
+    # Rows of every window on the precomputed date index
+    lo, hi = context.date_ranges_rows([p['start_date'] for p in periods], [p['end_date'] for p in periods])
+    lengths = hi - lo
+    valid = lengths >= 2
+
+    result = {
+        name: np.full((num_periods, num_portfolios), np.nan)
+        for name in ('start_value', 'end_value', 'total_return', 'worst_day_return', 'max_drawdown')
+    }
+    result['worst_day_row'] = np.full((num_periods, num_portfolios), -1, dtype=np.int64)
+
+    # Group windows into blocks whose padded price arrays fit the budget
+    blocks = []
+    block = []
+    for i in np.flatnonzero(valid):
+        candidate = block + [i]
+        if block and len(candidate) * lengths[candidate].max() * (num_assets + num_portfolios) > block_elements:
+            blocks.append(block)
+            candidate = [i]
+        block = candidate
+    if block:
+        blocks.append(block)
+
+    for block in blocks:
+        block = np.asarray(block)
+        block_lengths = lengths[block]
+        days = np.arange(block_lengths.max())
+        inside = days < block_lengths[:, None]
+
+        # Padded price rows of each window (padding repeats the last row)
+        rows = lo[block, None] + np.minimum(days, block_lengths[:, None] - 1)
+        window_prices = context.filled_prices[rows]
+
+        # Weights scaled so each asset starts at 100 x its weight; assets
+        # without a price at the window start contribute nothing
+        start_prices = context.prices[lo[block]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where(np.isnan(start_prices), 0.0, 100.0 / start_prices)
+        column_weights = scale[:, :, None] * weights_matrix.T[None, :, :]
+
+        # Buy-and-hold value of every (window, portfolio) in one batched matmul
+        values = window_prices @ column_weights
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            start_value = values[:, 0, :]
+            end_value = values[np.arange(len(block)), block_lengths - 1, :]
+
+            # Worst single-day loss inside each window
+            daily_returns = values[:, 1:, :] / values[:, :-1, :] - 1
+            daily_returns[~inside[:, 1:]] = np.inf
+            worst_day = daily_returns.argmin(axis=1)
+
+            # Maximum drawdown from the running peak inside each window
+            running_max = np.maximum.accumulate(values, axis=1)
+            drawdown = (values - running_max) / running_max
+            drawdown[~inside] = 0.0
+
+            result['start_value'][block] = start_value
+            result['end_value'][block] = end_value
+            result['total_return'][block] = (end_value - start_value) / start_value
+            result['worst_day_return'][block] = np.take_along_axis(daily_returns, worst_day[:, None, :], axis=1)[:, 0, :]
+            result['worst_day_row'][block] = lo[block, None] + 1 + worst_day
+            result['max_drawdown'][block] = np.abs(drawdown.min(axis=1))
+
+    result.update(lo=lo, hi=hi, valid=valid)
+    return result
+
+
+def _period_metrics(context, window_metrics, i, period, portfolio=0):
+    """Stress metrics dict of window i for one portfolio."""
+    start_value = window_metrics['start_value'][i, portfolio]
+    end_value = window_metrics['end_value'][i, portfolio]
+    total_return = window_metrics['total_return'][i, portfolio]
+    worst_day_return = window_metrics['worst_day_return'][i, portfolio]
+    max_drawdown = window_metrics['max_drawdown'][i, portfolio]
+    worst_day_date = context.dates[window_metrics['worst_day_row'][i, portfolio]]
+
+    return {
+        'period_name': period['name'],
+        'start_date': period['start_date'],
+        'end_date': period['end_date'],
+        'start_value': start_value,
+        'end_value': end_value,
+        'total_return': total_return,
+        'total_return_pct': total_return * 100,
+        'worst_day_return': worst_day_return,
+        'worst_day_return_pct': worst_day_return * 100,
+        'worst_day_date': worst_day_date.strftime('%Y-%m-%d'),
+        'max_drawdown': max_drawdown,
+        'max_drawdown_pct': max_drawdown * 100,
+        'trading_days': int(window_metrics['hi'][i] - window_metrics['lo'][i])
+    }
+
+
+def calculate_stress_period_metrics(prices_df, weights, start_date, end_date, period_name, context=None):
     """
     Calculate portfolio performance during a specific stress period.
 
@@ -55,57 +239,26 @@ def calculate_stress_period_metrics(prices_df, weights, start_date, end_date, pe
         start_date (str): Start date of stress period
         end_date (str): End date of stress period
         period_name (str): Name of the stress period
+        context (PortfolioContext, optional): Prepared price arrays; built from
+            the arguments if omitted
 
     Returns:
         dict: Stress test metrics for the period
     """
     try:
-        # Filter data for the stress period
-        stress_data = prices_df[(prices_df.index >= start_date) & (prices_df.index <= end_date)]
+        if context is None:
+            context = PortfolioContext(prices_df, weights)
+
+        period = {'name': period_name, 'start_date': start_date, 'end_date': end_date}
+        window_metrics = stress_window_metrics(context, context.weights, [period])
 
-        if stress_data.empty:
+        if not window_metrics['valid'][0]:
             logger.warning(f"No data available for {period_name} ({start_date} to {end_date})")
             return None
 
-        # Calculate portfolio value over the period
-        portfolio_value = calculate_portfolio_value(stress_data, weights)
-
-        # Calculate daily returns
-        daily_returns = portfolio_value.pct_change().dropna()
-
-        # Get start and end values
-        start_value = portfolio_value.iloc[0]
-        end_value = portfolio_value.iloc[-1]
-
-        # Calculate total return
-        total_return = (end_value - start_value) / start_value
-
-        # Find worst single-day loss
-        worst_day_return = daily_returns.min()
-        worst_day_date = daily_returns.idxmin()
-
-        # Calculate maximum drawdown during period
-        running_max = portfolio_value.expanding().max()
-        drawdown = (portfolio_value - running_max) / running_max
-        max_drawdown = abs(drawdown.min())
-
-        metrics = {
-            'period_name': period_name,
-            'start_date': start_date,
-            'end_date': end_date,
-            'start_value': start_value,
-            'end_value': end_value,
-            'total_return': total_return,
-            'total_return_pct': total_return * 100,
-            'worst_day_return': worst_day_return,
-            'worst_day_return_pct': worst_day_return * 100,
-            'worst_day_date': worst_day_date.strftime('%Y-%m-%d'),
-            'max_drawdown': max_drawdown,
-            'max_drawdown_pct': max_drawdown * 100,
-            'trading_days': len(stress_data)
-        }
+        metrics = _period_metrics(context, window_metrics, 0, period)
 
-        logger.info(f"Calculated stress metrics for {period_name}: {total_return*100:.2f}% return")
+        logger.info(f"Calculated stress metrics for {period_name}: {metrics['total_return']*100:.2f}% return")
         return metrics
 
     except Exception as e:
@@ -113,70 +266,127 @@ def calculate_stress_period_metrics(prices_df, weights, start_date, end_date, pe
         return None
 
 
-def find_worst_day_overall(prices_df, weights):
+def find_worst_day_overall(prices_df, weights, context=None):
     """
     Find the worst single-day loss in the entire dataset.
 
     Args:
         prices_df (pd.DataFrame): Full DataFrame with asset prices
         weights (list): Portfolio weights
+        context (PortfolioContext, optional): Prepared price arrays; built from
+            the arguments if omitted
 
     Returns:
         dict: Information about the worst day
     """
-    # Calculate portfolio value
-    portfolio_value = calculate_portfolio_value(prices_df, weights)
+    if context is None:
+        context = PortfolioContext(prices_df, weights)
+
+    # Portfolio value over the whole dataset (shared with other callers)
+    portfolio_value = context.normalized_value
 
     # Calculate daily returns
-    daily_returns = portfolio_value.pct_change().dropna()
+    daily_returns = portfolio_value[1:] / portfolio_value[:-1] - 1
 
     # Find worst day
-    worst_day_return = daily_returns.min()
-    worst_day_date = daily_returns.idxmin()
+    worst_row = int(np.argmin(daily_returns)) + 1
+    worst_day_return = daily_returns[worst_row - 1]
+    worst_day_date = context.dates[worst_row]
+
+    # Value on the calendar day before, if that day was a trading day
+    value_before = None
+    if context.day_numbers[worst_row - 1] == context.day_numbers[worst_row] - 1:
+        value_before = portfolio_value[worst_row - 1]
 
     return {
         'worst_day_return': worst_day_return,
         'worst_day_return_pct': worst_day_return * 100,
         'worst_day_date': worst_day_date.strftime('%Y-%m-%d'),
-        'portfolio_value_before': portfolio_value.loc[worst_day_date - pd.Timedelta(days=1)] if worst_day_date - pd.Timedelta(days=1) in portfolio_value.index else None,
-        'portfolio_value_after': portfolio_value.loc[worst_day_date]
+        'portfolio_value_before': value_before,
+        'portfolio_value_after': portfolio_value[worst_row]
     }
 
 
-def run_all_stress_tests(prices_df, weights):
+def run_all_stress_tests(prices_df, weights, context=None, periods=None):
     """
-    Run stress tests for all defined crisis periods and find worst day overall.
+    Run stress tests for all crisis periods and find worst day overall.
 
     Args:
         prices_df (pd.DataFrame): Full DataFrame with asset prices
         weights (list): Portfolio weights
+        context (PortfolioContext, optional): Prepared price arrays shared with
+            the risk metrics; built from the arguments if omitted
+        periods (dict, optional): Crisis periods by id (default: CRISIS_PERIODS)
 
     Returns:
         dict: All stress test results
     """
     logger.info("Running stress tests...")
 
+    if context is None:
+        context = PortfolioContext(prices_df, weights)
+    if periods is None:
+        periods = CRISIS_PERIODS
+
     stress_results = {}
 
-    # Test each crisis period
-    for crisis_id, crisis_info in CRISIS_PERIODS.items():
-        metrics = calculate_stress_period_metrics(
-            prices_df,
-            weights,
-            crisis_info['start_date'],
-            crisis_info['end_date'],
-            crisis_info['name']
-        )
-
-        if metrics:
-            stress_results[crisis_id] = {
-                **crisis_info,
-                **metrics
-            }
+    # Evaluate every crisis period at once
+    period_ids = list(periods)
+    window_metrics = stress_window_metrics(context, context.weights, [periods[i] for i in period_ids])
+
+    for i, crisis_id in enumerate(period_ids):
+        crisis_info = periods[crisis_id]
+        if not window_metrics['valid'][i]:
+            # Expected for any range that does not reach back to the crisis,
+            # so this is not worth a warning on every request
+            logger.debug(f"No data available for {crisis_info['name']} "
+                         f"({crisis_info['start_date']} to {crisis_info['end_date']})")
+            continue
+
+        stress_results[crisis_id] = {
+            **crisis_info,
+            **_period_metrics(context, window_metrics, i, crisis_info)
+        }
 
     # Find worst day overall in the entire dataset
-    worst_day = find_worst_day_overall(prices_df, weights)
+    worst_day = find_worst_day_overall(prices_df, weights, context=context)
     stress_results['worst_day_overall'] = worst_day
 
     logger.info(f"Stress tests completed. Tested {len(stress_results)-1} crisis periods")
     return stress_results
+
+
+def run_batch_stress_tests(prices_df, weights_matrix, periods=None):
+    """
+    Run the crisis periods for many portfolios over the same assets.
+
+    Args:
+        prices_df (pd.DataFrame): Full DataFrame with asset prices
+        weights_matrix (array-like): N x K portfolio weights (rows sum to 100)
+        periods (dict, optional): Crisis periods by id (default: CRISIS_PERIODS)
+
+    Returns:
+        dict: Crisis id -> period info plus total_return, worst_day_return and
+            max_drawdown lists with one value per portfolio; periods without
+            data are left out
+    """
+    if periods is None:
+        periods = CRISIS_PERIODS
+
+    weights_decimal = np.asarray(weights_matrix, dtype=float) / 100.0
+    context = PortfolioContext(prices_df, weights_decimal[0] * 100)
+
+    period_ids = list(periods)
+    window_metrics = stress_window_metrics(context, weights_decimal, [periods[i] for i in period_ids])
+
+    return {
+        crisis_id: {
+            **periods[crisis_id],
+            'trading_days': int(window_metrics['hi'][i] - window_metrics['lo'][i]),
+            'total_return': window_metrics['total_return'][i].tolist(),
+            'worst_day_return': window_metrics['worst_day_return'][i].tolist(),
+            'max_drawdown': window_metrics['max_drawdown'][i].tolist()
+        }
+        for i, crisis_id in enumerate(period_ids)
+        if window_metrics['valid'][i]
+    }
@@ -0,0 +1,122 @@
+from statistics import NormalDist
+
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIDENCE_LEVELS = (0.95, 0.99)
+
+# Measures reported per confidence level
+TAIL_MEASURES = ('historical_var', 'expected_shortfall', 'parametric_var', 'parametric_es',
+                 'cornish_fisher_var')
+
+
+def confidence_label(confidence_level):
+    """Key used for a confidence level in results (0.95 -> '95', 0.975 -> '97.5')."""
+    return f"{confidence_level * 100:g}"
+
+
+def calculate_tail_risk(returns, confidence_levels=DEFAULT_CONFIDENCE_LEVELS):
+    """
+    VaR and Expected Shortfall at several confidence levels in one pass.
+
+    One np.partition places every order statistic needed by any level: the
+    two neighbours of each historical quantile (interpolated linearly, as
+    np.percentile does) and the boundary of each level's tail, so each
+    tail mean is a prefix of the partitioned returns. Mean, volatility,
+    skewness and kurtosis come from one set of central moments and give the
+    parametric (normal) VaR and ES and the Cornish-Fisher VaR, which adjusts
+    the normal quantile for skewness and excess kurtosis:
+
+        z_cf = z + (z^2 - 1) S / 6 + (z^3 - 3z) K / 24 - (2z^3 - 5z) S^2 / 36
+
+    A 2-D input is treated as one portfolio per column, so many portfolios
+    are evaluated together.
+
+    Args:
+        returns (array-like): Daily returns, T or T x P (one column per portfolio)
+        confidence_levels (iterable): Confidence levels, e.g. (0.95, 0.99)
+
+    Returns:
+        dict: {
+            'confidence_levels': list,
+            'mean', 'volatility', 'skewness', 'excess_kurtosis': daily values,
+            'historical_var', 'expected_shortfall', 'parametric_var',
+            'parametric_es', 'cornish_fisher_var': {label: loss as a positive number}
+        }
+        Values are floats for 1-D input and arrays of P values for 2-D input.
+
+    Raises:
+        ValueError: If a confidence level is outside (0, 1) or there are
+            fewer than two returns
+    """
+    returns = np.asarray(returns, dtype=float)
+    single = returns.ndim == 1
+    if single:
+        returns = returns[:, None]
+
+    num_days = returns.shape[0]
+    if num_days < 2:
+        raise ValueError("At least two returns are needed for tail risk")
+
+    levels = [float(c) for c in confidence_levels]
+    if not levels or not all(0 < c < 1 for c in levels):
+        raise ValueError("Confidence levels must be between 0 and 1")
+    tails = 1 - np.array(levels)
+
+    # Order statistics for every level from one partial sort: the neighbours
+    # of each quantile position and the last day of each tail
+    positions = tails * (num_days - 1)
+    below = np.floor(positions).astype(int)
+    above = np.minimum(below + 1, num_days - 1)
+    tail_days = np.maximum(np.floor(tails * num_days).astype(int), 1)
+    ordered = np.partition(returns, np.unique(np.concatenate([below, above, tail_days - 1])), axis=0)
+
+    fraction = (positions - below)[:, None]
+    quantiles = ordered[below] + fraction * (ordered[above] - ordered[below])
+
+    # The first tail_days rows hold each tail, so its mean is a prefix sum
+    tail_sums = np.cumsum(ordered[:tail_days.max()], axis=0)
+    expected_shortfall = -tail_sums[tail_days - 1] / tail_days[:, None]
+
+    # Shared moments
+    mean = returns.mean(axis=0)
+    deviations = returns - mean
+    squared = deviations * deviations
+    m2 = squared.mean(axis=0)
+    m3 = (squared * deviations).mean(axis=0)
+    m4 = (squared * squared).mean(axis=0)
+    volatility = np.sqrt(m2 * num_days / (num_days - 1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        skewness = np.where(m2 > 0, m3 / m2 ** 1.5, 0.0)
+        excess_kurtosis = np.where(m2 > 0, m4 / (m2 * m2) - 3.0, 0.0)
+
+    normal = NormalDist()
+    z = np.array([normal.inv_cdf(tail) for tail in tails])[:, None]
+    density = np.array([normal.pdf(normal.inv_cdf(tail)) for tail in tails])[:, None]
+    z_cf = (z + (z ** 2 - 1) * skewness / 6 + (z ** 3 - 3 * z) * excess_kurtosis / 24
+            - (2 * z ** 3 - 5 * z) * skewness ** 2 / 36)
+
+    measures = {
+        'historical_var': -quantiles,
+        'expected_shortfall': expected_shortfall,
+        'parametric_var': -(mean + volatility * z),
+        'parametric_es': -mean + volatility * density / tails[:, None],
+        'cornish_fisher_var': -(mean + volatility * z_cf),
+    }
+
+    def output(values):
+        return float(values[0]) if single else values
+
+    result = {
+        'confidence_levels': levels,
+        'mean': output(mean),
+        'volatility': output(volatility),
+        'skewness': output(skewness),
+        'excess_kurtosis': output(excess_kurtosis),
+    }
+    for name in TAIL_MEASURES:
+        result[name] = {confidence_label(c): output(measures[name][i]) for i, c in enumerate(levels)}
+    return result
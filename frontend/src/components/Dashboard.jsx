@@ -1,33 +1,51 @@
-import { useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { BarChart3, Loader2, Sparkles } from 'lucide-react';
 import PortfolioInput from './PortfolioInput';
 import MetricsCards from './MetricsCards';
 import StressTestResults from './StressTestResults';
+import RiskAttribution from './RiskAttribution';
 import PortfolioValueChart from './charts/PortfolioValueChart';
 import DrawdownChart from './charts/DrawdownChart';
 import RollingVolatilityChart from './charts/RollingVolatilityChart';
 import CorrelationHeatmap from './charts/CorrelationHeatmap';
 import VaRHistogram from './charts/VaRHistogram';
-import { calculateMetrics } from '../services/api';
+import { calculatePortfolioMetrics, isCanceled } from '../services/api';
 
 const Dashboard = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [results, setResults] = useState(null);
+  const [progress, setProgress] = useState(null);
+  const requestRef = useRef(null);
+
+  // Stop waiting (and polling) when the dashboard goes away
+  useEffect(() => () => requestRef.current?.abort(), []);
 
   const handleCalculate = async ({ tickers, weights, startDate, endDate }) => {
+    requestRef.current?.abort();
+    const controller = new AbortController();
+    requestRef.current = controller;
+
     setLoading(true);
     setError(null);
     setResults(null);
+    setProgress(null);
 
     try {
-      const data = await calculateMetrics(tickers, weights, startDate, endDate);
+      // Large requests run as a background job; progress updates each poll
+      const data = await calculatePortfolioMetrics(tickers, weights, startDate, endDate, setProgress,
+                                                   controller.signal);
       setResults(data);
     } catch (err) {
+      if (isCanceled(err)) {
+        return;
+      }
       setError(err.message);
     } finally {
-      setLoading(false);
+      if (requestRef.current === controller) {
+        setLoading(false);
+      }
     }
   };
 
@@ -94,7 +112,17 @@ const Dashboard = () => {
                   <Loader2 className="w-16 h-16 text-cyan-400 animate-spin mx-auto mb-6" />
                   <div className="space-y-2">
                     <h3 className="text-xl font-semibold text-white">Analyzing Portfolio</h3>
-                    <p className="text-gray-400">Calculating risk metrics and visualizations...</p>
+                    <p className="text-gray-400">
+                      {progress?.stage ? `${progress.stage}...` : 'Calculating risk metrics and visualizations...'}
+                    </p>
+                    {progress && (
+                      <div className="w-64 h-1.5 bg-white/10 rounded-full mx-auto mt-4 overflow-hidden">
+                        <div
+                          className="h-full bg-cyan-400 transition-all duration-500"
+                          style={{ width: `${Math.round(progress.progress * 100)}%` }}
+                        />
+                      </div>
+                    )}
                   </div>
                 </motion.div>
               )}
@@ -158,6 +186,8 @@ const Dashboard = () => {
                   <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
                     <CorrelationHeatmap
                       correlationMatrix={results.metrics?.correlation_matrix}
+                      correlation={results.metrics?.correlation}
+                      order={results.metrics?.correlation_order}
                       tickers={results.tickers}
                       loading={loading}
                     />
@@ -169,8 +199,19 @@ const Dashboard = () => {
                     />
                   </div>
 
+                  <RiskAttribution
+                    attribution={results.metrics?.risk_attribution}
+                    loading={loading}
+                  />
+
                   <StressTestResults
-                    stressTests={results.stress_test_periods}
+                    stressTests={Object.entries(results.stress_tests || {})
+                      .filter(([id]) => id !== 'worst_day_overall')
+                      .map(([, test]) => ({
+                        ...test,
+                        portfolio_return: test.total_return,
+                        worst_day_loss: test.worst_day_return
+                      }))}
                     loading={loading}
                   />
                 </motion.div>
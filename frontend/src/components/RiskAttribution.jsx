@@ -0,0 +1,86 @@
+import { motion } from 'framer-motion';
+import { PieChart } from 'lucide-react';
+
+// Positions listed, largest contribution first; big portfolios show the top ones
+const MAX_ROWS = 20;
+
+const RiskAttribution = ({ attribution, loading }) => {
+  const var95 = attribution?.var?.['95'];
+  if (!attribution || !var95 || attribution.tickers.length === 0) {
+    return null;
+  }
+
+  const formatPercent = (value) => {
+    if (value === null || value === undefined) return 'N/A';
+    return `${(value * 100).toFixed(2)}%`;
+  };
+
+  const rows = attribution.tickers
+    .map((ticker, i) => ({
+      ticker,
+      weight: attribution.weights[i],
+      marginal: var95.marginal[i],
+      component: var95.component[i],
+      percent: var95.percent[i],
+      incremental: var95.incremental[i]
+    }))
+    .sort((a, b) => b.component - a.component)
+    .slice(0, MAX_ROWS);
+
+  return (
+    <motion.div
+      initial={{ opacity: 0, y: 20 }}
+      animate={{ opacity: 1, y: 0 }}
+      transition={{ delay: 0.6 }}
+      className="glass-strong rounded-2xl p-6 border border-white/10"
+    >
+      <h3 className="text-xl font-bold text-white mb-2 flex items-center gap-2">
+        <PieChart className="w-6 h-6 text-purple-400" />
+        Risk Attribution
+      </h3>
+      <p className="text-gray-400 text-sm mb-6">
+        Contribution to daily 95% parametric VaR of {formatPercent(var95.total)}
+        {attribution.tickers.length > MAX_ROWS &&
+          ` · top ${MAX_ROWS} of ${attribution.tickers.length} positions`}
+      </p>
+
+      <div className="overflow-x-auto rounded-xl">
+        <table className="min-w-full text-sm">
+          <thead>
+            <tr className="border-b border-white/10">
+              <th className="px-4 py-3 text-left font-bold text-gray-300">Asset</th>
+              <th className="px-4 py-3 text-right font-bold text-gray-300">Weight</th>
+              <th className="px-4 py-3 text-right font-bold text-gray-300">Marginal VaR</th>
+              <th className="px-4 py-3 text-right font-bold text-gray-300">Component VaR</th>
+              <th className="px-4 py-3 text-right font-bold text-gray-300">% of VaR</th>
+              <th className="px-4 py-3 text-right font-bold text-gray-300">Incremental VaR</th>
+            </tr>
+          </thead>
+          <tbody>
+            {rows.map((row, index) => (
+              <motion.tr
+                key={row.ticker}
+                initial={{ opacity: 0, x: -20 }}
+                animate={{ opacity: 1, x: 0 }}
+                transition={{ delay: 0.7 + index * 0.05 }}
+                whileHover={{ backgroundColor: 'rgba(255, 255, 255, 0.05)' }}
+                className="border-b border-white/5 transition-colors"
+              >
+                <td className="px-4 py-3 font-semibold text-white">{row.ticker}</td>
+                <td className="px-4 py-3 text-right text-gray-400">{formatPercent(row.weight)}</td>
+                <td className="px-4 py-3 text-right text-gray-300">{formatPercent(row.marginal)}</td>
+                <td className="px-4 py-3 text-right text-red-400 font-bold">{formatPercent(row.component)}</td>
+                <td className="px-4 py-3 text-right text-purple-300">{formatPercent(row.percent)}</td>
+                <td className={`px-4 py-3 text-right ${row.incremental >= 0 ? 'text-orange-400' : 'text-emerald-400'}`}>
+                  {formatPercent(row.incremental)}
+                </td>
+              </motion.tr>
+            ))}
+          </tbody>
+        </table>
+      </div>
+    </motion.div>
+  );
+};
+
+export default RiskAttribution;
@@ -1,12 +1,92 @@
+import { useEffect, useRef } from 'react';
 import { motion } from 'framer-motion';
 import { Activity } from 'lucide-react';
 import { InfoTooltip } from '../Tooltip';
 
-const CorrelationHeatmap = ({ correlationMatrix, tickers, loading }) => {
-  if (!correlationMatrix || !tickers || tickers.length === 0) {
+// Above this many assets the matrix is drawn on a canvas instead of a table
+const TABLE_MAX_ASSETS = 25;
+
+// Strongest pairs listed under the canvas heatmap
+const TOP_PAIRS_SHOWN = 10;
+
+// Position of pair (i, j), i < j, in the packed upper triangle sent for
+// large universes (backend/correlation.py packed_index)
+const packedIndex = (i, j, n) => n * i - (i * (i + 1)) / 2 + (j - i - 1);
+
+// Clustered order if the server sent one, else the request order
+const orderedIndices = (order, tickers) => (
+  order && order.length === tickers.length ? order : tickers.map((_, i) => i)
+);
+
+// Correlation of assets i and j from the nested matrix or the packed triangle
+const correlationValue = (correlationMatrix, packed, tickers, i, j) => {
+  if (correlationMatrix) {
+    return correlationMatrix[tickers[i]]?.[tickers[j]] || 0;
+  }
+  if (i === j) return 1;
+  return packed[packedIndex(Math.min(i, j), Math.max(i, j), tickers.length)] || 0;
+};
+
+// One pixel per asset pair, in clustered order, scaled up by CSS
+const CorrelationCanvas = ({ correlationMatrix, packed, order, tickers }) => {
+  const canvasRef = useRef(null);
+  const size = tickers.length;
+
+  useEffect(() => {
+    const indices = orderedIndices(order, tickers);
+    const context = canvasRef.current.getContext('2d');
+    const image = context.createImageData(size, size);
+    for (let row = 0; row < size; row++) {
+      for (let col = 0; col < size; col++) {
+        const value = correlationValue(correlationMatrix, packed, tickers, indices[row], indices[col]);
+        const offset = (row * size + col) * 4;
+        const [r, g, b] = value > 0 ? [34, 211, 238] : [248, 113, 113];
+        image.data[offset] = r;
+        image.data[offset + 1] = g;
+        image.data[offset + 2] = b;
+        image.data[offset + 3] = Math.round((0.2 + Math.abs(value) * 0.5) * 255);
+      }
+    }
+    context.putImageData(image, 0, 0);
+  }, [correlationMatrix, packed, order, tickers, size]);
+
+  return (
+    <canvas
+      ref={canvasRef}
+      width={size}
+      height={size}
+      className="w-full max-w-xl mx-auto rounded-xl border border-white/10"
+      style={{ imageRendering: 'pixelated', aspectRatio: '1 / 1' }}
+    />
+  );
+};
+
+const CorrelationHeatmap = ({ correlationMatrix, correlation, order, tickers, loading }) => {
+  if ((!correlationMatrix && !correlation) || !tickers || tickers.length === 0) {
     return null;
   }
 
+  // Clustered order puts correlated assets next to each other
+  const indices = orderedIndices(order, tickers);
+  const orderedTickers = indices.map((i) => tickers[i]);
+
+  // Correlation of the assets at two positions of the ordered list
+  const valueAt = (row, col) => correlationValue(
+    correlationMatrix, correlation?.packed, tickers, indices[row], indices[col]
+  );
+
+  // Strongest pairs across every asset's top list, each pair once
+  const pairMap = new Map();
+  Object.entries(correlation?.top_pairs || {}).forEach(([ticker, pairs]) => {
+    pairs.forEach((pair) => {
+      const [a, b] = [ticker, pair.ticker].sort();
+      pairMap.set(`${a}/${b}`, { a, b, value: pair.correlation });
+    });
+  });
+  const topPairs = [...pairMap.values()]
+    .sort((x, y) => y.value - x.value)
+    .slice(0, TOP_PAIRS_SHOWN);
+
   const getColor = (value) => {
     if (value > 0) {
       // Positive correlation - green/cyan gradient
@@ -40,50 +120,75 @@ const CorrelationHeatmap = ({ correlationMatrix, tickers, loading }) => {
         <InfoTooltip content="Shows how assets move together. 1.0 = perfect positive correlation, 0 = no correlation, -1.0 = perfect negative correlation. Lower correlations provide better diversification." />
       </h3>
 
-      <div className="overflow-auto rounded-xl">
-        <table className="min-w-full border-collapse text-sm">
-          <thead>
-            <tr>
-              <th className="p-3 border border-white/10 bg-white/5 font-semibold text-xs text-gray-400"></th>
-              {tickers.map((ticker) => (
-                <th
-                  key={ticker}
-                  className="p-3 border border-white/10 bg-white/5 font-semibold text-xs text-gray-300"
+      {orderedTickers.length > TABLE_MAX_ASSETS ? (
+        <div className="space-y-4">
+          <CorrelationCanvas
+            correlationMatrix={correlationMatrix}
+            packed={correlation?.packed}
+            order={order}
+            tickers={tickers}
+          />
+          <p className="text-xs text-gray-400 text-center">
+            {orderedTickers.length} assets in clustered order
+            {correlation?.shrinkage != null && ` · Ledoit-Wolf shrinkage ${(correlation.shrinkage * 100).toFixed(1)}%`}
+          </p>
+          {topPairs.length > 0 && (
+            <div className="grid grid-cols-2 gap-2 text-xs">
+              {topPairs.map((pair) => (
+                <div key={`${pair.a}/${pair.b}`} className="flex justify-between p-2 rounded-lg bg-white/5 border border-white/10">
+                  <span className="text-gray-300">{pair.a} / {pair.b}</span>
+                  <span className={`font-bold ${getTextColor(pair.value)}`}>{pair.value.toFixed(2)}</span>
+                </div>
+              ))}
+            </div>
+          )}
+        </div>
+      ) : (
+        <div className="overflow-auto rounded-xl">
+          <table className="min-w-full border-collapse text-sm">
+            <thead>
+              <tr>
+                <th className="p-3 border border-white/10 bg-white/5 font-semibold text-xs text-gray-400"></th>
+                {orderedTickers.map((ticker) => (
+                  <th
+                    key={ticker}
+                    className="p-3 border border-white/10 bg-white/5 font-semibold text-xs text-gray-300"
+                  >
+                    {ticker}
+                  </th>
+                ))}
+              </tr>
+            </thead>
+            <tbody>
+              {orderedTickers.map((rowTicker, rowIndex) => (
+                <motion.tr
+                  key={rowTicker}
+                  initial={{ opacity: 0, x: -20 }}
+                  animate={{ opacity: 1, x: 0 }}
+                  transition={{ delay: 0.6 + rowIndex * 0.05 }}
                 >
-                  {ticker}
-                </th>
+                  <td className="p-3 border border-white/10 bg-white/5 font-semibold text-xs text-gray-300">
+                    {rowTicker}
+                  </td>
+                  {orderedTickers.map((colTicker, colIndex) => {
+                    const value = valueAt(rowIndex, colIndex);
+                    return (
+                      <motion.td
+                        key={colTicker}
+                        whileHover={{ scale: 1.05 }}
+                        className={`p-3 border border-white/10 text-center font-bold ${getTextColor(value)} transition-all cursor-pointer`}
+                        style={{ backgroundColor: getColor(value) }}
+                      >
+                        {value.toFixed(2)}
+                      </motion.td>
+                    );
+                  })}
+                </motion.tr>
               ))}
-            </tr>
-          </thead>
-          <tbody>
-            {tickers.map((rowTicker, rowIndex) => (
-              <motion.tr
-                key={rowTicker}
-                initial={{ opacity: 0, x: -20 }}
-                animate={{ opacity: 1, x: 0 }}
-                transition={{ delay: 0.6 + rowIndex * 0.05 }}
-              >
-                <td className="p-3 border border-white/10 bg-white/5 font-semibold text-xs text-gray-300">
-                  {rowTicker}
-                </td>
-                {tickers.map((colTicker) => {
-                  const value = correlationMatrix[rowTicker]?.[colTicker] || 0;
-                  return (
-                    <motion.td
-                      key={colTicker}
-                      whileHover={{ scale: 1.05 }}
-                      className={`p-3 border border-white/10 text-center font-bold ${getTextColor(value)} transition-all cursor-pointer`}
-                      style={{ backgroundColor: getColor(value) }}
-                    >
-                      {value.toFixed(2)}
-                    </motion.td>
-                  );
-                })}
-              </motion.tr>
-            ))}
-          </tbody>
-        </table>
-      </div>
+            </tbody>
+          </table>
+        </div>
+      )}
 
       <div className="mt-6 flex justify-center items-center gap-6 text-xs">
         <div className="flex items-center gap-2">
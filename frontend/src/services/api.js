@@ -1,7 +1,68 @@
 import axios from 'axios';
+import { MSGPACK_MIMETYPE, decodeMsgpack } from './msgpack';
 
 const API_BASE_URL = 'http://localhost:5000/api';
 
+const textDecoder = new TextDecoder();
+
+// Bodies arrive as ArrayBuffers: columnar MessagePack when the server
+// supports it, JSON otherwise (including error responses)
+const decodeResponse = (data, headers) => {
+  if (!data || data.byteLength === 0) {
+    return undefined;
+  }
+  if ((headers['content-type'] || '').startsWith(MSGPACK_MIMETYPE)) {
+    return decodeMsgpack(data);
+  }
+  const text = textDecoder.decode(data);
+  try {
+    return JSON.parse(text);
+  } catch {
+    return text;
+  }
+};
+
+// Ask for the compact columnar form; JSON stays the server's default
+const compactResponse = {
+  headers: { Accept: `${MSGPACK_MIMETYPE}, application/json;q=0.9` },
+  responseType: 'arraybuffer',
+  transformResponse: [decodeResponse]
+};
+
+// Last response per request body, revalidated with If-None-Match so the
+// server can answer unchanged results with an empty 304
+const responseCache = new Map();
+
+const postWithETag = async (path, body, signal) => {
+  const key = `${path}:${JSON.stringify(body)}`;
+  const cached = responseCache.get(key);
+
+  const response = await axios.post(`${API_BASE_URL}${path}`, body, {
+    ...compactResponse,
+    headers: cached
+      ? { ...compactResponse.headers, 'If-None-Match': cached.etag }
+      : compactResponse.headers,
+    validateStatus: (status) => (status >= 200 && status < 300) || (status === 304 && !!cached),
+    signal
+  });
+
+  if (response.status === 304) {
+    return cached.data;
+  }
+
+  const etag = response.headers.etag;
+  if (etag) {
+    responseCache.set(key, { etag, data: response.data });
+  }
+  return response.data;
+};
+
+// Whether a request failed because its AbortSignal was aborted
+export const isCanceled = (error) => axios.isCancel(error);
+
+// Chart series are downsampled on the server to about one point per pixel
+export const CHART_MAX_POINTS = 1000;
+
 export const fetchPortfolioData = async (tickers, weights, startDate, endDate) => {
   try {
     const response = await axios.post(`${API_BASE_URL}/fetch-data`, {
@@ -9,37 +70,260 @@ export const fetchPortfolioData = async (tickers, weights, startDate, endDate) =
       weights,
       start_date: startDate,
       end_date: endDate
-    });
+    }, compactResponse);
     return response.data;
   } catch (error) {
     throw new Error(error.response?.data?.error || 'Failed to fetch portfolio data');
   }
 };
 
-export const calculateMetrics = async (tickers, weights, startDate, endDate) => {
+// Pass confidenceIntervals (true, or { resamples, method, block_length,
+// confidence, seed }) to get bootstrap intervals under metrics.confidence_intervals
+export const calculateMetrics = async (tickers, weights, startDate, endDate, maxPoints = CHART_MAX_POINTS,
+                                       confidenceIntervals, signal) => {
   try {
-    const response = await axios.post(`${API_BASE_URL}/calculate-metrics`, {
+    return await postWithETag('/calculate-metrics', {
       tickers,
       weights,
       start_date: startDate,
-      end_date: endDate
-    });
-    return response.data;
+      end_date: endDate,
+      max_points: maxPoints,
+      confidence_intervals: confidenceIntervals
+    }, signal);
   } catch (error) {
+    if (axios.isCancel(error)) {
+      throw error;
+    }
     throw new Error(error.response?.data?.error || 'Failed to calculate metrics');
   }
 };
 
-export const runStressTest = async (tickers, weights, startDate, endDate) => {
+// Full-resolution chart series for a zoomed date range (pass maxPoints to
+// downsample long ranges)
+export const fetchChartSeries = async (tickers, weights, startDate, endDate, zoomStart, zoomEnd, maxPoints) => {
+  try {
+    const data = await postWithETag('/calculate-metrics/series', {
+      tickers,
+      weights,
+      start_date: startDate,
+      end_date: endDate,
+      zoom_start: zoomStart,
+      zoom_end: zoomEnd,
+      max_points: maxPoints
+    });
+    return data.series;
+  } catch (error) {
+    throw new Error(error.response?.data?.error || 'Failed to fetch chart series');
+  }
+};
+
+// Rolling volatility, Sharpe, VaR, beta and pairwise correlations; windows
+// defaults to [30, 60, 252] days and pairs to every pair of tickers
+export const fetchRollingMetrics = async (tickers, weights, startDate, endDate, options = {}) => {
   try {
-    const response = await axios.post(`${API_BASE_URL}/stress-test`, {
+    return await postWithETag('/rolling-metrics', {
       tickers,
       weights,
       start_date: startDate,
+      end_date: endDate,
+      max_points: CHART_MAX_POINTS,
+      ...options
+    });
+  } catch (error) {
+    throw new Error(error.response?.data?.error || 'Failed to calculate rolling metrics');
+  }
+};
+
+export const runStressTest = async (tickers, weights, startDate, endDate, crisisPeriods) => {
+  try {
+    return await postWithETag('/stress-test', {
+      tickers,
+      weights,
+      start_date: startDate,
+      end_date: endDate,
+      ...(crisisPeriods ? { crisis_periods: crisisPeriods } : {})
+    });
+  } catch (error) {
+    throw new Error(error.response?.data?.error || 'Failed to run stress test');
+  }
+};
+
+export const calculateBatchMetrics = async (tickers, weightsMatrix, startDate, endDate) => {
+  try {
+    const response = await axios.post(`${API_BASE_URL}/calculate-metrics/batch`, {
+      tickers,
+      weights: weightsMatrix,
+      start_date: startDate,
       end_date: endDate
+    }, compactResponse);
+    return response.data;
+  } catch (error) {
+    throw new Error(error.response?.data?.error || 'Failed to calculate batch metrics');
+  }
+};
+
+export const optimizePortfolio = async (tickers, startDate, endDate, options = {}) => {
+  try {
+    return await postWithETag('/optimize', {
+      tickers,
+      start_date: startDate,
+      end_date: endDate,
+      ...options
     });
+  } catch (error) {
+    throw new Error(error.response?.data?.error || 'Failed to optimize portfolio');
+  }
+};
+
+// options: rebalance ('none', 'daily', 'weekly', 'monthly', 'quarterly',
+// 'annually'), drift_threshold (percent), transaction_cost_bps, max_points
+export const runBacktest = async (tickers, weights, startDate, endDate, options = {}) => {
+  try {
+    return await postWithETag('/backtest', {
+      tickers,
+      weights,
+      start_date: startDate,
+      end_date: endDate,
+      ...options
+    });
+  } catch (error) {
+    throw new Error(error.response?.data?.error || 'Failed to run backtest');
+  }
+};
+
+export const runScenarios = async (tickers, weights, startDate, endDate, scenarioSpec = {}) => {
+  try {
+    const response = await axios.post(`${API_BASE_URL}/scenarios`, {
+      tickers,
+      weights,
+      start_date: startDate,
+      end_date: endDate,
+      ...scenarioSpec
+    }, compactResponse);
     return response.data;
   } catch (error) {
-    throw new Error(error.response?.data?.error || 'Failed to run stress test');
+    throw new Error(error.response?.data?.error || 'Failed to run scenarios');
+  }
+};
+
+export const runMonteCarloVaR = async (tickers, weights, startDate, endDate, options = {}) => {
+  try {
+    const response = await axios.post(`${API_BASE_URL}/monte-carlo-var`, {
+      tickers,
+      weights,
+      start_date: startDate,
+      end_date: endDate,
+      ...options
+    }, compactResponse);
+    return response.data;
+  } catch (error) {
+    throw new Error(error.response?.data?.error || 'Failed to run Monte Carlo VaR');
+  }
+};
+
+// Background jobs: long computations run on the server's job pool and are
+// polled until they finish
+export const JOB_POLL_INTERVAL_MS = 750;
+
+// Polling gives up after this long
+export const JOB_TIMEOUT_MS = 10 * 60 * 1000;
+
+// Requests above this many ticker-days run as jobs; smaller ones go straight to
+// /calculate-metrics, which is cached and revalidated with ETags
+export const JOB_MIN_TICKER_DAYS = 250000;
+
+export const submitJob = async (jobType, body, signal) => {
+  try {
+    const response = await axios.post(`${API_BASE_URL}/jobs`, { job_type: jobType, ...body }, { signal });
+    return response.data;
+  } catch (error) {
+    if (axios.isCancel(error)) {
+      throw error;
+    }
+    throw new Error(error.response?.data?.error || 'Failed to start job');
+  }
+};
+
+export const getJob = async (jobId, signal) => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/jobs/${jobId}`, { ...compactResponse, signal });
+    return response.data;
+  } catch (error) {
+    if (axios.isCancel(error)) {
+      throw error;
+    }
+    throw new Error(error.response?.data?.error || 'Failed to get job status');
+  }
+};
+
+export const getJobResult = async (resultUrl, signal) => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}${resultUrl.replace(/^\/api/, '')}`,
+                                     { ...compactResponse, signal });
+    return response.data;
+  } catch (error) {
+    if (axios.isCancel(error)) {
+      throw error;
+    }
+    throw new Error(error.response?.data?.error || 'Failed to get job result');
+  }
+};
+
+// Resolves after ms, or rejects as soon as signal is aborted
+const sleep = (ms, signal) => new Promise((resolve, reject) => {
+  const timer = setTimeout(() => {
+    signal?.removeEventListener('abort', onAbort);
+    resolve();
+  }, ms);
+  const onAbort = () => {
+    clearTimeout(timer);
+    reject(new axios.CanceledError());
+  };
+  signal?.addEventListener('abort', onAbort, { once: true });
+});
+
+// Submit a job and poll it until it finishes; onProgress receives
+// ({ progress, stage }) after every poll. Resolves with the job result.
+// Aborting signal stops polling (rejecting with a cancel error, see
+// axios.isCancel); a job still unfinished after timeoutMs is given up on.
+export const runJob = async (jobType, body, onProgress, { signal, intervalMs = JOB_POLL_INTERVAL_MS,
+                                                           timeoutMs = JOB_TIMEOUT_MS } = {}) => {
+  const deadline = Date.now() + timeoutMs;
+  const { job_id: jobId } = await submitJob(jobType, body, signal);
+
+  while (Date.now() < deadline) {
+    const job = await getJob(jobId, signal);
+    if (onProgress) {
+      onProgress({ progress: job.progress, stage: job.stage });
+    }
+    if (job.status === 'succeeded') {
+      return getJobResult(job.result_url, signal);
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Job failed');
+    }
+    await sleep(intervalMs, signal);
+  }
+  throw new Error(`Job did not finish within ${Math.round(timeoutMs / 1000)} seconds`);
+};
+
+export const calculateMetricsJob = async (tickers, weights, startDate, endDate, onProgress,
+                                          maxPoints = CHART_MAX_POINTS, signal) => {
+  return runJob('metrics', {
+    tickers,
+    weights,
+    start_date: startDate,
+    end_date: endDate,
+    max_points: maxPoints
+  }, onProgress, { signal });
+};
+
+// Dashboard analysis: a direct (cached) request, or a background job with
+// progress for requests above JOB_MIN_TICKER_DAYS
+export const calculatePortfolioMetrics = async (tickers, weights, startDate, endDate, onProgress, signal) => {
+  const days = (new Date(endDate) - new Date(startDate)) / (24 * 60 * 60 * 1000);
+  if (tickers.length * days > JOB_MIN_TICKER_DAYS) {
+    return calculateMetricsJob(tickers, weights, startDate, endDate, onProgress, CHART_MAX_POINTS, signal);
   }
+  return calculateMetrics(tickers, weights, startDate, endDate, CHART_MAX_POINTS, undefined, signal);
 };
@@ -0,0 +1,167 @@
+// Decoder for the columnar MessagePack responses of the API
+// (backend/response_format.py). Typed-array extensions are turned back into
+// plain arrays and column tables into per-day row objects, so callers get the
+// same shapes as the JSON responses.
+
+export const MSGPACK_MIMETYPE = 'application/msgpack';
+
+const EXT_DAYS = 1;
+const EXT_FLOAT64 = 2;
+const EXT_FLOAT32 = 3;
+const COLUMNS_KEY = '__columns__';
+
+const MS_PER_DAY = 86400000;
+const textDecoder = new TextDecoder();
+
+const decodeExtension = (type, view, offset, length) => {
+  if (type === EXT_DAYS) {
+    const dates = new Array(length / 4);
+    for (let i = 0; i < dates.length; i++) {
+      const days = view.getInt32(offset + i * 4, true);
+      dates[i] = new Date(days * MS_PER_DAY).toISOString().slice(0, 10);
+    }
+    return dates;
+  }
+  if (type === EXT_FLOAT64) {
+    const values = new Array(length / 8);
+    for (let i = 0; i < values.length; i++) {
+      const value = view.getFloat64(offset + i * 8, true);
+      values[i] = Number.isNaN(value) ? null : value;
+    }
+    return values;
+  }
+  if (type === EXT_FLOAT32) {
+    const values = new Array(length / 4);
+    for (let i = 0; i < values.length; i++) {
+      const value = view.getFloat32(offset + i * 4, true);
+      values[i] = Number.isNaN(value) ? null : value;
+    }
+    return values;
+  }
+  throw new Error(`Unknown MessagePack extension type ${type}`);
+};
+
+const rebuildTable = (table) => {
+  const keys = table[COLUMNS_KEY];
+  const length = keys.length ? table[keys[0]].length : 0;
+  const rows = new Array(length);
+  for (let i = 0; i < length; i++) {
+    const row = {};
+    for (const key of keys) {
+      row[key] = table[key][i];
+    }
+    rows[i] = row;
+  }
+  return rows;
+};
+
+export const decodeMsgpack = (buffer) => {
+  const bytes = new Uint8Array(buffer);
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  let offset = 0;
+
+  const readString = (length) => {
+    const value = textDecoder.decode(bytes.subarray(offset, offset + length));
+    offset += length;
+    return value;
+  };
+
+  const readArray = (length) => {
+    const items = new Array(length);
+    for (let i = 0; i < length; i++) {
+      items[i] = read();
+    }
+    return items;
+  };
+
+  const readMap = (length) => {
+    const map = {};
+    for (let i = 0; i < length; i++) {
+      const key = read();
+      map[key] = read();
+    }
+    return map[COLUMNS_KEY] ? rebuildTable(map) : map;
+  };
+
+  const readExtension = (length) => {
+    const type = view.getInt8(offset);
+    const value = decodeExtension(type, view, offset + 1, length);
+    offset += 1 + length;
+    return value;
+  };
+
+  const readBinary = (length) => {
+    const value = bytes.slice(offset, offset + length);
+    offset += length;
+    return value;
+  };
+
+  // Reads a big-endian length or number of the given byte size and advances
+  const readUint = (size) => {
+    let value;
+    if (size === 1) value = view.getUint8(offset);
+    else if (size === 2) value = view.getUint16(offset);
+    else if (size === 4) value = view.getUint32(offset);
+    else value = Number(view.getBigUint64(offset));
+    offset += size;
+    return value;
+  };
+
+  const readInt = (size) => {
+    let value;
+    if (size === 1) value = view.getInt8(offset);
+    else if (size === 2) value = view.getInt16(offset);
+    else if (size === 4) value = view.getInt32(offset);
+    else value = Number(view.getBigInt64(offset));
+    offset += size;
+    return value;
+  };
+
+  const read = () => {
+    const code = bytes[offset++];
+
+    if (code <= 0x7f) return code;
+    if (code >= 0xe0) return code - 0x100;
+    if (code >= 0x80 && code <= 0x8f) return readMap(code & 0x0f);
+    if (code >= 0x90 && code <= 0x9f) return readArray(code & 0x0f);
+    if (code >= 0xa0 && code <= 0xbf) return readString(code & 0x1f);
+
+    switch (code) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return readBinary(readUint(1));
+      case 0xc5: return readBinary(readUint(2));
+      case 0xc6: return readBinary(readUint(4));
+      case 0xc7: return readExtension(readUint(1));
+      case 0xc8: return readExtension(readUint(2));
+      case 0xc9: return readExtension(readUint(4));
+      case 0xca: offset += 4; return view.getFloat32(offset - 4);
+      case 0xcb: offset += 8; return view.getFloat64(offset - 8);
+      case 0xcc: return readUint(1);
+      case 0xcd: return readUint(2);
+      case 0xce: return readUint(4);
+      case 0xcf: return readUint(8);
+      case 0xd0: return readInt(1);
+      case 0xd1: return readInt(2);
+      case 0xd2: return readInt(4);
+      case 0xd3: return readInt(8);
+      case 0xd4: return readExtension(1);
+      case 0xd5: return readExtension(2);
+      case 0xd6: return readExtension(4);
+      case 0xd7: return readExtension(8);
+      case 0xd8: return readExtension(16);
+      case 0xd9: return readString(readUint(1));
+      case 0xda: return readString(readUint(2));
+      case 0xdb: return readString(readUint(4));
+      case 0xdc: return readArray(readUint(2));
+      case 0xdd: return readArray(readUint(4));
+      case 0xde: return readMap(readUint(2));
+      case 0xdf: return readMap(readUint(4));
+      default:
+        throw new Error(`Invalid MessagePack byte 0x${code.toString(16)}`);
+    }
+  };
+
+  return read();
+};